@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+메모리를 보고 ASR 프로세스 동시 실행 수를 정하는 입장 제어.
+
+`--workers N` 이면 RAM 과 상관없이 large-v3 whisper-cli 를 N 개 띄워서 16GB 맥에서는 스왑/OOM 이 난다.
+AdmissionController 는 whisper 프로세스를 띄우기 직전에 자리를 받게 해서
+- 시스템 가용 메모리(MemAvailable / vm_stat) - 예약분 에서, 이미 돌고 있는 작업이 앞으로 더 쓸 메모리
+  (예상 최대 RSS - 지금 RSS) 를 뺀 여유가 새 작업의 예상 최대 RSS 보다 클 때만 시작하고
+- 메모리 압박(PSI / memorystatus) 이 보이면 목표 동시 실행 수를 하나씩 줄이고 (도는 작업은 죽이지 않는다),
+  여유가 생기면 다시 하나씩 올린다
+- 작업마다 os.wait4 rusage 로 최대 RSS 와 CPU 시간을 재서 모델별로 data/asr_memory.json 에 기록 →
+  다음 실행부터는 처음 보는 모델이 아니면 그 값으로 판단한다 (처음엔 모델 파일 크기로 추정)
+- CPU: 모델별 평균 병렬도(CPU 초 / 경과 초) 합이 코어 수를 넘으면 더 띄워도 빨라지지 않으므로 기다린다
+
+retranscribe_bad.py 에서 --workers 는 상한이 된다 (--no-adaptive 로 예전 동작).
+
+Usage:
+  python3 scripts/asr_admission.py            # 현재 메모리 상태와 모델별 학습값 출력
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_HISTORY = "data/asr_memory.json"
+RESERVE_MB = 1536          # OS / 브라우저 / 다운로드용으로 남겨둘 메모리
+SAFETY = 1.15              # 학습한 최대 RSS 에 곱할 여유
+POLL_SEC = 2.0
+PRESSURE_PSI = 10.0        # /proc/pressure/memory some avg10 (%)
+CPU_OVERCOMMIT = 1.25
+RAISE_AFTER = 3            # 여유가 연속 이만큼 관측되면 목표를 하나 올린다
+
+
+# ─── 시스템 측정 ───
+
+def _meminfo() -> dict[str, int]:
+    out = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            out[key] = int(value.split()[0]) // 1024
+    return out
+
+
+def available_mb() -> int:
+    """Memory that can be allocated without swapping (Linux MemAvailable, macOS free+inactive+purgeable)."""
+    if os.path.exists("/proc/meminfo"):
+        return _meminfo()["MemAvailable"]
+    out = subprocess.run(["vm_stat"], capture_output=True, text=True).stdout
+    page = int(re.search(r"page size of (\d+)", out).group(1))
+    pages = 0
+    for key in ("Pages free", "Pages inactive", "Pages purgeable", "Pages speculative"):
+        m = re.search(rf"{key}:\s+(\d+)", out)
+        if m:
+            pages += int(m.group(1))
+    return pages * page // (1024 * 1024)
+
+
+def under_pressure() -> bool:
+    """Kernel-reported memory pressure (Linux PSI, macOS memorystatus level ≥ warn)."""
+    psi = Path("/proc/pressure/memory")
+    if psi.exists():
+        m = re.search(r"some avg10=([\d.]+)", psi.read_text())
+        return bool(m and float(m.group(1)) > PRESSURE_PSI)
+    if sys.platform == "darwin":
+        out = subprocess.run(
+            ["sysctl", "-n", "kern.memorystatus_vm_pressure_level"], capture_output=True, text=True
+        ).stdout.strip()
+        return out.isdigit() and int(out) >= 2
+    return False
+
+
+def process_rss_mb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) // 1024
+        return 0
+    except FileNotFoundError:
+        if sys.platform != "darwin":
+            return 0
+    out = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout.strip()
+    return int(out) // 1024 if out.isdigit() else 0
+
+
+def _maxrss_mb(ru) -> int:
+    # Linux 는 KB, macOS 는 바이트
+    return ru.ru_maxrss // (1024 * 1024) if sys.platform == "darwin" else ru.ru_maxrss // 1024
+
+
+# ─── 학습값 ───
+
+class MemoryHistory:
+    """Per-model peak RSS / CPU parallelism learned from earlier runs (JSON file)."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.models: dict[str, dict] = json.loads(self.path.read_text()) if self.path.exists() else {}
+
+    def peak_mb(self, key: str, model_path: str = "") -> int:
+        rec = self.models.get(key)
+        if rec:
+            return int(rec["peak_mb"] * SAFETY)
+        # 처음 보는 모델: ggml 가중치 + 디코더 버퍼 대략치
+        size = os.path.getsize(model_path) // (1024 * 1024) if model_path and os.path.exists(model_path) else 3000
+        return int(size * 1.3 + 400)
+
+    def parallelism(self, key: str) -> float:
+        rec = self.models.get(key)
+        return rec["cpu_per_wall"] if rec else 1.0
+
+    def record(self, key: str, peak_mb: int, cpu_sec: float, wall_sec: float) -> None:
+        with self._lock:
+            rec = self.models.setdefault(key, {"peak_mb": 0, "cpu_per_wall": 1.0, "runs": 0})
+            # 최대 RSS 는 최근 관측 중 큰 쪽을 따라가되 한 번 튄 값은 천천히 잊는다
+            rec["peak_mb"] = max(peak_mb, int(rec["peak_mb"] * 0.9 + peak_mb * 0.1))
+            if wall_sec > 0:
+                rec["cpu_per_wall"] = round(0.7 * rec["cpu_per_wall"] + 0.3 * cpu_sec / wall_sec, 2) if rec["runs"] \
+                    else round(cpu_sec / wall_sec, 2)
+            rec["runs"] += 1
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.models, indent=2, ensure_ascii=False))
+            tmp.replace(self.path)
+
+
+# ─── 입장 제어 ───
+
+class AdmissionController:
+    """Gate for starting ASR subprocesses: memory headroom, pressure back-off, learned per-model peaks."""
+
+    def __init__(
+        self,
+        max_jobs: int,
+        reserve_mb: int = RESERVE_MB,
+        history: MemoryHistory | None = None,
+        log=print,
+    ) -> None:
+        self.max_jobs = max(1, max_jobs)
+        self.target = 1  # 하나부터 시작해서 여유를 보며 올린다
+        self.reserve_mb = reserve_mb
+        self.history = history or MemoryHistory()
+        self.log = log
+        self.cpus = os.cpu_count() or 4
+        self._cond = threading.Condition()
+        self._running: dict[int, tuple[str, int]] = {}  # token → (model key, expected peak)
+        self._pids: dict[int, int] = {}
+        self._next = 0
+        self._roomy = 0
+        self.peak_running = 0
+
+    def _headroom_mb(self) -> int:
+        pending = 0
+        for token, (_, expected) in self._running.items():
+            pid = self._pids.get(token)
+            pending += max(0, expected - (process_rss_mb(pid) if pid else 0))
+        return available_mb() - self.reserve_mb - pending
+
+    def _cpu_busy(self, key: str) -> bool:
+        load = sum(self.history.parallelism(k) for k, _ in self._running.values())
+        return bool(self._running) and load + self.history.parallelism(key) > self.cpus * CPU_OVERCOMMIT
+
+    def _adjust(self, expected: int) -> None:
+        if under_pressure() or self._headroom_mb() < 0:
+            self._roomy = 0
+            lowered = max(1, len(self._running))
+            if lowered < self.target:
+                self.target = lowered
+                self.log(f"  [admission] 메모리 압박 → 동시 실행 {self.target}")
+            return
+        if self._headroom_mb() >= expected and self.target < self.max_jobs:
+            self._roomy += 1
+            if self._roomy >= RAISE_AFTER:
+                self._roomy = 0
+                self.target += 1
+                self.log(f"  [admission] 여유 있음 → 동시 실행 {self.target}")
+
+    @contextmanager
+    def slot(self, key: str, model_path: str = ""):
+        """Block until a job for `key` fits; yields a callback to register the started subprocess pid."""
+        expected = self.history.peak_mb(key, model_path)
+        with self._cond:
+            while True:
+                self._adjust(expected)
+                fits = len(self._running) < self.target and not self._cpu_busy(key)
+                # 혼자 돌 때는 여유가 모자라도 시작한다 (아예 멈추는 것보다는 낫다)
+                if fits and (not self._running or self._headroom_mb() >= expected):
+                    break
+                self._cond.wait(POLL_SEC)
+            token = self._next
+            self._next += 1
+            self._running[token] = (key, expected)
+            self.peak_running = max(self.peak_running, len(self._running))
+
+        def register(pid: int) -> None:
+            with self._cond:
+                self._pids[token] = pid
+
+        try:
+            yield register
+        finally:
+            with self._cond:
+                self._running.pop(token, None)
+                self._pids.pop(token, None)
+                self._cond.notify_all()
+
+    def run(self, cmd: list[str], key: str, model_path: str = "") -> subprocess.CompletedProcess:
+        """subprocess.run(capture_output=True, text=True) under admission; records the child's peak RSS/CPU."""
+        with self.slot(key, model_path) as register:
+            t0 = time.time()
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            register(proc.pid)
+            out: dict[str, str] = {}
+            readers = [
+                threading.Thread(target=lambda n=n, s=s: out.__setitem__(n, s.read()))
+                for n, s in (("stdout", proc.stdout), ("stderr", proc.stderr))
+            ]
+            for t in readers:
+                t.start()
+            # Popen.wait 대신 wait4 → 이 자식 프로세스만의 rusage (최대 RSS, CPU 시간)
+            _, status, ru = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            for t in readers:
+                t.join()
+            wall = time.time() - t0
+            peak = _maxrss_mb(ru)
+            if proc.returncode == 0 and peak:
+                self.history.record(key, peak, ru.ru_utime + ru.ru_stime, wall)
+        return subprocess.CompletedProcess(cmd, proc.returncode, out.get("stdout", ""), out.get("stderr", ""))
+
+    def summary(self) -> str:
+        return f"[admission] 최대 동시 실행 {self.peak_running}/{self.max_jobs}, 최종 목표 {self.target}"
+
+
+def main() -> None:
+    history = MemoryHistory()
+    print(f"available={available_mb()}MB pressure={under_pressure()} cpus={os.cpu_count()}")
+    for key, rec in history.models.items():
+        print(f"  {key}: peak={rec['peak_mb']}MB cpu/wall={rec['cpu_per_wall']} runs={rec['runs']}")
+
+
+if __name__ == "__main__":
+    main()
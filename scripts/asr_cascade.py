@@ -0,0 +1,87 @@
+"""
+모델 캐스케이드: 빠른 소형 모델 먼저, 결과가 나쁠 때만 large-v3 로 재전사.
+
+대부분의 음원은 깨끗해서 ggml-small 수준으로도 충분하다.
+transcript_quality.assess 가 문제(환각, 숫자 노이즈, 발화 속도 이상)를 찾은
+설교(또는 --parallel 조각)만 큰 모델로 다시 돌리고, 배치가 끝나면
+승격 비율과 절약한 연산 시간을 출력한다.
+"""
+
+import threading
+import time
+from typing import Callable
+
+from parallel_asr import wav_duration
+from transcript_quality import assess
+
+
+class CascadeStats:
+    """Thread-safe counters for one batch (shared across --parallel pieces / --workers)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.items = 0
+        self.escalated = 0
+        self.audio_sec = 0.0
+        self.escalated_audio_sec = 0.0
+        self.fast_sec = 0.0
+        self.slow_sec = 0.0
+        self.reasons: dict[str, int] = {}
+
+    def record(self, audio_sec: float, fast_sec: float, slow_sec: float, reasons: list[str]) -> None:
+        with self._lock:
+            self.items += 1
+            self.audio_sec += audio_sec
+            self.fast_sec += fast_sec
+            if reasons:
+                self.escalated += 1
+                self.escalated_audio_sec += audio_sec
+                self.slow_sec += slow_sec
+                for r in reasons:
+                    key = r.split("=")[0]
+                    self.reasons[key] = self.reasons.get(key, 0) + 1
+
+    def summary(self) -> str:
+        if not self.items:
+            return "[cascade] no items"
+        rate = self.escalated / self.items * 100
+        spent = self.fast_sec + self.slow_sec
+        line = (
+            f"[cascade] escalated {self.escalated}/{self.items} ({rate:.1f}%) "
+            f"fast={self.fast_sec / 60:.1f}min slow={self.slow_sec / 60:.1f}min"
+        )
+        if self.escalated_audio_sec > 0:
+            # 승격된 구간에서 잰 큰 모델의 실시간 배율로 "전부 큰 모델" 비용을 추정
+            slow_rtf = self.slow_sec / self.escalated_audio_sec
+            all_slow = self.audio_sec * slow_rtf
+            saved = all_slow - spent
+            line += f" saved≈{saved / 60:.1f}min ({saved / all_slow * 100:.0f}% of large-only)"
+        if self.reasons:
+            line += " reasons=" + ",".join(f"{k}:{v}" for k, v in sorted(self.reasons.items()))
+        return line
+
+
+def make_cascade(
+    fast_fn: Callable[[str], str],
+    slow_fn: Callable[[str], str],
+    stats: CascadeStats,
+    log: Callable[[str], None] = print,
+) -> Callable[[str], str]:
+    """Wrap two `wav_path -> text` backends into one that escalates only on bad output."""
+
+    def transcribe(wav_path: str) -> str:
+        duration = wav_duration(str(wav_path))
+        t0 = time.time()
+        text = fast_fn(wav_path)
+        fast_sec = time.time() - t0
+        reasons = assess(text, duration)
+        if not reasons:
+            stats.record(duration, fast_sec, 0.0, [])
+            return text
+        log(f"  [cascade] escalate ({', '.join(reasons)}) {duration:.0f}s audio")
+        t0 = time.time()
+        text = slow_fn(wav_path)
+        stats.record(duration, fast_sec, time.time() - t0, reasons)
+        return text
+
+    return transcribe
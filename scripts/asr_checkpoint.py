@@ -0,0 +1,100 @@
+"""
+설교 단위 전사 체크포인트 (긴 설교 중간 재시작).
+
+whisper-cli 출력을 세그먼트 단위로 스트리밍하면서 data/checkpoints/<key>.jsonl 에
+한 줄씩 기록한다 (start, end, text). 프로세스가 80분째에 죽어도 재시작하면
+마지막 세그먼트의 끝(offset)부터 `-ot` 로 이어서 전사하고 결과를 합친다.
+Qwen 경로는 세그먼트 창 단위로 같은 파일에 기록한다.
+
+key = 원본 오디오 지문 + 모델 + 설정 → 다른 설정의 결과와 섞이지 않는다.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from audio_manifest import quick_fingerprint
+from whisper_segments import Segment, iter_segments, join_segments, whisper_segments_cmd
+
+DEFAULT_CHECKPOINT_DIR = "data/checkpoints"
+
+
+def checkpoint_key(audio_path: Path, *settings: object) -> str:
+    fp = quick_fingerprint(str(audio_path), audio_path.stat().st_size)
+    h = hashlib.blake2b(digest_size=8)
+    h.update("|".join(str(s) for s in settings).encode())
+    return f"{fp}-{h.hexdigest()}"
+
+
+class Checkpoint:
+    """Append-only JSONL of finished segments; `offset` is where ASR should resume."""
+
+    def __init__(self, directory: str, key: str) -> None:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self.path = Path(directory) / f"{key}.jsonl"
+        self.segments: list[Segment] = []
+        if self.path.exists():
+            for line in self.path.read_text(encoding="utf-8").splitlines():
+                try:
+                    d = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # 기록 도중 죽은 마지막 줄
+                self.segments.append(Segment(d["start"], d["end"], d["text"]))
+        self._fh = None
+
+    @property
+    def offset(self) -> float:
+        return self.segments[-1].end if self.segments else 0.0
+
+    def append(self, seg: Segment) -> None:
+        if self._fh is None:
+            self._fh = open(self.path, "a", encoding="utf-8")
+        self._fh.write(json.dumps(seg._asdict(), ensure_ascii=False) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self.segments.append(seg)
+
+    def text(self) -> str:
+        return join_segments(self.segments)
+
+    def close(self) -> None:
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+    def finish(self) -> None:
+        """Transcript saved → the checkpoint is no longer needed."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+def transcribe_whisper_resumable(
+    wav_path: Path,
+    model_path: str,
+    checkpoint: Checkpoint,
+    vad_model: str = "",
+    no_gpu: bool = False,
+    threads: int = 0,
+    log=print,
+) -> str:
+    """whisper-cli with per-segment checkpointing; resumes from `checkpoint.offset`."""
+    offset = checkpoint.offset
+    if offset > 0:
+        log(f"  [checkpoint] resuming at {offset:.1f}s ({len(checkpoint.segments)} segments saved)")
+    cmd = whisper_segments_cmd(
+        str(wav_path), model_path, vad_model=vad_model, no_gpu=no_gpu, threads=threads,
+        offset_ms=int(offset * 1000),
+    )
+    shift = None
+    for seg in iter_segments(cmd):
+        if shift is None:
+            # 빌드에 따라 -ot 이후 타임스탬프가 0부터 시작하는 경우 보정 (첫 세그먼트로 판단)
+            shift = offset if offset > 0 and seg.start + 0.5 < offset else 0.0
+        if shift:
+            seg = Segment(seg.start + shift, seg.end + shift, seg.text)
+        if seg.end <= offset:
+            continue
+        checkpoint.append(seg)
+    checkpoint.close()
+    return checkpoint.text()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+ASR 교정 패턴(convex/lib/asrPatterns.ts)의 Python 컴파일러.
+
+Convex 쪽 applyAsrCorrections 는 패턴 ~110개를 순서대로 하나씩 replace 한다.
+여기서는 같은 TS 파일을 읽어 패턴 표를 그대로 가져오고, 순서 의미를 바꾸지 않는
+범위에서 연속된 리터럴 패턴들을 하나의 alternation 정규식(단일 패스 + dict 조회)으로 합친다.
+- 두 리터럴이 겹칠 수 있거나(부분 문자열 / 접두·접미 겹침), 앞 규칙의 치환 결과가
+  뒤 규칙의 입력을 만들어낼 수 있으면 합치지 않는다 → 순차 적용과 결과가 같다
+- 정규식 패턴(하나\\s*님, 숫자 노이즈 lookbehind 등)은 단계 하나씩 유지
+- JS 정규식 의미 차이(\\b, \\d, \\s, `.`, trim)는 변환 시 맞춘다
+
+sermons.db 에 쓰는 스크립트는 sermon_db.update_db 에서 청킹 전에 한 번 적용한다
+(transcript_raw = 원문, transcript_corrected / chunks = 교정문).
+
+Usage:
+  python3 scripts/asr_corrections.py --check                # TS(node) 결과와 비교
+  python3 scripts/asr_corrections.py --check --db data/sermons.db --sample 300
+  python3 scripts/asr_corrections.py --text "하나 님의 은혜 아맨"
+"""
+
+import argparse
+import json
+import random
+import re
+import shutil
+import subprocess
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+PATTERNS_TS = Path(__file__).resolve().parent.parent / "convex" / "lib" / "asrPatterns.ts"
+
+# JS \s 와 String.prototype.trim 이 공백으로 보는 문자 (Python \s 와 미묘하게 다르다)
+JS_SPACE_CHARS = "\t\n\v\f\r \u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+JS_TRIM = "\t\n\v\f\r \u00a0\u1680" + "".join(map(chr, range(0x2000, 0x200B))) + "\u2028\u2029\u202f\u205f\u3000\ufeff"
+_JS_WORD = "A-Za-z0-9_"
+_ENTRY_RE = re.compile(
+    r'\[\s*/((?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\[\n])+)/([a-z]*)\s*,\s*"((?:[^"\\]|\\.)*)"\s*,?\s*\]'
+)
+
+
+# ─── TS 패턴 표 읽기 ───
+
+def load_patterns(path: Path = PATTERNS_TS) -> tuple[int, list[tuple[str, str, str]]]:
+    """(PATTERN_VERSION, [(js_source, flags, replacement), ...]) in table order."""
+    src = path.read_text(encoding="utf-8")
+    version = int(re.search(r"PATTERN_VERSION\s*=\s*(\d+)", src).group(1))
+    start = src.index("ASR_CORRECTIONS")
+    body = src[src.index("= [", start) + 3 : src.index("\n];", start)]
+    body = re.sub(r"^\s*//.*$", "", body, flags=re.M)
+    entries = [(m.group(1), m.group(2), json.loads(f'"{m.group(3)}"')) for m in _ENTRY_RE.finditer(body)]
+    if not entries:
+        raise ValueError(f"no patterns parsed from {path}")
+    return version, entries
+
+
+# ─── JS → Python 정규식 변환 ───
+
+def js_to_python(source: str, flags: str) -> re.Pattern:
+    out: list[str] = []
+    in_class = False
+    i = 0
+    while i < len(source):
+        c = source[i]
+        if c == "\\" and i + 1 < len(source):
+            e = source[i + 1]
+            i += 2
+            if e == "d":
+                out.append("0-9" if in_class else "[0-9]")
+            elif e == "D" and not in_class:
+                out.append("[^0-9]")
+            elif e == "w":
+                out.append(_JS_WORD if in_class else f"[{_JS_WORD}]")
+            elif e == "W" and not in_class:
+                out.append(f"[^{_JS_WORD}]")
+            elif e == "s":
+                out.append(JS_SPACE_CHARS if in_class else f"[{JS_SPACE_CHARS}]")
+            elif e == "S" and not in_class:
+                out.append(f"[^{JS_SPACE_CHARS}]")
+            elif e == "b" and not in_class:
+                # JS \b 는 ASCII 단어 문자 기준 — 한글은 단어 문자가 아니다
+                lit = _literal_run(source, i)
+                if lit:
+                    # 리터럴을 먼저 두어야 sre 가 접두 리터럴 검색을 쓴다 (매 위치 lookaround 대비 수십 배 빠름)
+                    esc = re.escape(lit)
+                    word_start = re.fullmatch(f"[{_JS_WORD}]", lit[0]) is not None
+                    out.append(f"{esc}(?<{'!' if word_start else '='}[{_JS_WORD}]{esc})")
+                    i += len(lit)
+                else:
+                    out.append(f"(?:(?<=[{_JS_WORD}])(?![{_JS_WORD}])|(?<![{_JS_WORD}])(?=[{_JS_WORD}]))")
+            elif e == "B" and not in_class:
+                out.append(f"(?:(?<=[{_JS_WORD}])(?=[{_JS_WORD}])|(?<![{_JS_WORD}])(?![{_JS_WORD}]))")
+            else:
+                out.append("\\" + e)
+            continue
+        if in_class:
+            if c == "]":
+                in_class = False
+            out.append(c)
+        elif c == "[":
+            in_class = True
+            out.append(c)
+        elif c == "." and "s" not in flags:
+            # u 플래그 없는 JS 는 UTF-16 코드 유닛 단위 — BMP 밖 문자는 `.` 한 번에 매칭되지 않는다
+            out.append("[^\n\r\u2028\u2029\U00010000-\U0010ffff]")
+        elif c == "$" and "m" not in flags:
+            out.append(r"\Z")
+        elif source.startswith("(?<", i) and i + 3 < len(source) and source[i + 3] not in "=!":
+            out.append("(?P<")
+            i += 3
+            continue
+        else:
+            out.append(c)
+        i += 1
+    re_flags = (re.I if "i" in flags else 0) | (re.M if "m" in flags else 0) | (re.S if "s" in flags else 0)
+    unsupported = set(flags) - set("gims")
+    if unsupported:
+        raise ValueError(f"unsupported JS regex flags {''.join(sorted(unsupported))}: /{source}/{flags}")
+    return re.compile("".join(out), re_flags)
+
+
+def _literal_run(source: str, i: int) -> str:
+    """Plain characters starting at source[i], minus one if a quantifier follows."""
+    j = i
+    while j < len(source) and source[j] not in ".^$*+?()[]{}|\\":
+        j += 1
+    if j < len(source) and source[j] in "*+?{":
+        j -= 1
+    return source[i:j] if j > i else ""
+
+
+def js_replacement(rep: str) -> str:
+    """JS replacement string ($1, $&, $$) → Python re.sub template."""
+    out = rep.replace("\\", "\\\\")
+    out = re.sub(r"\$(\d{1,2})", r"\\g<\1>", out)
+    out = out.replace("$&", r"\g<0>")
+    return out.replace("$$", "$")
+
+
+def js_literal(source: str, flags: str) -> str | None:
+    """Literal text a JS pattern matches, or None if it uses any regex feature."""
+    if flags != "g":
+        return None
+    out = []
+    i = 0
+    while i < len(source):
+        c = source[i]
+        if c == "\\":
+            if i + 1 >= len(source) or source[i + 1].isalnum():
+                return None
+            out.append(source[i + 1])
+            i += 2
+            continue
+        if c in ".^$*+?()[]{}|":
+            return None
+        out.append(c)
+        i += 1
+    return "".join(out)
+
+
+# ─── 단계 컴파일 ───
+
+def _overlaps(a: str, b: str) -> bool:
+    if not a or not b:
+        return True  # 빈 치환은 양옆 글자를 붙여 새 매칭을 만들 수 있다
+    if a in b or b in a:
+        return True
+    return any(a.endswith(b[:k]) or b.endswith(a[:k]) for k in range(1, min(len(a), len(b))))
+
+
+def _can_join(group: list[tuple[str, str]], lit: str, rep: str) -> bool:
+    for g_lit, g_rep in group:
+        if _overlaps(g_lit, lit) or _overlaps(g_rep, lit):
+            return False
+    return True
+
+
+def _literal_stage(group: list[tuple[str, str]]) -> Callable[[str], str]:
+    if len(group) == 1:
+        lit, rep = group[0]
+        return lambda text: text.replace(lit, rep)
+    table = dict(group)
+    pattern = re.compile("|".join(re.escape(lit) for lit, _ in group))
+    lookup = table.__getitem__
+    return lambda text: pattern.sub(lambda m: lookup(m.group(0)), text)
+
+
+def _regex_stage(source: str, flags: str, rep: str) -> Callable[[str], str]:
+    pattern = js_to_python(source, flags)
+    template = js_replacement(rep)
+    count = 0 if "g" in flags else 1
+    return lambda text: pattern.sub(template, text, count=count)
+
+
+def compile_stages(entries: list[tuple[str, str, str]], merge: bool = True) -> list[Callable[[str], str]]:
+    stages: list[Callable[[str], str]] = []
+    group: list[tuple[str, str]] = []
+    for source, flags, rep in entries:
+        lit = js_literal(source, flags) if merge and "$" not in rep else None
+        if lit and _can_join(group, lit, rep):
+            group.append((lit, rep))
+            continue
+        if group:
+            stages.append(_literal_stage(group))
+            group = []
+        if lit:
+            group.append((lit, rep))
+        else:
+            stages.append(_regex_stage(source, flags, rep))
+    if group:
+        stages.append(_literal_stage(group))
+    return stages
+
+
+class AsrCorrector:
+    def __init__(self, path: Path = PATTERNS_TS, merge: bool = True) -> None:
+        self.version, self.entries = load_patterns(path)
+        self.stages = compile_stages(self.entries, merge=merge)
+
+    def __call__(self, text: str) -> str:
+        for stage in self.stages:
+            text = stage(text)
+        return text.strip(JS_TRIM)
+
+
+@lru_cache(maxsize=1)
+def default_corrector() -> AsrCorrector:
+    return AsrCorrector()
+
+
+def correct(text: str) -> str:
+    """applyAsrCorrections equivalent (pattern table loaded once per process)."""
+    return default_corrector()(text)
+
+
+# ─── 패리티 검사 ───
+
+_NODE_SCRIPT = r"""
+const fs = require("fs");
+let src = fs.readFileSync(process.argv[1], "utf8");
+src = src.replace(/\bexport /g, "").replace(/:\s*\[RegExp, string\]\[\]/, "").replace(/\(text: string\): string/, "(text)");
+const apply = new Function(src + "\nreturn applyAsrCorrections;")();
+const inputs = JSON.parse(fs.readFileSync(0, "utf8"));
+process.stdout.write(JSON.stringify(inputs.map(apply)));
+"""
+
+
+def run_node(inputs: list[str], path: Path = PATTERNS_TS) -> list[str]:
+    result = subprocess.run(
+        ["node", "-e", _NODE_SCRIPT, str(path)],
+        input=json.dumps(inputs, ensure_ascii=False), capture_output=True, text=True, encoding="utf-8",
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip()[-500:] or "node failed")
+    return json.loads(result.stdout)
+
+
+def fuzz_inputs(entries: list[tuple[str, str, str]], n: int = 3000, seed: int = 11) -> list[str]:
+    """Random concatenations of pattern literals, replacements and tricky fragments."""
+    rng = random.Random(seed)
+    frags = [f for s, fl, rep in entries for f in (js_literal(s, fl) or "", rep) if f]
+    frags += [
+        "하나 님", "예수  님", "주 님", "성  령", "그리스 도", "아아아아아", "!!!!", "ㅋㅋㅋㅋㅋ", "😀😀😀😀",
+        "3 장 16 절", "12장16절", "3 : 16", "고전 13", "a고전 13", "1고후 5", "요일3", "x송도", " 송도",
+        "말씀 12 하나님", "은혜 3 4 믿음", "사랑 5 장", "기도 1 2 년", "\u3000", "\u00a0", "\n", "\t",
+        "[음악", "]", "[", "님", "주", "하나", "  ", "   ", " ", "", "다. ", "요. ",
+    ]
+    out = []
+    for _ in range(n):
+        out.append("".join(rng.choice(frags) + rng.choice(["", " ", " ", "  "]) for _ in range(rng.randint(1, 14))))
+    return out
+
+
+def db_inputs(db: str, sample: int) -> list[str]:
+    import sqlite3
+
+    from transcript_codec import TranscriptCodec
+
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    try:
+        codec = TranscriptCodec(conn)
+        rows = conn.execute(
+            "SELECT transcript_raw FROM sermons WHERE transcript_raw IS NOT NULL "
+            "AND transcript_raw != '' ORDER BY random() LIMIT ?",
+            (sample,),
+        ).fetchall()
+        return [codec.decode(r[0]) for r in rows]
+    finally:
+        conn.close()
+
+
+def check(inputs: list[str], corrector: AsrCorrector, reference: Callable[[list[str]], list[str]], label: str) -> int:
+    t0 = time.perf_counter()
+    expected = reference(inputs)
+    t_ref = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = [corrector(x) for x in inputs]
+    t_py = time.perf_counter() - t0
+    bad = [(x, e, g) for x, e, g in zip(inputs, expected, got) if e != g]
+    print(f"[parity:{label}] {len(inputs) - len(bad)}/{len(inputs)} identical "
+          f"(reference {t_ref:.2f}s, compiled {t_py:.2f}s)")
+    for x, e, g in bad[:5]:
+        print(f"  input   : {x[:120]!r}\n  expected: {e[:120]!r}\n  got     : {g[:120]!r}")
+    return len(bad)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ASR 교정 패턴 (asrPatterns.ts) Python 엔진")
+    parser.add_argument("--patterns", default=str(PATTERNS_TS))
+    parser.add_argument("--text", help="이 문자열을 교정해서 출력")
+    parser.add_argument("--check", action="store_true", help="TS 원본(node) 및 순차 적용 결과와 비교")
+    parser.add_argument("--fuzz", type=int, default=3000, help="--check 합성 입력 개수")
+    parser.add_argument("--db", default="", help="--check 에 실제 transcript_raw 표본도 사용")
+    parser.add_argument("--sample", type=int, default=200)
+    args = parser.parse_args()
+
+    corrector = AsrCorrector(Path(args.patterns))
+    print(f"[info] PATTERN_VERSION={corrector.version} patterns={len(corrector.entries)} "
+          f"passes={len(corrector.stages)}", file=sys.stderr)
+    if args.text is not None:
+        print(corrector(args.text))
+    if not args.check:
+        return
+
+    inputs = fuzz_inputs(corrector.entries, args.fuzz)
+    if args.db:
+        inputs += db_inputs(args.db, args.sample)
+    sequential = AsrCorrector(Path(args.patterns), merge=False)
+    failures = check(inputs, corrector, lambda xs: [sequential(x) for x in xs], "sequential")
+    if shutil.which("node"):
+        failures += check(inputs, corrector, lambda xs: run_node(xs, Path(args.patterns)), "typescript")
+    else:
+        print("[warn] node 없음 — TS 원본과의 비교는 건너뜀")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+YouTube 오디오 다운로드 관리 (retranscribe_bad.download_audio 용).
+
+설교마다 `yt-dlp -f bestaudio` 를 한 번씩 막 돌리면 필요 이상으로 큰 포맷을 받고,
+끊기면 처음부터 다시 받는다. 여기서는
+- yt-dlp -J 로 포맷 목록만 받아 전사에 충분한(abr ≥ MIN_ABR) 가장 작은 오디오 전용 포맷을 고르고
+- Range 요청으로 CHUNK_BYTES 씩 받아 .part 파일에 이어 쓴다 (중단 후 다시 실행하면 이어받기)
+- 실패하면 지수 백오프로 재시도, 403(URL 만료)이면 포맷을 다시 조회
+- 동시 다운로드 수와 전체 대역폭(바이트/초)을 모든 작업자가 공유해서 제한
+- 끝나면 크기(Content-Length)와 길이(ffprobe, yt-dlp duration 대비)를 확인한 뒤에만 넘긴다
+- 다운로드마다 크기/시간/MB/s 를 로그로 남긴다
+
+HTTP(S) 로 바로 받을 수 있는 포맷이 없으면(HLS/DASH 만 있는 경우) yt-dlp 에 --continue / --limit-rate 를
+붙여 직접 받게 한다.
+
+Usage:
+  python3 scripts/audio_download.py <youtube_id> ... [--concurrency 2] [--rate-limit 4M]
+  python3 scripts/audio_download.py --url http://127.0.0.1:8000/x.webm --name x   # 로컬 서버로 확인용
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from audio_manifest import find_by_stem, open_manifest, probe_stem
+
+YTDLP_ARGS = ["--cookies-from-browser", "chrome", "--js-runtimes", "deno"]
+MIN_ABR = 40            # kbps. whisper 는 16kHz mono 로 내려서 쓰므로 이 이상은 낭비
+CHUNK_BYTES = 8 * 1024 * 1024   # googlevideo 는 큰 단일 요청을 느리게 준다
+READ_BYTES = 64 * 1024
+RETRIES = 5
+BACKOFF_SEC = 2.0
+TIMEOUT_SEC = 30
+DURATION_TOLERANCE = 0.01   # 1% (최소 2초)
+
+
+class AudioFormat(NamedTuple):
+    format_id: str
+    ext: str
+    url: str
+    headers: dict
+    size: int | None
+    duration: float | None
+    abr: float | None
+
+
+class DownloadError(Exception):
+    pass
+
+
+class _Expired(Exception):
+    """Signed media URL rejected (403/410) → re-resolve before retrying."""
+
+
+# ─── 포맷 선택 ───
+
+def _estimated_size(fmt: dict, duration: float | None) -> float:
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return float(size)
+    if fmt.get("abr") and duration:
+        return fmt["abr"] * 1000 / 8 * duration
+    return float("inf")
+
+
+def pick_format(info: dict, min_abr: float = MIN_ABR) -> AudioFormat | None:
+    """Smallest audio-only, directly downloadable format with abr >= min_abr (any abr if none qualify)."""
+    duration = info.get("duration")
+    audio = [
+        f for f in info.get("formats") or []
+        if f.get("vcodec") == "none" and f.get("acodec") not in (None, "none")
+        and f.get("protocol") in ("http", "https") and f.get("url")
+    ]
+    if not audio:
+        return None
+    good = [f for f in audio if (f.get("abr") or 0) >= min_abr] or audio
+    f = min(good, key=lambda f: _estimated_size(f, duration))
+    return AudioFormat(
+        format_id=str(f["format_id"]),
+        ext=f.get("ext") or "webm",
+        url=f["url"],
+        headers=f.get("http_headers") or {},
+        size=f.get("filesize"),
+        duration=duration,
+        abr=f.get("abr"),
+    )
+
+
+def resolve_format(youtube_id: str, min_abr: float = MIN_ABR) -> tuple[AudioFormat | None, dict]:
+    result = subprocess.run(
+        ["yt-dlp", *YTDLP_ARGS, "-J", "--no-warnings", f"https://www.youtube.com/watch?v={youtube_id}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise DownloadError(f"yt-dlp -J 실패: {result.stderr.strip()[-200:]}")
+    info = json.loads(result.stdout)
+    return pick_format(info, min_abr), info
+
+
+# ─── 제한 ───
+
+class RateLimiter:
+    """Token bucket shared by all downloads; rate 0 = unlimited."""
+
+    def __init__(self, bytes_per_sec: float) -> None:
+        self.rate = bytes_per_sec
+        self._lock = threading.Lock()
+        self._tokens = bytes_per_sec
+        self._last = time.monotonic()
+
+    def consume(self, n: int) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate) - n
+            self._last = now
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def parse_rate(text: str) -> float:
+    """'4M' → 4*1024*1024 bytes/s, '500K', '0' = unlimited."""
+    text = text.strip().upper()
+    if not text:
+        return 0.0
+    mult = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}.get(text[-1], 1)
+    return float(text[:-1] if text[-1] in "KMG" else text) * mult
+
+
+# ─── 확인 ───
+
+def probe_duration(path: Path) -> float | None:
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+            capture_output=True, text=True,
+        )
+    except FileNotFoundError:
+        return None
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def verify(path: Path, size: int | None, duration: float | None) -> str | None:
+    """Return a reason string if the finished file looks truncated, else None."""
+    actual = path.stat().st_size
+    if size is not None and actual != size:
+        return f"size {actual} != {size}"
+    if duration:
+        got = probe_duration(path)
+        if got is not None and abs(got - duration) > max(2.0, duration * DURATION_TOLERANCE):
+            return f"duration {got:.0f}s != {duration:.0f}s"
+    return None
+
+
+# ─── 다운로드 ───
+
+class DownloadManager:
+    """Resumable downloads into audio_dir with shared concurrency / bandwidth limits."""
+
+    def __init__(
+        self,
+        audio_dir: Path,
+        concurrency: int = 2,
+        rate_limit: float = 0.0,
+        retries: int = RETRIES,
+        min_abr: float = MIN_ABR,
+        log: Callable[[str], None] = print,
+        manifest: str | None = None,
+    ) -> None:
+        """`manifest` is an audio_manifest DB path (refreshed by the caller); None probes extensions."""
+        self.audio_dir = Path(audio_dir)
+        self.manifest = manifest
+        self._local = threading.local()  # 매니페스트 sqlite 연결은 스레드마다
+        self.audio_dir.mkdir(parents=True, exist_ok=True)
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.limiter = RateLimiter(rate_limit)
+        self.rate_limit = rate_limit
+        self.retries = retries
+        self.min_abr = min_abr
+        self.log = log
+        self._lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def existing(self, name: str) -> Path | None:
+        if self.manifest is None:
+            return probe_stem(self.audio_dir, name)
+        if not hasattr(self._local, "manifest"):
+            self._local.manifest = open_manifest(self.manifest)
+        found = find_by_stem(self._local.manifest, self.audio_dir, name)
+        # 전사 후 지운 파일은 다음 refresh 전까지 매니페스트에 남아 있다
+        return found if found and found.exists() else None
+
+    def download(self, youtube_id: str) -> Path | None:
+        found = self.existing(youtube_id)
+        if found:
+            return found
+        with self.slots:
+            try:
+                fmt, _ = resolve_format(youtube_id, self.min_abr)
+                if fmt is None:
+                    return self._ytdlp_fallback(youtube_id)
+                return self.fetch(youtube_id, fmt, refresh=lambda: resolve_format(youtube_id, self.min_abr)[0])
+            except DownloadError as e:
+                self.log(f"    [오류] {youtube_id} 다운로드 실패: {e}")
+                return None
+
+    def fetch(self, name: str, fmt: AudioFormat, refresh: Callable[[], AudioFormat | None] | None = None) -> Path:
+        """Download fmt.url to audio_dir/<name>.<ext>, resuming <name>.f<id>.<ext>.part; retries with backoff."""
+        final = self.audio_dir / f"{name}.{fmt.ext}"
+        part = self.audio_dir / f"{name}.f{fmt.format_id}.{fmt.ext}.part"
+        for attempt in range(self.retries):
+            start = part.stat().st_size if part.exists() else 0
+            t0 = time.time()
+            try:
+                total = self._fetch_ranges(fmt, part, fmt.size)
+                if fmt.size and total != fmt.size:
+                    part.unlink()
+                    raise DownloadError(f"서버 크기 {total} != 포맷 크기 {fmt.size}")
+                problem = verify(part, total, fmt.duration)
+                if problem:
+                    part.unlink()
+                    raise DownloadError(f"검증 실패: {problem}")
+                part.rename(final)
+                self._record(name, fmt, part_start=start, size=total, seconds=time.time() - t0)
+                return final
+            except _Expired:
+                if refresh is None:
+                    raise DownloadError("URL 만료 (403)")
+                fresh = refresh()
+                if fresh is None or fresh.format_id != fmt.format_id:
+                    part.unlink(missing_ok=True)  # 다른 포맷 바이트에 이어 쓰면 안 된다
+                if fresh is None:
+                    raise DownloadError("다시 조회한 포맷 없음")
+                fmt = fresh
+                part = self.audio_dir / f"{name}.f{fmt.format_id}.{fmt.ext}.part"
+                final = self.audio_dir / f"{name}.{fmt.ext}"
+            except (urllib.error.URLError, OSError, DownloadError) as e:
+                if attempt == self.retries - 1:
+                    raise DownloadError(f"{self.retries}회 실패: {e}") from e
+                wait = BACKOFF_SEC * 2 ** attempt * random.uniform(0.5, 1.5)
+                got = part.stat().st_size if part.exists() else 0
+                self.log(f"    [재시도] {name} {attempt + 1}/{self.retries} ({e}); {got / 1e6:.1f}MB 받음, {wait:.0f}s 후")
+                time.sleep(wait)
+        raise DownloadError("재시도 초과")
+
+    def _fetch_ranges(self, fmt: AudioFormat, part: Path, total: int | None) -> int:
+        pos = part.stat().st_size if part.exists() else 0
+        with open(part, "ab") as out:
+            while total is None or pos < total:
+                end = pos + CHUNK_BYTES - 1
+                if total is not None:
+                    end = min(end, total - 1)
+                req = urllib.request.Request(fmt.url, headers={**fmt.headers, "Range": f"bytes={pos}-{end}"})
+                try:
+                    resp = urllib.request.urlopen(req, timeout=TIMEOUT_SEC)
+                except urllib.error.HTTPError as e:
+                    if e.code in (403, 410):
+                        raise _Expired() from e
+                    if e.code == 416 and total is None:
+                        return pos  # 이미 끝까지 받은 .part
+                    raise
+                with resp:
+                    if resp.status == 200 and pos > 0:
+                        # 서버가 Range 를 무시 → 처음부터 다시
+                        out.seek(0)
+                        out.truncate()
+                        pos = 0
+                    crange = resp.headers.get("Content-Range", "")
+                    if "/" in crange and crange.rsplit("/", 1)[1].isdigit():
+                        total = int(crange.rsplit("/", 1)[1])
+                    elif resp.status == 200 and resp.headers.get("Content-Length"):
+                        total = int(resp.headers["Content-Length"])
+                    got = 0
+                    while True:
+                        buf = resp.read(READ_BYTES)
+                        if not buf:
+                            break
+                        self.limiter.consume(len(buf))
+                        out.write(buf)
+                        got += len(buf)
+                    out.flush()
+                    pos += got
+                    if got == 0:
+                        raise DownloadError(f"빈 응답 at {pos}")
+                    if total is None:
+                        total = pos  # 길이를 모르는 서버: 한 번에 다 받은 것으로 본다
+        return pos
+
+    def _ytdlp_fallback(self, youtube_id: str) -> Path | None:
+        t0 = time.time()
+        cmd = [
+            "yt-dlp", *YTDLP_ARGS, "--continue", "--retries", str(self.retries),
+            "-f", f"worstaudio[abr>={self.min_abr}]/bestaudio",
+            "-o", str(self.audio_dir / f"{youtube_id}.%(ext)s"),
+        ]
+        if self.rate_limit > 0:
+            cmd += ["--limit-rate", str(int(self.rate_limit))]
+        result = subprocess.run([*cmd, f"https://www.youtube.com/watch?v={youtube_id}"], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise DownloadError(f"yt-dlp 실패: {result.stderr.strip()[-200:]}")
+        path = probe_stem(self.audio_dir, youtube_id)  # 방금 받은 파일이라 매니페스트에는 아직 없다
+        if path:
+            fmt = AudioFormat("yt-dlp", path.suffix[1:], "", {}, path.stat().st_size, None, None)
+            self._record(youtube_id, fmt, part_start=0, size=fmt.size, seconds=time.time() - t0)
+        return path
+
+    def _record(self, name: str, fmt: AudioFormat, part_start: int, size: int, seconds: float) -> None:
+        fetched = size - part_start
+        with self._lock:
+            self.files += 1
+            self.bytes += fetched
+            self.seconds += seconds
+        resumed = f", {part_start / 1e6:.1f}MB 이어받기" if part_start else ""
+        abr = f" {fmt.abr:.0f}kbps" if fmt.abr else ""
+        self.log(
+            f"    [다운로드] {name} f{fmt.format_id}{abr} {size / 1e6:.1f}MB "
+            f"{seconds:.1f}s {fetched / 1e6 / max(seconds, 1e-6):.2f}MB/s{resumed}"
+        )
+
+    def summary(self) -> str:
+        rate = self.bytes / 1e6 / self.seconds if self.seconds else 0.0
+        return f"[download] files={self.files} {self.bytes / 1e6:.1f}MB in {self.seconds:.0f}s ({rate:.2f}MB/s per download)"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="이어받기/재시도/대역폭 제한 오디오 다운로드")
+    parser.add_argument("youtube_ids", nargs="*")
+    parser.add_argument("--audio-dir", default="data/audio")
+    parser.add_argument("--concurrency", type=int, default=2, help="동시 다운로드 수")
+    parser.add_argument("--rate-limit", default="0", help="전체 대역폭 제한 (예: 4M, 500K; 0=무제한)")
+    parser.add_argument("--min-abr", type=float, default=MIN_ABR, help="허용할 최소 오디오 비트레이트(kbps)")
+    parser.add_argument("--url", default="", help="yt-dlp 없이 이 URL 을 직접 받기 (--name 필요)")
+    parser.add_argument("--name", default="", help="--url 로 받을 파일 이름 (확장자 제외)")
+    parser.add_argument("--size", type=int, default=0, help="--url: 기대 크기(바이트)")
+    parser.add_argument("--duration", type=float, default=0, help="--url: 기대 길이(초)")
+    args = parser.parse_args()
+
+    manager = DownloadManager(
+        Path(args.audio_dir), args.concurrency, parse_rate(args.rate_limit), min_abr=args.min_abr,
+    )
+    if args.url:
+        if not args.name:
+            parser.error("--url 에는 --name 이 필요합니다")
+        ext = args.url.rsplit(".", 1)[-1] if "." in args.url.rsplit("/", 1)[-1] else "webm"
+        fmt = AudioFormat("url", ext, args.url, {}, args.size or None, args.duration or None, None)
+        print(manager.fetch(args.name, fmt))
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+            for yid, path in zip(args.youtube_ids, pool.map(manager.download, args.youtube_ids)):
+                print(f"{yid}\t{path or 'FAILED'}")
+    print(manager.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+오디오 지문으로 중복 설교 찾기 (YouTube 다운로드 ↔ NAS 파일).
+
+같은 설교가 data/audio/<youtube_id>.* 와 NAS(nas99-* 행) 양쪽에 있어서
+large-v3 로 두 번 전사하는 경우가 많다. 디코딩한 오디오 앞부분(기본 5분)과
+본문 표본(길이의 35/60/85% 지점 30초씩)으로 스펙트럼 지문(Haitsma-Kalker 방식,
+프레임당 32비트: 33개 대역 에너지 차분의 부호)을 만들어 data/audio_fingerprints.db 에 저장하고,
+새 파일을 전사하기 전에 같은 오디오가 이미 전사돼 있으면 그 전사문을 재사용한다.
+
+- 인코딩(opus/mp3)이나 음량이 달라도 비트 오류율(BER)이 낮게 유지된다
+- 앞에 붙은 인트로 길이가 달라도 해시 일치 투표로 시간 오프셋을 찾은 뒤 비교
+- 인덱스에는 8프레임마다 하나만 넣고, 조회는 모든 프레임으로 한다 → 어떤 오프셋이든 걸린다
+- 앞부분은 예배 인트로/찬양이라 다른 설교와도 같을 수 있다. 그래서 앞부분 일치는 후보일 뿐이고,
+  상대의 본문 표본 위치를 오프셋만큼 옮겨 이쪽 오디오에서 그 구간을 디코딩해 본문까지 일치해야 중복이다
+- 재사용할 전사문도 retranscribe_bad 의 불량 기준(숫자 노이즈 / 1000자 미만)과 환각 검사를 통과해야 한다
+- numpy 필요 (qwen/torch 환경에는 이미 있음)
+
+Usage:
+  python3 scripts/audio_fingerprint.py index --db data/sermons.db   # 예전 인덱스 항목은 본문 표본을 채운다
+  python3 scripts/audio_fingerprint.py report --db data/sermons.db
+  python3 scripts/nas_whisper_transcribe.py --dedup     # 전사 전에 중복이면 기존 전사문 재사용
+"""
+
+import argparse
+import sqlite3
+import subprocess
+from pathlib import Path
+
+from audio_download import probe_duration
+from audio_manifest import (
+    DEFAULT_AUDIO_DIR, DEFAULT_MANIFEST, discover_default_base_dir, find_by_stem, open_refreshed,
+    quick_fingerprint, resolve_marker,
+)
+from transcript_codec import codec_for
+from transcript_quality import is_hallucination, needs_retranscription
+
+DEFAULT_INDEX = "data/audio_fingerprints.db"
+SAMPLE_RATE = 5512
+FRAME = 2048          # 0.37s
+HOP = 256             # 46ms → 초당 약 21.5 프레임
+HEAD_SEC = 300
+BANDS = 33            # 300–2000Hz 로그 간격 → 32비트 서브 지문
+INDEX_EVERY = 8
+MIN_VOTES = 4
+MAX_BER = 0.35
+MIN_OVERLAP_SEC = 30.0
+BODY_SAMPLES = (0.35, 0.6, 0.85)   # 본문 표본 위치 (길이 대비)
+BODY_SEC = 30
+BODY_SLACK_SEC = 1.5               # 표본 정렬 오차 (seek 정밀도) 만큼 앞뒤로 더 디코딩해서 찾는다
+
+
+# ─── 지문 계산 ───
+
+def decode_pcm(audio_path: Path, seconds: float = HEAD_SEC, start: float = 0.0) -> bytes:
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-ss", f"{start:.3f}", "-t", str(seconds), "-i", str(audio_path),
+         "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"],
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors="replace").strip()[-200:] or "ffmpeg failed")
+    return result.stdout
+
+
+def fingerprint_pcm(pcm: bytes):
+    """s16le mono PCM at SAMPLE_RATE → uint32 sub-fingerprint per frame (0 = silence)."""
+    import numpy as np
+
+    x = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+    if len(x) < FRAME * 2:
+        return np.zeros(0, dtype=np.uint32)
+    n = 1 + (len(x) - FRAME) // HOP
+    frames = np.lib.stride_tricks.as_strided(x, (n, FRAME), (x.strides[0] * HOP, x.strides[0]))
+    spec = np.abs(np.fft.rfft(frames * np.hanning(FRAME).astype(np.float32), axis=1)) ** 2
+    edges = np.geomspace(300, 2000, BANDS + 1) * FRAME / SAMPLE_RATE
+    edges = edges.astype(int)
+    energy = np.stack([spec[:, lo:max(hi, lo + 1)].sum(axis=1) for lo, hi in zip(edges[:-1], edges[1:])], axis=1)
+    diff = energy[:, :-1] - energy[:, 1:]
+    bits = (diff[1:] - diff[:-1]) > 0
+    hashes = np.packbits(bits, axis=1, bitorder="little").view("<u4").ravel().copy()
+    # 무음 프레임은 해시가 의미 없으므로 0 으로 표시하고 인덱스/비교에서 뺀다
+    loud = energy.sum(axis=1)[1:]
+    hashes[loud < np.median(loud) * 0.01] = 0
+    return hashes
+
+
+def fingerprint_file(audio_path: Path):
+    return fingerprint_pcm(decode_pcm(audio_path))
+
+
+def body_positions(duration: float) -> list[float]:
+    """Start times of body samples that lie past the fingerprinted head."""
+    return [
+        round(duration * f, 1) for f in BODY_SAMPLES
+        if duration * f >= HEAD_SEC and duration * f + BODY_SEC <= duration
+    ]
+
+
+def best_alignment(a, b, center: int, max_shift: int) -> tuple[float, int]:
+    """Lowest BER of b against a over offsets center ± max_shift (with its overlap)."""
+    best = (1.0, 0)
+    for shift in range(center - max_shift, center + max_shift + 1):
+        ber, overlap = bit_error_rate(a, b, shift)
+        if overlap and ber < best[0]:
+            best = (ber, overlap)
+    return best
+
+
+def bit_error_rate(a, b, offset: int) -> tuple[float, int]:
+    """BER of b shifted by `offset` frames against a, over non-silent overlapping frames."""
+    import numpy as np
+
+    lo, hi = max(0, offset), min(len(a), len(b) + offset)
+    if hi <= lo:
+        return 1.0, 0
+    x, y = a[lo:hi], b[lo - offset:hi - offset]
+    keep = (x != 0) & (y != 0)
+    if not keep.any():
+        return 1.0, 0
+    diff = np.unpackbits((x[keep] ^ y[keep]).view(np.uint8))
+    return float(diff.mean()), int(keep.sum())
+
+
+# ─── 인덱스 ───
+
+def open_index(path: str = DEFAULT_INDEX) -> sqlite3.Connection:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS items (
+          id INTEGER PRIMARY KEY,
+          quick_fp TEXT UNIQUE NOT NULL,
+          path TEXT NOT NULL,
+          sermon_id INTEGER,
+          frames INTEGER NOT NULL,
+          hashes BLOB NOT NULL,
+          duration REAL
+        );
+        CREATE INDEX IF NOT EXISTS items_sermon ON items(sermon_id);
+        CREATE TABLE IF NOT EXISTS fp_body (
+          item INTEGER NOT NULL,
+          start REAL NOT NULL,
+          hashes BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS fp_body_item ON fp_body(item);
+        CREATE TABLE IF NOT EXISTS fp_hash (
+          hash INTEGER NOT NULL,
+          item INTEGER NOT NULL,
+          pos INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS fp_hash_hash ON fp_hash(hash);
+    """)
+    if "duration" not in {r[1] for r in conn.execute("PRAGMA table_info(items)")}:
+        # 본문 표본 이전 인덱스: duration 이 NULL 인 항목은 add_file 이 다시 만나면 표본을 채운다
+        conn.execute("ALTER TABLE items ADD COLUMN duration REAL")
+        conn.commit()
+    return conn
+
+
+def _hashes(blob: bytes):
+    import numpy as np
+
+    return np.frombuffer(blob, dtype="<u4")
+
+
+def _add_body(conn: sqlite3.Connection, item: int, audio_path: Path) -> None:
+    duration = probe_duration(audio_path)
+    if duration is None:
+        raise RuntimeError(f"ffprobe 로 길이를 알 수 없음: {audio_path.name}")
+    conn.execute("DELETE FROM fp_body WHERE item=?", (item,))
+    for start in body_positions(duration):
+        hashes = fingerprint_pcm(decode_pcm(audio_path, BODY_SEC, start))
+        conn.execute(
+            "INSERT INTO fp_body (item, start, hashes) VALUES (?, ?, ?)",
+            (item, start, hashes.astype("<u4").tobytes()),
+        )
+    conn.execute("UPDATE items SET duration=? WHERE id=?", (duration, item))
+
+
+def add_file(conn: sqlite3.Connection, audio_path: Path, sermon_id: int | None = None) -> int:
+    """Fingerprint `audio_path` once (keyed by the manifest quick fingerprint) and return its item id."""
+    qfp = quick_fingerprint(str(audio_path), audio_path.stat().st_size)
+    row = conn.execute("SELECT id, sermon_id, duration FROM items WHERE quick_fp=?", (qfp,)).fetchone()
+    if row:
+        if sermon_id is not None and row[1] != sermon_id:
+            conn.execute("UPDATE items SET sermon_id=?, path=? WHERE id=?", (sermon_id, str(audio_path), row[0]))
+        if row[2] is None:
+            _add_body(conn, row[0], audio_path)
+        conn.commit()
+        return row[0]
+    hashes = fingerprint_file(audio_path)
+    cur = conn.execute(
+        "INSERT INTO items (quick_fp, path, sermon_id, frames, hashes) VALUES (?, ?, ?, ?, ?)",
+        (qfp, str(audio_path), sermon_id, len(hashes), hashes.astype("<u4").tobytes()),
+    )
+    item = cur.lastrowid
+    _add_body(conn, item, audio_path)
+    conn.executemany(
+        "INSERT INTO fp_hash (hash, item, pos) VALUES (?, ?, ?)",
+        ((int(h), item, pos) for pos, h in enumerate(hashes) if pos % INDEX_EVERY == 0 and h),
+    )
+    conn.commit()
+    return item
+
+
+def body_matches(conn: sqlite3.Connection, other: int, audio_path: Path, offset_sec: float) -> bool:
+    """Check `other`'s body samples against the same (offset-shifted) spans decoded from `audio_path`.
+
+    Every sample that falls inside this audio must match, and at least one must be checkable;
+    two short recordings with no body samples count as matching on the head alone.
+    """
+    duration = probe_duration(audio_path)
+    if duration is None:
+        return False
+    samples = conn.execute("SELECT start, hashes FROM fp_body WHERE item=? ORDER BY start", (other,)).fetchall()
+    o_duration, = conn.execute("SELECT duration FROM items WHERE id=?", (other,)).fetchone()
+    if not samples:
+        # 머리 부분이 파일 거의 전부인 짧은 녹음끼리만 (본문 표본이 없는 예전 항목은 인정하지 않는다)
+        return o_duration is not None and max(duration, o_duration) <= HEAD_SEC + BODY_SEC
+    checked = 0
+    slack = int(BODY_SLACK_SEC * SAMPLE_RATE / HOP)
+    for start, blob in samples:
+        # other 의 t 초 ≈ 이쪽의 t - offset 초
+        mine = start - offset_sec - BODY_SLACK_SEC
+        if mine < 0 or mine + BODY_SEC + 2 * BODY_SLACK_SEC > duration:
+            continue
+        probe = fingerprint_pcm(decode_pcm(audio_path, BODY_SEC + 2 * BODY_SLACK_SEC, mine))
+        # other 표본의 0 프레임 ≈ probe 의 slack 프레임 → 오프셋 -slack 주변에서 정렬
+        ber, overlap = best_alignment(_hashes(blob), probe, -slack, slack)
+        if ber > MAX_BER or overlap * HOP / SAMPLE_RATE < BODY_SEC * 0.5:
+            return False
+        checked += 1
+    return checked > 0
+
+
+def find_duplicates(
+    conn: sqlite3.Connection, item: int, audio_path: Path | None = None
+) -> list[tuple[int, int | None, float, float]]:
+    """[(other_item, sermon_id, ber, offset_sec)] for items whose audio matches `item` (head and body).
+
+    `audio_path` is this item's audio (default: the path stored at index time); body samples
+    are decoded from it, so without a readable file nothing counts as a duplicate.
+    """
+    blob, stored_path = conn.execute("SELECT hashes, path FROM items WHERE id=?", (item,)).fetchone()
+    audio_path = audio_path or Path(stored_path)
+    if not audio_path.exists():
+        return []
+    probe = _hashes(blob)
+    votes: dict[tuple[int, int], int] = {}
+    uniq: dict[int, list[int]] = {}
+    for pos, h in enumerate(probe.tolist()):
+        if h:
+            uniq.setdefault(h, []).append(pos)
+    keys = list(uniq)
+    for i in range(0, len(keys), 500):
+        part = keys[i:i + 500]
+        for h, other, pos in conn.execute(
+            f"SELECT hash, item, pos FROM fp_hash WHERE hash IN ({','.join('?' * len(part))}) AND item != ?",
+            (*part, item),
+        ):
+            for p in uniq[h]:
+                key = (other, pos - p)
+                votes[key] = votes.get(key, 0) + 1
+
+    best: dict[int, tuple[int, int]] = {}
+    for (other, offset), n in votes.items():
+        if n >= MIN_VOTES and n > best.get(other, (0, 0))[0]:
+            best[other] = (n, offset)
+
+    out = []
+    for other, (_, offset) in best.items():
+        o_blob, o_sermon = conn.execute("SELECT hashes, sermon_id FROM items WHERE id=?", (other,)).fetchone()
+        # other[pos] ≈ probe[pos - offset] → probe 를 offset 만큼 밀어 비교
+        ber, overlap = bit_error_rate(_hashes(o_blob), probe, offset)
+        if ber > MAX_BER or overlap * HOP / SAMPLE_RATE < MIN_OVERLAP_SEC:
+            continue
+        offset_sec = offset * HOP / SAMPLE_RATE
+        if body_matches(conn, other, audio_path, offset_sec):
+            out.append((other, o_sermon, ber, offset_sec))
+    return sorted(out, key=lambda r: r[2])
+
+
+def reusable_transcript(db: sqlite3.Connection, sermon_id: int) -> str | None:
+    """A transcript good enough to copy: not a marker, not something retranscribe_bad would redo."""
+    row = db.execute("SELECT transcript_raw FROM sermons WHERE id=?", (sermon_id,)).fetchone()
+    text = codec_for(db).decode(row[0]) if row else None
+    if not text or text.startswith("[nas-audio]") or needs_retranscription(text) or is_hallucination(text):
+        return None
+    return text
+
+
+def reuse_transcript(
+    index: sqlite3.Connection, db: sqlite3.Connection, sermon_id: int, audio_path: Path
+) -> tuple[int, str] | None:
+    """Before ASR: if this audio duplicates an already-transcribed sermon, return (that id, its transcript)."""
+    item = add_file(index, audio_path, sermon_id)
+    for _, other_sermon, ber, offset in find_duplicates(index, item, audio_path):
+        if other_sermon is None or other_sermon == sermon_id:
+            continue
+        text = reusable_transcript(db, other_sermon)
+        if text:
+            print(f"  [dedup] same audio as sermon {other_sermon} (BER={ber:.2f}, offset={offset:+.1f}s)")
+            return other_sermon, text
+    return None
+
+
+def clusters(index: sqlite3.Connection) -> list[list[int]]:
+    parent: dict[int, int] = {}
+
+    def root(x: int) -> int:
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for (item,) in index.execute("SELECT id FROM items").fetchall():
+        for other, *_ in find_duplicates(index, item):
+            parent[root(other)] = root(item)
+    groups: dict[int, list[int]] = {}
+    for item in list(parent):
+        groups.setdefault(root(item), []).append(item)
+    return [sorted(g) for g in groups.values() if len(g) > 1]
+
+
+# ─── CLI ───
+
+def index_catalog(index: sqlite3.Connection, db: sqlite3.Connection, args: argparse.Namespace) -> None:
+    audio_dir = Path(args.audio_dir)
+    base_dir = Path(args.base_dir) if args.base_dir else discover_default_base_dir()
+    roots = [p for p in (audio_dir, base_dir) if p.exists()]
+    manifest = open_refreshed(args.manifest, *roots)
+    added = missing = 0
+    try:
+        for sid, youtube_id, raw in db.execute("SELECT id, youtube_id, transcript_raw FROM sermons ORDER BY id"):
+            raw = raw if isinstance(raw, str) else ""
+            if raw.startswith("[nas-audio]"):
+                path = resolve_marker(manifest, base_dir, raw)
+            else:
+                path = find_by_stem(manifest, audio_dir, youtube_id) if youtube_id else None
+            if not path:
+                missing += 1
+                continue
+            try:
+                add_file(index, path, sid)
+                added += 1
+            except RuntimeError as e:
+                print(f"[fail] sermon {sid} {path.name}: {e}")
+            if added % 100 == 0:
+                print(f"[index] {added} files", flush=True)
+    finally:
+        manifest.close()
+    print(f"[index] fingerprinted={added} no_audio={missing}")
+
+
+def print_report(index: sqlite3.Connection, db: sqlite3.Connection) -> None:
+    found = clusters(index)
+    for n, group in enumerate(found, 1):
+        print(f"\n[cluster {n}] {len(group)} files")
+        for item in group:
+            path, sid = index.execute("SELECT path, sermon_id FROM items WHERE id=?", (item,)).fetchone()
+            title = ""
+            if sid is not None:
+                row = db.execute("SELECT title FROM sermons WHERE id=?", (sid,)).fetchone()
+                title = row[0] if row else "?"
+            has = "transcript" if sid is not None and reusable_transcript(db, sid) else "-"
+            print(f"  sermon={sid} {has:<10} {title[:40]}  {path}")
+    print(f"\n[report] {len(found)} duplicate clusters, {sum(map(len, found))} files")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="오디오 지문 기반 중복 설교 탐지")
+    parser.add_argument("command", choices=["index", "report"])
+    parser.add_argument("--db", default="data/sermons.db")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="지문 인덱스 DB 경로")
+    parser.add_argument("--audio-dir", default=DEFAULT_AUDIO_DIR)
+    parser.add_argument("--base-dir", default="", help="NAS 설교 폴더 (기본: 자동 탐색)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    args = parser.parse_args()
+
+    index = open_index(args.index)
+    db = sqlite3.connect(args.db)
+    try:
+        if args.command == "index":
+            index_catalog(index, db, args)
+        else:
+            print_report(index, db)
+    finally:
+        db.close()
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
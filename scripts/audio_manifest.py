@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+오디오 파일 매니페스트 (SQLite 캐시).
+
+NAS 공유 폴더와 data/audio 를 os.scandir 로 한 번만 훑어서
+경로 / 크기 / mtime / 빠른 지문(fingerprint)을 data/audio_manifest.db 에 기록한다.
+이후 실행에서는 디렉터리 mtime 이 바뀐 폴더만 다시 나열하므로
+설교마다 네트워크 stat 을 날리지 않고 인덱스 조회로 끝난다.
+
+Usage:
+  python3 scripts/audio_manifest.py refresh
+  python3 scripts/audio_manifest.py refresh --full
+  python3 scripts/audio_manifest.py missing --db data/sermons.db
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+
+DEFAULT_MANIFEST = "data/audio_manifest.db"
+DEFAULT_AUDIO_DIR = "data/audio"
+AUDIO_EXTS = (".webm", ".mp4", ".m4a", ".mp3", ".wav", ".wma", ".aac", ".flac", ".ogg")
+FINGERPRINT_BYTES = 64 * 1024
+
+
+def discover_default_base_dir() -> Path:
+    docs = Path("/Users/johau/Documents")
+    candidates = sorted(docs.glob("99_*설교"))
+    if candidates:
+        return candidates[0]
+    return docs / "99_연희동~노량진설교"
+
+
+def open_manifest(path: str = DEFAULT_MANIFEST) -> sqlite3.Connection:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS files (
+          root TEXT NOT NULL,
+          rel_path TEXT NOT NULL,
+          norm_path TEXT NOT NULL,
+          rel_dir TEXT NOT NULL,
+          stem TEXT NOT NULL,
+          size INTEGER NOT NULL,
+          mtime_ns INTEGER NOT NULL,
+          fingerprint TEXT,
+          PRIMARY KEY (root, rel_path)
+        );
+        CREATE INDEX IF NOT EXISTS files_norm ON files(root, norm_path);
+        CREATE INDEX IF NOT EXISTS files_stem ON files(root, stem);
+        CREATE INDEX IF NOT EXISTS files_dir ON files(root, rel_dir);
+
+        CREATE TABLE IF NOT EXISTS dirs (
+          root TEXT NOT NULL,
+          rel_dir TEXT NOT NULL,
+          parent TEXT,
+          mtime_ns INTEGER NOT NULL,
+          PRIMARY KEY (root, rel_dir)
+        );
+        CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(root, parent);
+
+        CREATE TABLE IF NOT EXISTS roots (
+          root TEXT PRIMARY KEY,
+          refreshed_at REAL NOT NULL
+        );
+        """
+    )
+    return conn
+
+
+def quick_fingerprint(path: str, size: int) -> str:
+    """Hash of size + first/last 64KB. Cheap enough for a NAS, stable across renames."""
+    h = hashlib.blake2b(digest_size=12)
+    h.update(str(size).encode())
+    with open(path, "rb") as f:
+        h.update(f.read(FINGERPRINT_BYTES))
+        if size > FINGERPRINT_BYTES * 2:
+            f.seek(-FINGERPRINT_BYTES, os.SEEK_END)
+            h.update(f.read(FINGERPRINT_BYTES))
+    return h.hexdigest()
+
+
+def _norm(rel_path: str) -> str:
+    # macOS/NAS may hand back NFD names while Convex markers are NFC
+    return unicodedata.normalize("NFC", os.path.normpath(rel_path))
+
+
+def _rel(root: Path, path: str) -> str:
+    rel = os.path.relpath(path, root)
+    return "" if rel == "." else rel
+
+
+def _scan_dir(conn: sqlite3.Connection, root: Path, rel_dir: str, stats: dict) -> list[str]:
+    """List one directory, upsert its audio files, return child dir rel paths."""
+    abs_dir = root / rel_dir if rel_dir else root
+    key = str(root)
+    seen: set[str] = set()
+    child_dirs: list[str] = []
+
+    known = {
+        rel_path: (size, mtime_ns, fp)
+        for rel_path, size, mtime_ns, fp in conn.execute(
+            "SELECT rel_path, size, mtime_ns, fingerprint FROM files WHERE root=? AND rel_dir=?",
+            (key, rel_dir),
+        )
+    }
+
+    with os.scandir(abs_dir) as it:
+        for entry in it:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                child_dirs.append(_rel(root, entry.path))
+                continue
+            if not entry.name.lower().endswith(AUDIO_EXTS):
+                continue
+            st = entry.stat()
+            rel_path = _rel(root, entry.path)
+            seen.add(rel_path)
+            prev = known.get(rel_path)
+            if prev and prev[0] == st.st_size and prev[1] == st.st_mtime_ns and prev[2]:
+                continue
+            try:
+                fp = quick_fingerprint(entry.path, st.st_size)
+            except OSError:
+                fp = None
+            conn.execute(
+                "INSERT OR REPLACE INTO files "
+                "(root, rel_path, norm_path, rel_dir, stem, size, mtime_ns, fingerprint) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, rel_path, _norm(rel_path), rel_dir, _norm(Path(entry.name).stem),
+                 st.st_size, st.st_mtime_ns, fp),
+            )
+            stats["updated"] += 1
+
+    removed = [p for p in known if p not in seen]
+    for rel_path in removed:
+        conn.execute("DELETE FROM files WHERE root=? AND rel_path=?", (key, rel_path))
+    stats["removed"] += len(removed)
+
+    known_dirs = {
+        r for (r,) in conn.execute("SELECT rel_dir FROM dirs WHERE root=? AND parent=?", (key, rel_dir))
+    }
+    for gone in known_dirs - set(child_dirs):
+        _forget_dir(conn, key, gone)
+    stats["listed"] += 1
+    return child_dirs
+
+
+def _forget_dir(conn: sqlite3.Connection, key: str, rel_dir: str) -> None:
+    like = rel_dir.replace("%", r"\%").replace("_", r"\_") + os.sep + "%"
+    conn.execute("DELETE FROM files WHERE root=? AND (rel_dir=? OR rel_dir LIKE ? ESCAPE '\\')", (key, rel_dir, like))
+    conn.execute("DELETE FROM dirs WHERE root=? AND (rel_dir=? OR rel_dir LIKE ? ESCAPE '\\')", (key, rel_dir, like))
+
+
+def refresh_root(conn: sqlite3.Connection, root: Path, full: bool = False) -> dict:
+    """Walk `root`, relisting only directories whose mtime changed since last run.
+
+    A directory's mtime changes when entries are added, removed or renamed,
+    so unchanged directories reuse their stored file rows and child list.
+    Files rewritten in place without a rename need `full=True`.
+    """
+    root = root.resolve()
+    key = str(root)
+    stats = {"dirs": 0, "listed": 0, "updated": 0, "removed": 0}
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        abs_dir = root / rel_dir if rel_dir else root
+        try:
+            mtime_ns = os.stat(abs_dir).st_mtime_ns
+        except FileNotFoundError:
+            _forget_dir(conn, key, rel_dir)
+            continue
+        stats["dirs"] += 1
+        row = conn.execute("SELECT mtime_ns FROM dirs WHERE root=? AND rel_dir=?", (key, rel_dir)).fetchone()
+        if not full and row and row[0] == mtime_ns:
+            children = [
+                r for (r,) in conn.execute("SELECT rel_dir FROM dirs WHERE root=? AND parent=?", (key, rel_dir))
+            ]
+        else:
+            children = _scan_dir(conn, root, rel_dir, stats)
+        parent = None if rel_dir == "" else os.path.dirname(rel_dir)
+        conn.execute(
+            "INSERT OR REPLACE INTO dirs (root, rel_dir, parent, mtime_ns) VALUES (?, ?, ?, ?)",
+            (key, rel_dir, parent, mtime_ns),
+        )
+        stack.extend(children)
+    conn.execute("INSERT OR REPLACE INTO roots (root, refreshed_at) VALUES (?, ?)", (key, time.time()))
+    conn.commit()
+    return stats
+
+
+def open_refreshed(path: str, *roots: Path) -> sqlite3.Connection:
+    """Open the manifest and bring the given roots up to date (cheap when unchanged)."""
+    conn = open_manifest(path)
+    for root in roots:
+        if root.exists():
+            stats = refresh_root(conn, root)
+            print(f"[manifest] {root} listed={stats['listed']}/{stats['dirs']} updated={stats['updated']}")
+    return conn
+
+
+def lookup(conn: sqlite3.Connection, root: Path, rel_path: str) -> Path | None:
+    """Indexed replacement for `(root / rel_path).exists()`."""
+    root = root.resolve()
+    row = conn.execute(
+        "SELECT rel_path FROM files WHERE root=? AND norm_path=?",
+        (str(root), _norm(rel_path)),
+    ).fetchone()
+    return root / row[0] if row else None
+
+
+def find_by_stem(conn: sqlite3.Connection, root: Path, stem: str) -> Path | None:
+    """Indexed replacement for probing `<stem>.webm/.mp4/...` one extension at a time."""
+    root = root.resolve()
+    row = conn.execute(
+        "SELECT rel_path FROM files WHERE root=? AND stem=? ORDER BY size DESC LIMIT 1",
+        (str(root), _norm(stem)),
+    ).fetchone()
+    return root / row[0] if row else None
+
+
+def probe_stem(root: Path, stem: str) -> Path | None:
+    """Unindexed fallback for find_by_stem (--no-manifest): one exists() per AUDIO_EXTS."""
+    return next((p for ext in AUDIO_EXTS if (p := root / f"{stem}{ext}").exists()), None)
+
+
+def resolve_marker(conn: sqlite3.Connection, base_dir: Path, marker_text: str) -> Path | None:
+    prefix = "[nas-audio] "
+    if not marker_text.startswith(prefix):
+        return None
+    return lookup(conn, base_dir, marker_text[len(prefix):].strip())
+
+
+def missing_audio(conn: sqlite3.Connection, db: str, base_dir: Path, audio_dir: Path) -> list[tuple]:
+    """Sermons in sermons.db with no matching manifest entry — one joined query."""
+    conn.execute("ATTACH DATABASE ? AS sermons_db", (db,))
+    try:
+        return conn.execute(
+            """
+            SELECT s.id, s.youtube_id, s.title FROM sermons_db.sermons s
+            WHERE CASE
+              WHEN s.transcript_raw LIKE '[nas-audio] %' THEN NOT EXISTS (
+                SELECT 1 FROM files f WHERE f.root=? AND f.norm_path=trim(substr(s.transcript_raw, 13)))
+              WHEN s.youtube_id NOT LIKE 'nas99-%' THEN NOT EXISTS (
+                SELECT 1 FROM files f WHERE f.root=? AND f.stem=s.youtube_id)
+              ELSE 0
+            END
+            ORDER BY s.id
+            """,
+            (str(base_dir.resolve()), str(audio_dir.resolve())),
+        ).fetchall()
+    finally:
+        conn.execute("DETACH DATABASE sermons_db")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="오디오 파일 매니페스트 관리")
+    parser.add_argument("command", choices=["refresh", "missing"])
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--base-dir", default="", help="NAS 설교 폴더 (기본: 자동 탐색)")
+    parser.add_argument("--audio-dir", default=DEFAULT_AUDIO_DIR)
+    parser.add_argument("--db", default="data/sermons.db")
+    parser.add_argument("--full", action="store_true", help="디렉터리 mtime 무시하고 전부 다시 나열")
+    args = parser.parse_args()
+
+    base_dir = Path(args.base_dir) if args.base_dir else discover_default_base_dir()
+    audio_dir = Path(args.audio_dir)
+    conn = open_manifest(args.manifest)
+    try:
+        if args.command == "refresh":
+            for root in (base_dir, audio_dir):
+                if not root.exists():
+                    print(f"[skip] root not found: {root}")
+                    continue
+                t0 = time.time()
+                stats = refresh_root(conn, root, full=args.full)
+                print(
+                    f"[refresh] {root} dirs={stats['dirs']} listed={stats['listed']} "
+                    f"updated={stats['updated']} removed={stats['removed']} {time.time() - t0:.1f}s"
+                )
+        else:
+            rows = missing_audio(conn, args.db, base_dir, audio_dir)
+            for sid, yt_id, title in rows:
+                print(f"  [{sid}] {yt_id} {title[:50]}")
+            print(f"[missing] {len(rows)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
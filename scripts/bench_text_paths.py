@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+텍스트 핫패스 마이크로 벤치마크 + 회귀 검사.
+
+스캔/백필은 전체 코퍼스(설교 약 3,900편, 청크 약 61k개)에 대해 아래 함수를 돌린다.
+같은 크기의 합성 한국어 코퍼스를 만들어 각 함수의 ops/s 와 메모리 할당량
+(tracemalloc peak)을 재고, 커밋된 기준값(bench_baseline.json)과 비교해
+허용 범위(--tolerance)를 넘게 느려지거나 메모리를 더 쓰면 exit 1.
+
+절대 ops/s 는 같은 머신에서도 실행마다(터보/발열/이웃 부하) 수십 % 흔들리므로,
+같은 프로세스에서 고정된 순수 파이썬 보정 루프를 반복 사이사이에 돌려
+"보정 루프 대비 상대 속도"(벤치 5회 중앙값 / 보정 중앙값)로 비교한다.
+보정 루프가 모든 경로의 흔들림을 지우지는 못하므로 기준값은 새 프로세스 5라운드의 중앙값과
+흔들림 폭(noise = (max-min)/중앙값)을 같이 저장하고, 경로마다 허용 폭은 --tolerance 와 noise 중 큰 쪽이다.
+보정값이 없는 옛 기준값과는 참고용으로만 비교한다.
+
+- chunk_text            (sermon_db)
+- noise_score           (transcript_quality)
+- is_hallucination      (transcript_quality)
+- parse_whisper_output  (whisper_segments, `[hh:mm:ss.mmm --> hh:mm:ss.mmm]   텍스트` 줄)
+- asr_correct           (asr_corrections, 컴파일된 asrPatterns.ts)
+- update_db             (in-memory sqlite, 설교 1000편, ASR 교정 포함)
+
+오프라인, 약 1분 반 (--quick 은 1분 안팎, --update-baseline 은 5라운드라 약 7분). 외부 의존성 없음.
+
+Usage:
+  python3 scripts/bench_text_paths.py
+  python3 scripts/bench_text_paths.py --quick
+  python3 scripts/bench_text_paths.py --update-baseline
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from asr_corrections import correct as asr_correct
+from transcript_quality import is_hallucination, noise_score
+from sermon_db import chunk_text, update_db
+from whisper_segments import parse_whisper_output
+
+BASELINE = Path(__file__).with_name("bench_baseline.json")
+N_SERMONS = 3900
+UPDATE_DB_SERMONS = 1000
+# 실제 전사문 평균 길이 (공백 포함) — chunk_text 결과가 약 61k 청크가 되도록 맞춘 값
+AVG_CHARS = 10_200
+
+WORDS = (
+    "하나님 예수님 성령 말씀 은혜 믿음 사랑 소망 구원 십자가 부활 영생 교회 성도 여러분 "
+    "우리 오늘 본문 기도 찬송 예배 회개 축복 생명 진리 복음 천국 세상 마음 영혼 "
+    "이스라엘 모세 다윗 바울 베드로 아브라함 요한 주님 아버지 아들 백성 제자 선지자"
+).split()
+ENDINGS = ["입니다.", "합니다.", "있습니다.", "됩니다.", "아멘.", "하시기 바랍니다.", "했어요.", "입니까?", "하십시오!"]
+PARTICLES = ["은", "는", "이", "가", "을", "를", "에게", "께서", "의", "으로", "와"]
+
+
+# ─── 합성 코퍼스 ───
+
+def make_sentences(rng: random.Random, n: int = 3000) -> list[str]:
+    out = []
+    for _ in range(n):
+        words = [w + rng.choice(PARTICLES) for w in rng.choices(WORDS, k=rng.randint(4, 12))]
+        if rng.random() < 0.05:
+            words.insert(rng.randrange(len(words)), str(rng.randint(0, 3)))  # 숫자 노이즈
+        out.append(" ".join(words) + " " + rng.choice(ENDINGS))
+    return out
+
+
+def make_corpus(n: int = N_SERMONS, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    sentences = make_sentences(rng)
+    avg_len = sum(map(len, sentences)) / len(sentences) + 1
+    corpus = []
+    for i in range(n):
+        k = max(5, int(rng.gauss(AVG_CHARS, AVG_CHARS * 0.35) / avg_len))
+        if i % 20 == 0:
+            # 5% 는 환각 루프 (같은 짧은 구절 반복)
+            corpus.append(" ".join([rng.choice(sentences)] * k))
+        else:
+            corpus.append(" ".join(rng.choices(sentences, k=k)))
+    return corpus
+
+
+def to_whisper_stdout(text: str) -> str:
+    lines, t = [], 0.0
+    for sent in text.split(". "):
+        end = t + 2.0 + len(sent) / 12
+        lines.append(f"[{_ts(t)} --> {_ts(end)}]   {sent}.")  # whisper-cli 기본 출력 모양
+        t = end
+    return "\n".join(lines)
+
+
+def _ts(sec: float) -> str:
+    h, rem = divmod(sec, 3600)
+    m, s = divmod(rem, 60)
+    return f"{int(h):02d}:{int(m):02d}:{s:06.3f}"
+
+
+def fresh_db() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE sermons (id INTEGER PRIMARY KEY, youtube_id TEXT, title TEXT,
+                              transcript_raw TEXT, transcript_corrected TEXT);
+        CREATE TABLE chunks (id INTEGER PRIMARY KEY, sermon_id INTEGER, chunk_index INTEGER, content TEXT);
+        CREATE INDEX idx_chunks_sermon ON chunks(sermon_id);
+    """)
+    conn.executemany("INSERT INTO sermons (id) VALUES (?)", ((i,) for i in range(UPDATE_DB_SERMONS)))
+    conn.commit()
+    return conn
+
+
+# ─── 측정 ───
+
+CALIBRATION_ROUNDS = 200_000
+RETRY_REPEAT = 5
+BASELINE_ROUNDS = 5   # --update-baseline: 새 프로세스로 벤치 전체를 이만큼 돌려 중앙값과 흔들림 폭을 기록
+
+
+def calibrate(repeat: int = 5) -> float:
+    """Ops/s of a fixed pure-Python loop (dict/str/int work), median of `repeat` — the machine-speed yardstick."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        d: dict[str, int] = {}
+        for i in range(CALIBRATION_ROUNDS):
+            k = "k" + str(i & 1023)
+            d[k] = d.get(k, 0) + i
+        times.append(time.perf_counter() - t0)
+    return CALIBRATION_ROUNDS / statistics.median(times)
+
+
+def measure(run: Callable[[], int], repeat: int, alloc_run: Callable[[], int]) -> dict:
+    best = float("inf")
+    rates, calibs = [], [calibrate(3)]
+    ops = 0
+    for _ in range(repeat):
+        # 보정 루프를 반복 사이사이에 돌려 이 벤치를 재는 동안의 머신 속도를 표본으로 모은다.
+        # 반복마다 나누면 짧은 보정 루프 자체의 흔들림이 그대로 더해지므로 양쪽 중앙값끼리 나눈다
+        gc.collect()
+        t0 = time.perf_counter()
+        ops = run()
+        elapsed = time.perf_counter() - t0
+        calibs.append(calibrate(3))
+        best = min(best, elapsed)
+        rates.append(ops / elapsed)
+    gc.collect()
+    tracemalloc.start()
+    alloc_run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "ops": ops,
+        "seconds": round(best, 4),
+        "ops_per_sec": round(ops / best, 1),
+        # 보정 루프 100만 회당 처리량 (중앙값 / 중앙값) — 최고값은 한 번 운 좋은 반복에 끌려간다
+        "relative": round(statistics.median(rates) / statistics.median(calibs) * 1e6, 1),
+        # 호출 하나가 잡는 최대 메모리 (결과를 버리므로 가장 큰 입력 한 건의 작업 메모리에 가깝다)
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def build_benches(corpus: list[str]) -> dict[str, tuple[Callable[[], int], Callable[[], int]]]:
+    sample = corpus[::20]  # tracemalloc 은 느리므로 5% 표본으로 할당량만 잰다
+    stdouts = [to_whisper_stdout(t) for t in corpus[:UPDATE_DB_SERMONS]]
+    # 파서가 타임스탬프 줄의 텍스트를 버리면 빈 결과만 재게 된다
+    assert all(parse_whisper_output(s) for s in stdouts[:20]), "parse_whisper_output returned empty text"
+
+    def over(fn, items):
+        def run() -> int:
+            for x in items:
+                fn(x)
+            return len(items)
+        return run
+
+    def chunks_run(items):
+        def run() -> int:
+            return sum(len(chunk_text(t)) for t in items)
+        return run
+
+    def update_run(items):
+        def run() -> int:
+            conn = fresh_db()
+            for sid, text in enumerate(items):
+                update_db(conn, sid, text)
+            conn.close()
+            return len(items)
+        return run
+
+    db_items = corpus[:UPDATE_DB_SERMONS]
+    return {
+        "chunk_text": (chunks_run(corpus), chunks_run(sample)),
+        "noise_score": (over(noise_score, corpus), over(noise_score, sample)),
+        "is_hallucination": (over(is_hallucination, corpus), over(is_hallucination, sample)),
+        "asr_correct": (over(asr_correct, db_items), over(asr_correct, db_items[::20])),
+        "parse_whisper_output": (over(parse_whisper_output, stdouts), over(parse_whisper_output, stdouts[::20])),
+        "update_db": (update_run(db_items), update_run(db_items[::20])),
+    }
+
+
+def path_tolerance(b: dict, tolerance: float) -> float:
+    """Gate width for one path: --tolerance, widened to the cross-process spread of the baseline rounds.
+
+    보정 루프는 순수 파이썬 dict/str 작업이라 sqlite(update_db)나 큰 할당(is_hallucination)이
+    머신 상태에 반응하는 방식과 완전히 같지 않다. 그 차이가 경로마다의 흔들림으로 드러나므로
+    같은 트리에서 잰 max-min 폭보다 좁게 잡으면 평소 실행이 걸린다.
+    """
+    return max(tolerance, b.get("noise", 0.0))
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> tuple[list[str], list[str]]:
+    """(regressions that fail the gate, advisory notes)."""
+    regressions, notes = [], []
+    for name, r in results.items():
+        b = baseline.get("results", {}).get(name)
+        if not b:
+            continue
+        if "relative" in b:
+            tol = path_tolerance(b, tolerance)
+            if r["relative"] < b["relative"] * (1 - tol):
+                regressions.append(
+                    f"{name}: relative {r['relative']:.0f} < baseline {b['relative']:.0f} -{tol:.0%} "
+                    f"({r['ops_per_sec']:.0f} vs {b['ops_per_sec']:.0f} ops/s)"
+                )
+        elif r["ops_per_sec"] < b["ops_per_sec"] * (1 - tolerance):
+            notes.append(f"{name}: {r['ops_per_sec']:.0f} ops/s < baseline {b['ops_per_sec']:.0f} (보정값 없는 기준, 참고용)")
+        if r["peak_kb"] > b["peak_kb"] * (1 + tolerance) + 1:
+            regressions.append(f"{name}: peak {r['peak_kb']:.0f}KB > baseline {b['peak_kb']:.0f}KB")
+    return regressions, notes
+
+
+def run_benches(args) -> tuple[dict, dict]:
+    """(결과, 벤치) — 벤치는 게이트에 걸린 경로를 다시 잴 때 쓴다."""
+    out = sys.stderr if args.emit_json else sys.stdout
+    t0 = time.perf_counter()
+    corpus = make_corpus()
+    print(f"[corpus] {len(corpus)} transcripts, {sum(map(len, corpus)) / 1e6:.1f}M chars "
+          f"({time.perf_counter() - t0:.1f}s)", file=out)
+
+    only = {x.strip() for x in args.only.split(",") if x.strip()}
+    benches = build_benches(corpus)
+    results = {}
+    for name, (run, alloc_run) in benches.items():
+        if only and name not in only:
+            continue
+        r = measure(run, 3 if args.quick else 5, alloc_run)
+        results[name] = r
+        print(f"  {name:<22} {r['ops']:>7} ops  {r['seconds']:>7.3f}s  "
+              f"{r['ops_per_sec']:>10.0f} ops/s  rel {r['relative']:>8.0f}  peak {r['peak_kb']:.0f}KB", file=out)
+    return results, benches
+
+
+def baseline_rounds(args) -> dict:
+    """BASELINE_ROUNDS 번을 각각 새 인터프리터에서 돌려 경로별 중앙값 라운드 + noise.
+
+    한 프로세스 안의 라운드끼리는 서로 비슷하게 나오지만(같은 힙 배치, 같은 CPU 코어),
+    프로세스가 바뀌면 같은 트리에서도 상대 속도가 ±20% 넘게 달라진다. 게이트는 매번 새
+    프로세스로 돌므로 기준값의 흔들림 폭도 프로세스 단위로 재야 평소 실행이 걸리지 않는다.
+    """
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--emit-json"]
+    if args.quick:
+        cmd.append("--quick")
+    if args.only:
+        cmd += ["--only", args.only]
+    rounds: dict[str, list[dict]] = {}
+    for n in range(BASELINE_ROUNDS):
+        print(f"[round {n + 1}/{BASELINE_ROUNDS}]", flush=True)
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True)
+        for name, r in json.loads(proc.stdout.splitlines()[-1]).items():
+            rounds.setdefault(name, []).append(r)
+    results = {}
+    for name, rs in rounds.items():
+        rels = sorted(r["relative"] for r in rs)
+        mid = rels[len(rels) // 2]
+        results[name] = dict(next(r for r in rs if r["relative"] == mid))
+        results[name]["noise"] = round((rels[-1] - rels[0]) / mid, 3)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="텍스트 핫패스 벤치마크")
+    parser.add_argument("--quick", action="store_true", help="반복 3회 (기본 5회의 중앙값)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="허용 회귀 비율 (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--update-baseline", action="store_true", help="현재 결과를 기준값으로 저장")
+    parser.add_argument("--only", default="", help="쉼표로 구분된 벤치 이름만 실행")
+    parser.add_argument("--emit-json", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.update_baseline:
+        results, benches = baseline_rounds(args), {}
+    else:
+        results, benches = run_benches(args)
+        if args.emit_json:
+            print(json.dumps(results))
+            return
+    print(f"[total] {time.perf_counter() - t0:.1f}s")
+
+    machine = f"{platform.machine()} {platform.python_implementation()} {platform.python_version()}"
+    if args.update_baseline:
+        Path(args.baseline).write_text(
+            json.dumps({"machine": machine, "results": results}, indent=2, ensure_ascii=False) + "\n",
+            encoding="utf-8",
+        )
+        print(f"[baseline] written to {args.baseline}")
+        return
+
+    path = Path(args.baseline)
+    if not path.exists():
+        print(f"[baseline] {path} 없음 — --update-baseline 으로 생성")
+        return
+    baseline = json.loads(path.read_text(encoding="utf-8"))
+    if baseline.get("machine") != machine:
+        print(f"[warn] baseline machine differs ({baseline.get('machine')}) — 상대 속도로 비교")
+    regressions, notes = compare(results, baseline, args.tolerance)
+    # 한 번 느리게 나온 것은 이웃 부하일 수 있다 → 걸린 벤치만 다시 재서 좋은 쪽으로 판정
+    suspects = {line.split(":", 1)[0] for line in regressions}
+    for name in suspects:
+        run, alloc_run = benches[name]
+        retry = measure(run, RETRY_REPEAT, alloc_run)
+        print(f"  [retry] {name:<14} {retry['ops_per_sec']:>10.0f} ops/s  rel {retry['relative']:>8.0f}")
+        if retry["relative"] > results[name]["relative"]:
+            results[name] = retry
+    if suspects:
+        regressions, notes = compare(results, baseline, args.tolerance)
+    for line in notes:
+        print(f"[note] {line}")
+    for line in regressions:
+        print(f"[regression] {line}")
+    if regressions:
+        sys.exit(1)
+    print(f"[ok] no regressions beyond {args.tolerance:.0%} (경로별 기준 noise 가 더 크면 그만큼)")
+
+
+if __name__ == "__main__":
+    main()
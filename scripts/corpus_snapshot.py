@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+sermons.db 컬럼형 스냅샷 (Parquet) 내보내기 / 불러오기.
+
+migrate-to-convex.ts 처럼 행 단위로 옮기면 전체 복사가 오래 걸린다.
+sermons / chunks (임베딩 테이블이 있으면 그것도) 를 row group 단위로 스트리밍해서
+zstd 압축 Parquet 으로 쓰고, 불러올 때는 executemany 일괄 삽입 후 인덱스와 FTS 를 마지막에 만든다.
+메모리는 row group 하나 분량만 쓴다.
+
+- 전사문은 평문으로 내보낸다 (transcript_codec 압축 BLOB 은 decode, 불러오는 DB 에 사전이 있으면 다시 encode)
+- 증분 스냅샷: 변경 기록(snapshot_changes) 으로 바뀐 설교를 찾는다
+  · 첫 export 때 sermons / chunks 에 트리거를 걸어 삽입·수정·삭제마다 설교 id 를 남긴다
+    (chunks.id 는 AUTOINCREMENT 가 아니라 update_db 가 지운 id 를 다시 쓰므로 max id 로는 못 잡는다)
+  · 직전 스냅샷의 변경 seq 이후 바뀐 설교의 sermons 행 + 청크 전체 (+ 그 청크의 임베딩)
+  · 그 사이 지워진 설교는 manifest 의 deleted 로 → 불러올 때 청크/FTS/임베딩까지 지운다
+  · 불러올 때 증분에 들어있는 설교의 기존 청크를 지우고 교체
+- 적용한 스냅샷은 대상 DB 의 snapshot_applied 에 기록, 증분은 바로 앞 스냅샷이 적용돼 있어야 한다
+- pyarrow 필요 (pip install pyarrow)
+
+Usage:
+  python3 scripts/corpus_snapshot.py export --db data/sermons.db --out data/snapshots
+  python3 scripts/corpus_snapshot.py export --db data/sermons.db --out data/snapshots --incremental
+  python3 scripts/corpus_snapshot.py load data/snapshots/0001-full-* data/snapshots/0002-incr-* --db /tmp/copy.db
+  python3 scripts/corpus_snapshot.py list --out data/snapshots
+"""
+
+import argparse
+import json
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+
+from sermon_db import create_chunk_triggers, drop_chunk_triggers, rebuild_fts_and_triggers
+from transcript_codec import COLUMNS as TRANSCRIPT_COLUMNS, TranscriptCodec
+
+DEFAULT_OUT = "data/snapshots"
+CORE_TABLES = ("sermons", "chunks")
+EMBEDDING_TABLES = ("vec_chunks", "chunk_embeddings")
+ROW_GROUP = 5000
+ROW_GROUPS = {"sermons": 200}  # 설교 한 행이 전사문 2벌(수십 KB)이라 작게
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("pyarrow 가 필요합니다: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+# ─── 스키마 ───
+
+def _columns(conn: sqlite3.Connection, table: str) -> list[tuple[str, str]]:
+    return [(row[1], (row[2] or "").upper()) for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _arrow_type(pa, table: str, name: str, decl: str):
+    if table == "sermons" and name in TRANSCRIPT_COLUMNS:
+        return pa.string()
+    if "INT" in decl:
+        return pa.int64()
+    if any(t in decl for t in ("REAL", "FLOA", "DOUB")) and "[" not in decl:
+        return pa.float64()
+    if "BLOB" in decl or "[" in decl:
+        return pa.binary()  # 임베딩 벡터 (float[1024] 등) 는 원래 바이트 그대로
+    return pa.string()
+
+
+def _readable(conn: sqlite3.Connection, table: str) -> bool:
+    try:
+        conn.execute(f"SELECT * FROM {table} LIMIT 1").fetchall()
+        return True
+    except sqlite3.OperationalError:
+        return False  # sqlite-vec 같은 확장 없이 못 읽는 가상 테이블
+
+
+def snapshot_tables(conn: sqlite3.Connection) -> list[str]:
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    missing = [t for t in CORE_TABLES if t not in names]
+    if missing:
+        raise SystemExit(f"테이블 없음: {', '.join(missing)}")
+    extra = [t for t in EMBEDDING_TABLES if t in names and _readable(conn, t)]
+    return [*CORE_TABLES, *extra]
+
+
+def _schema_sql(conn: sqlite3.Connection, table: str) -> tuple[str, list[str]]:
+    create = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()[0]
+    indexes = [
+        r[0] for r in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL", (table,)
+        )
+    ]
+    return create, indexes
+
+
+# ─── 내보내기 ───
+
+def list_snapshots(out_dir: Path) -> list[dict]:
+    found = []
+    for manifest in sorted(out_dir.glob("*/manifest.json")):
+        found.append(json.loads(manifest.read_text()))
+    return found
+
+
+# ─── 변경 기록 ───
+
+_CHANGE_TRIGGERS = (
+    ("snapshot_log_sermons_ai", "AFTER INSERT ON sermons", "new.id"),
+    ("snapshot_log_sermons_au", "AFTER UPDATE ON sermons", "new.id"),
+    ("snapshot_log_sermons_ad", "AFTER DELETE ON sermons", "old.id"),
+    ("snapshot_log_chunks_ai", "AFTER INSERT ON chunks", "new.sermon_id"),
+    ("snapshot_log_chunks_au", "AFTER UPDATE ON chunks", "new.sermon_id"),  # correct-chunks.ts 제자리 수정
+    ("snapshot_log_chunks_ad", "AFTER DELETE ON chunks", "old.sermon_id"),
+)
+
+
+def ensure_change_log(conn: sqlite3.Connection) -> None:
+    """Install the change log that incremental snapshots read (idempotent)."""
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS snapshot_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, sermon_id INTEGER NOT NULL)"
+    )
+    for name, event, sermon_id in _CHANGE_TRIGGERS:
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN "
+            f"INSERT INTO snapshot_changes (sermon_id) VALUES ({sermon_id}); END"
+        )
+    conn.commit()
+
+
+_CHANGED = "SELECT DISTINCT sermon_id FROM snapshot_changes WHERE seq > ? AND seq <= ?"
+
+
+def _select(conn: sqlite3.Connection, table: str, since: dict | None, watermark: dict) -> tuple[str, tuple]:
+    if since is None:
+        return f"SELECT * FROM {table} WHERE rowid <= ? ORDER BY rowid", (watermark[table],)
+    window = (since["changes"], watermark["changes"])
+    if table == "sermons":
+        return f"SELECT * FROM sermons WHERE id IN ({_CHANGED}) ORDER BY id", window
+    if table == "chunks":
+        return f"SELECT * FROM chunks WHERE sermon_id IN ({_CHANGED}) ORDER BY id", window
+    if "chunk_id" in {name for name, _ in _columns(conn, table)}:
+        return (
+            f"SELECT * FROM {table} WHERE chunk_id IN "
+            f"(SELECT id FROM chunks WHERE sermon_id IN ({_CHANGED})) ORDER BY rowid",
+            window,
+        )
+    return (
+        f"SELECT * FROM {table} WHERE rowid > ? AND rowid <= ? ORDER BY rowid",
+        (since.get(table, 0), watermark[table]),
+    )
+
+
+def _write_table(conn: sqlite3.Connection, table: str, sql: str, params: tuple, path: Path) -> int:
+    pa, pq = _pyarrow()
+    cols = _columns(conn, table)
+    schema = pa.schema([(name, _arrow_type(pa, table, name, decl)) for name, decl in cols])
+    codec = TranscriptCodec(conn) if table == "sermons" else None
+    decode_at = [i for i, (name, _) in enumerate(cols) if codec and name in TRANSCRIPT_COLUMNS]
+    rows = 0
+    cur = conn.execute(sql, params)
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        while True:
+            batch = cur.fetchmany(ROW_GROUPS.get(table, ROW_GROUP))
+            if not batch:
+                break
+            columns = [list(c) for c in zip(*batch)]
+            for i in decode_at:
+                columns[i] = [codec.decode(v) for v in columns[i]]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+            ))
+            rows += len(batch)
+    return rows
+
+
+def export_snapshot(conn: sqlite3.Connection, out_dir: Path, incremental: bool = False) -> dict:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    previous = list_snapshots(out_dir)
+    if incremental and not previous:
+        raise SystemExit(f"{out_dir} 에 이전 스냅샷이 없습니다 (먼저 전체 스냅샷)")
+    since = previous[-1]["watermark"] if incremental else None
+    if since is not None and "changes" not in since:
+        raise SystemExit(f"{previous[-1]['name']} 에 변경 기록 워터마크가 없습니다 (전체 스냅샷을 새로 뜨세요)")
+    ensure_change_log(conn)
+    kind = "incr" if incremental else "full"
+    name = f"{len(previous) + 1:04d}-{kind}-{time.strftime('%Y%m%dT%H%M%S')}"
+    tmp = out_dir / f".{name}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+
+    tables = snapshot_tables(conn)
+    manifest = {
+        "name": name,
+        "kind": kind,
+        "base": previous[-1]["name"] if incremental else None,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "watermark": {},
+        "tables": {},
+        "deleted": [],
+    }
+    conn.execute("BEGIN")  # 읽기 트랜잭션 하나로 → 워터마크와 내용이 같은 시점
+    try:
+        for table in tables:
+            manifest["watermark"][table] = conn.execute(f"SELECT coalesce(max(rowid), 0) FROM {table}").fetchone()[0]
+        watermark = manifest["watermark"]
+        watermark["changes"] = conn.execute("SELECT coalesce(max(seq), 0) FROM snapshot_changes").fetchone()[0]
+        if since is not None:
+            if watermark["changes"] < since["changes"]:
+                raise SystemExit("snapshot_changes 가 직전 스냅샷보다 뒤로 갔습니다 (전체 스냅샷을 새로 뜨세요)")
+            manifest["deleted"] = [r[0] for r in conn.execute(
+                f"SELECT sermon_id FROM ({_CHANGED}) WHERE sermon_id NOT IN (SELECT id FROM sermons) ORDER BY 1",
+                (since["changes"], watermark["changes"]),
+            )]
+        for table in tables:
+            t0 = time.time()
+            sql, params = _select(conn, table, since, watermark)
+            rows = _write_table(conn, table, sql, params, tmp / f"{table}.parquet")
+            create, indexes = _schema_sql(conn, table)
+            manifest["tables"][table] = {"rows": rows, "create": create, "indexes": indexes}
+            size = (tmp / f"{table}.parquet").stat().st_size
+            print(f"[export] {table}: {rows} rows, {size / 1e6:.1f}MB, {time.time() - t0:.1f}s", flush=True)
+    finally:
+        conn.rollback()
+    if manifest["deleted"]:
+        print(f"[export] deleted sermons: {len(manifest['deleted'])}")
+    (tmp / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2))
+    tmp.rename(out_dir / name)
+    return manifest
+
+
+# ─── 불러오기 ───
+
+def _ensure_applied_table(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS snapshot_applied (name TEXT PRIMARY KEY, kind TEXT, applied_at TEXT)")
+
+
+def _delete_sermon_chunks(conn: sqlite3.Connection, sermon_ids: list, fts: bool) -> None:
+    """Remove the chunks of these sermons together with their FTS rows and embeddings."""
+    marks = ",".join("?" * len(sermon_ids))
+    chunk_ids = f"SELECT id FROM chunks WHERE sermon_id IN ({marks})"
+    if fts:
+        conn.execute(f"DELETE FROM chunks_fts WHERE rowid IN ({chunk_ids})", sermon_ids)
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for table in EMBEDDING_TABLES:
+        if table in existing and _readable(conn, table) and "chunk_id" in {n for n, _ in _columns(conn, table)}:
+            conn.execute(f"DELETE FROM {table} WHERE chunk_id IN ({chunk_ids})", sermon_ids)
+    conn.execute(f"DELETE FROM chunks WHERE sermon_id IN ({marks})", sermon_ids)
+
+
+def _insert_batches(conn: sqlite3.Connection, table: str, path: Path, incremental: bool, fts: bool) -> int:
+    _, pq = _pyarrow()
+    codec = TranscriptCodec(conn) if table == "sermons" else None
+    pf = pq.ParquetFile(path)
+    names = pf.schema_arrow.names
+    encode_at = [i for i, name in enumerate(names) if codec and codec.enabled and name in TRANSCRIPT_COLUMNS]
+    sql = f"INSERT OR REPLACE INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+    rows = 0
+    for batch in pf.iter_batches(batch_size=ROW_GROUPS.get(table, ROW_GROUP)):
+        columns = [col.to_pylist() for col in batch.columns]
+        for i in encode_at:
+            columns[i] = [codec.encode(v) for v in columns[i]]
+        if incremental and table == "sermons":
+            # 증분에 들어온 설교는 청크 전체가 새로 오므로 기존 청크와 FTS 행, 임베딩을 지운다
+            _delete_sermon_chunks(conn, columns[names.index("id")], fts)
+        conn.executemany(sql, zip(*columns))
+        if fts and table == "chunks":
+            conn.executemany(
+                "INSERT INTO chunks_fts(rowid, content) VALUES (?, ?)",
+                zip(columns[names.index("id")], columns[names.index("content")]),
+            )
+        conn.commit()
+        rows += batch.num_rows
+    return rows
+
+
+def load_snapshot(conn: sqlite3.Connection, snap_dir: Path, force: bool = False) -> None:
+    manifest = json.loads((snap_dir / "manifest.json").read_text())
+    _ensure_applied_table(conn)
+    applied = {r[0] for r in conn.execute("SELECT name FROM snapshot_applied")}
+    if manifest["name"] in applied and not force:
+        print(f"[skip] {manifest['name']} already applied")
+        return
+    full = manifest["kind"] == "full"
+    if not full and manifest["base"] not in applied and not force:
+        raise SystemExit(f"{manifest['name']}: 기반 스냅샷 {manifest['base']} 이 먼저 적용돼야 합니다")
+
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    # chunks_ad 는 일반 FTS5 테이블에 'delete' 명령을 보내 오류가 나므로 지우기 전에 트리거부터 뗀다
+    drop_chunk_triggers(conn)
+    if full:
+        for table in manifest["tables"]:
+            if table in existing and conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                if not force:
+                    raise SystemExit(f"{table} 이 비어 있지 않습니다 (--force 로 덮어쓰기)")
+                conn.execute(f"DELETE FROM {table}")
+        conn.commit()
+
+    conn.execute("PRAGMA synchronous=OFF")
+    # 전체 적용: 인덱스/FTS 없이 넣고 마지막에 한 번에 만든다
+    # 증분 적용: 행 수가 적으므로 기존 인덱스를 쓰고 chunks_fts 도 바뀐 행만 직접 고친다
+    incremental_fts = not full and "chunks_fts" in existing
+    deferred_indexes: list[str] = []
+    for table, info in manifest["tables"].items():
+        if table not in existing:
+            conn.execute(info["create"])
+            deferred_indexes.extend(info["indexes"])
+        elif full:
+            for (name, sql) in conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL", (table,)
+            ).fetchall():
+                conn.execute(f"DROP INDEX {name}")
+                deferred_indexes.append(sql)
+    conn.commit()
+
+    deleted = manifest.get("deleted", [])
+    if deleted and not full:
+        for i in range(0, len(deleted), 500):
+            batch = deleted[i:i + 500]
+            _delete_sermon_chunks(conn, batch, incremental_fts)
+            conn.execute(f"DELETE FROM sermons WHERE id IN ({','.join('?' * len(batch))})", batch)
+        conn.commit()
+        print(f"[load] deleted sermons: {len(deleted)}")
+
+    for table in manifest["tables"]:
+        t0 = time.time()
+        rows = _insert_batches(conn, table, snap_dir / f"{table}.parquet", not full, incremental_fts)
+        print(f"[load] {table}: {rows} rows, {time.time() - t0:.1f}s", flush=True)
+
+    t0 = time.time()
+    for sql in deferred_indexes:
+        conn.execute(sql)
+    conn.commit()
+    if deferred_indexes:
+        print(f"[load] indexes: {len(deferred_indexes)}, {time.time() - t0:.1f}s")
+    if incremental_fts:
+        create_chunk_triggers(conn)
+    else:
+        t0 = time.time()
+        rebuild_fts_and_triggers(conn)
+        print(f"[load] fts: {time.time() - t0:.1f}s")
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.execute(
+        "INSERT OR REPLACE INTO snapshot_applied (name, kind, applied_at) VALUES (?, ?, ?)",
+        (manifest["name"], manifest["kind"], time.strftime("%Y-%m-%dT%H:%M:%S")),
+    )
+    conn.commit()
+
+
+# ─── CLI ───
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="sermons.db Parquet 스냅샷 내보내기/불러오기")
+    parser.add_argument("command", choices=["export", "load", "list"])
+    parser.add_argument("snapshots", nargs="*", help="load: 적용할 스냅샷 디렉터리 (순서대로)")
+    parser.add_argument("--db", default="data/sermons.db")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="스냅샷 디렉터리")
+    parser.add_argument("--incremental", action="store_true", help="직전 스냅샷 이후 바뀐 행만")
+    parser.add_argument("--force", action="store_true", help="load: 비어 있지 않은 테이블 덮어쓰기 / 순서 검사 생략")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for m in list_snapshots(Path(args.out)):
+            rows = ", ".join(f"{t}={info['rows']}" for t, info in m["tables"].items())
+            print(f"{m['name']}  {m['created_at']}  {rows}")
+        return
+
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    try:
+        if args.command == "export":
+            m = export_snapshot(conn, Path(args.out), args.incremental)
+            print(f"[done] {Path(args.out) / m['name']}")
+        else:
+            if not args.snapshots:
+                parser.error("load 할 스냅샷 디렉터리를 지정하세요")
+            for snap in args.snapshots:
+                load_snapshot(conn, Path(snap), args.force)
+                print(f"[done] {snap}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+부하 테스트용 가짜 ASR 백엔드 (whisper-cli / npx convex 대역).
+
+실제 whisper 시간을 쓰지 않고 update_db, FTS 유지, Convex 저장, 워커 풀을 시험하기 위해
+- 키(파일 이름+크기, 모델)가 같으면 항상 같은 한국어 설교풍 전사문을 만든다
+  (bench_text_paths 의 합성 문장, 초당 약 8자)
+- 일부는 whisper 처럼 뒤쪽이 한 문장 반복 루프로 망가지고 (is_hallucination),
+  일부는 " 1 2 3 " 숫자 노이즈가 섞인다 (noise_score) — large 가 아닌 모델은 두 배로 자주
+- 지연은 고정 오버헤드 + 오디오 길이 × RTF 만큼 sleep
+
+두 가지로 쓴다.
+  1) 파이썬에서: FakeAsr(...).transcribe(wav_path) / text_for(key, duration)  → load_test.py
+  2) PATH 대역: `fake_asr.py shims DIR` 가 DIR/whisper-cli, DIR/npx 를 만든다.
+     PATH=DIR:$PATH 로 기존 스크립트를 그대로 돌리면 whisper-cli 는 타임스탬프 줄을 출력하고
+     npx convex run 은 호출 크기만 기록하고 성공을 돌려준다. (ffmpeg 는 진짜가 필요)
+
+환경 변수 (shim 용): FAKE_ASR_RTF, FAKE_ASR_OVERHEAD, FAKE_ASR_LOOP_RATE, FAKE_ASR_DIGIT_RATE,
+                    FAKE_ASR_SEED, FAKE_CONVEX_LATENCY, FAKE_CONVEX_LOG
+
+Usage:
+  python3 scripts/fake_asr.py shims /tmp/fakebin
+  PATH=/tmp/fakebin:$PATH FAKE_ASR_RTF=0.01 python3 scripts/retranscribe_bad.py --workers 4
+  python3 scripts/fake_asr.py sample --duration 600        # 생성 텍스트 확인
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import stat
+import sys
+import time
+import wave
+from functools import lru_cache
+from pathlib import Path
+
+from bench_text_paths import _ts, make_sentences
+
+CHARS_PER_SEC = 8.0
+RTF = 0.05          # large-v3 Metal 대략치는 0.1~0.3, 부하 테스트 기본은 빠르게
+OVERHEAD_SEC = 0.2
+LOOP_RATE = 0.05
+DIGIT_RATE = 0.05
+
+
+@lru_cache(maxsize=4)
+def _sentences(seed: int) -> list[str]:
+    return make_sentences(random.Random(seed), 3000)
+
+
+def wav_seconds(path: str) -> float:
+    try:
+        with wave.open(path, "rb") as w:
+            return w.getnframes() / w.getframerate()
+    except (wave.Error, EOFError, OSError):
+        # wav 가 아니면 크기로 대충 (16kHz mono s16)
+        return max(1.0, os.path.getsize(path) / 32000) if os.path.exists(path) else 60.0
+
+
+class FakeAsr:
+    """Deterministic Korean transcript generator with whisper-like failure modes and latency."""
+
+    def __init__(
+        self,
+        model: str = "ggml-large-v3.bin",
+        rtf: float = RTF,
+        overhead: float = OVERHEAD_SEC,
+        loop_rate: float = LOOP_RATE,
+        digit_rate: float = DIGIT_RATE,
+        seed: int = 7,
+    ) -> None:
+        self.model = Path(model).name
+        self.rtf = rtf
+        self.overhead = overhead
+        scale = 1.0 if "large" in self.model else 2.0
+        self.loop_rate = min(1.0, loop_rate * scale)
+        self.digit_rate = min(1.0, digit_rate * scale)
+        self.seed = seed
+
+    def _rng(self, key: str) -> random.Random:
+        digest = hashlib.blake2b(f"{self.seed}:{self.model}:{key}".encode(), digest_size=8).digest()
+        return random.Random(int.from_bytes(digest, "little"))
+
+    def text_for(self, key: str, duration: float) -> str:
+        rng = self._rng(key)
+        pool = _sentences(self.seed)
+        target = int(duration * CHARS_PER_SEC * rng.uniform(0.8, 1.2))
+        out: list[str] = []
+        size = 0
+        while size < target:
+            s = rng.choice(pool)
+            out.append(s)
+            size += len(s) + 1
+        if rng.random() < self.digit_rate:
+            for _ in range(max(1, len(out) // 3)):
+                i = rng.randrange(len(out))
+                out[i] = f"{out[i]} {rng.randint(0, 3)} {rng.randint(0, 3)}"
+        if rng.random() < self.loop_rate:
+            # whisper 반복 루프: 어느 지점부터 한 문장이 끝까지 되풀이
+            start = int(len(out) * rng.uniform(0.1, 0.5))
+            loop = out[start]
+            out[start:] = [loop] * (len(out) - start)
+        return " ".join(out)
+
+    def latency(self, duration: float) -> float:
+        return self.overhead + duration * self.rtf
+
+    def transcribe(self, wav_path: str, key: str = "") -> str:
+        duration = wav_seconds(wav_path)
+        time.sleep(self.latency(duration))
+        key = key or f"{Path(wav_path).name}:{os.path.getsize(wav_path) if os.path.exists(wav_path) else 0}"
+        return self.text_for(key, duration)
+
+    def whisper_stdout(self, text: str, offset: float = 0.0) -> str:
+        lines, t = [], offset
+        for sent in text.split(". "):
+            end = t + max(1.0, len(sent) / CHARS_PER_SEC)
+            lines.append(f"[{_ts(t)} --> {_ts(end)}]  {sent.rstrip('.')}.")
+            t = end
+        return "\n".join(lines)
+
+
+def from_env(model: str) -> FakeAsr:
+    return FakeAsr(
+        model,
+        rtf=float(os.environ.get("FAKE_ASR_RTF", RTF)),
+        overhead=float(os.environ.get("FAKE_ASR_OVERHEAD", OVERHEAD_SEC)),
+        loop_rate=float(os.environ.get("FAKE_ASR_LOOP_RATE", LOOP_RATE)),
+        digit_rate=float(os.environ.get("FAKE_ASR_DIGIT_RATE", DIGIT_RATE)),
+        seed=int(os.environ.get("FAKE_ASR_SEED", 7)),
+    )
+
+
+# ─── PATH 대역 ───
+
+def whisper_cli(argv: list[str]) -> int:
+    """Accept whisper-cli's flags; -m, -f, -ot and --no-timestamps matter, the rest are ignored."""
+    model, wav, offset_ms, timestamps = "ggml-large-v3.bin", "", 0, True
+    i = 0
+    while i < len(argv):
+        a = argv[i]
+        if a in ("-m", "--model"):
+            model = argv[i + 1]
+        elif a in ("-f", "--file"):
+            wav = argv[i + 1]
+        elif a in ("-ot", "--offset-t"):
+            offset_ms = int(argv[i + 1])
+        elif a in ("-nt", "--no-timestamps"):
+            timestamps = False
+        i += 1
+    if not wav:
+        print("error: no input file (-f)", file=sys.stderr)
+        return 2
+    asr = from_env(model)
+    text = asr.transcribe(wav)
+    print(asr.whisper_stdout(text, offset_ms / 1000) if timestamps else text)
+    return 0
+
+
+def npx(argv: list[str]) -> int:
+    """`npx convex run <fn> [json]`: record the call, sleep, answer like an empty mutation/page."""
+    if argv[:2] != ["convex", "run"] or len(argv) < 3:
+        print(f"fake npx: unsupported {' '.join(argv[:3])}", file=sys.stderr)
+        return 1
+    fn = argv[2]
+    payload = argv[3] if len(argv) > 3 else ""
+    time.sleep(float(os.environ.get("FAKE_CONVEX_LATENCY", "0.3")))
+    log = os.environ.get("FAKE_CONVEX_LOG")
+    if log:
+        with open(log, "a") as f:
+            f.write(json.dumps({"fn": fn, "bytes": len(payload.encode("utf-8")), "t": time.time()}) + "\n")
+    if fn.endswith("getNasAudioPage"):
+        print(json.dumps({"page": [], "isDone": True, "continueCursor": ""}))
+    else:
+        print("null")
+    return 0
+
+
+def install_shims(directory: Path) -> list[Path]:
+    directory.mkdir(parents=True, exist_ok=True)
+    me = Path(__file__).resolve()
+    made = []
+    for name in ("whisper-cli", "npx"):
+        path = directory / name
+        path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{me}" {name} "$@"\n')
+        path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        made.append(path)
+    return made
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] in ("whisper-cli", "npx"):
+        sys.exit((whisper_cli if sys.argv[1] == "whisper-cli" else npx)(sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(description="가짜 ASR 백엔드 (부하 테스트용)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("shims", help="whisper-cli / npx 대역 스크립트 설치")
+    p.add_argument("dir")
+    p = sub.add_parser("sample", help="생성 전사문 출력")
+    p.add_argument("--key", default="sample")
+    p.add_argument("--duration", type=float, default=300)
+    p.add_argument("--model", default="ggml-large-v3.bin")
+    args = parser.parse_args()
+
+    if args.command == "shims":
+        for path in install_shims(Path(args.dir)):
+            print(path)
+        print(f"export PATH={Path(args.dir).resolve()}:$PATH")
+    else:
+        print(FakeAsr(args.model).text_for(args.key, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+전사 저장 경로 부하 테스트 (가짜 ASR, 코퍼스 10배 규모).
+
+실제 whisper 시간 없이 카탈로그가 커졌을 때 어디서 막히는지 보기 위해
+1) generate: 설교 N편(기본 40,000)짜리 sermons.db 를 fake_asr 전사문으로 만든다
+   (청크 + FTS 포함, 일부는 환각/숫자 노이즈라 재전사 대상이 된다)
+2) run: 재전사 대상 K편을 가짜 ASR 로 다시 전사해서 기존 스크립트 경로로 저장한다
+   --mode threads       retranscribe_bad.py 방식 (작업자마다 연결, sermon_db.update_db)
+   --mode coordinator   work_coordinator.py HTTP 코디네이터 + 워커 N개 (쓰기는 코디네이터만)
+   --mode convex        nas_whisper_convex.convex_run → npx 대역(fake_asr shims) 으로 Convex 저장 경로
+   저장 중에는 FTS 검색을 계속 돌리는 읽기 스레드를 같이 띄운다.
+
+보고: 처리량(편/초, 글자/초), 쓰기 락 대기(BEGIN IMMEDIATE 까지 걸린 시간 p50/p95/max),
+저장 시간, WAL 최대 크기, 검색 지연, 마지막 FTS 재빌드 시간, Convex 호출 크기/실패.
+
+Usage:
+  python3 scripts/load_test.py generate --db /tmp/load.db --sermons 40000
+  python3 scripts/load_test.py run --db /tmp/load.db --mode threads --workers 8 --count 2000
+  python3 scripts/load_test.py run --db /tmp/load.db --mode coordinator --workers 8 --count 2000
+  python3 scripts/load_test.py run --db /tmp/load.db --mode convex --workers 4 --count 200
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from fake_asr import FakeAsr, install_shims
+from sermon_db import chunk_text, drop_chunk_triggers, rebuild_fts_and_triggers, update_db
+from transcript_quality import NOISE_THRESHOLD, is_hallucination, noise_score
+
+AVG_SPEECH_SEC = 1275   # × 8자/초 ≈ 실제 전사문 평균 10,200자
+GEN_BATCH = 500
+
+
+# ─── 코퍼스 생성 ───
+
+def generate(db_path: str, n: int, seed: int = 7) -> None:
+    if os.path.exists(db_path):
+        raise SystemExit(f"{db_path} 이 이미 있습니다")
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript("""
+        CREATE TABLE sermons (id INTEGER PRIMARY KEY, youtube_id TEXT, title TEXT, published_at TEXT,
+                              transcript_raw TEXT, transcript_corrected TEXT, summary TEXT, tags TEXT);
+        CREATE TABLE chunks (id INTEGER PRIMARY KEY, sermon_id INTEGER, chunk_index INTEGER, content TEXT);
+        CREATE INDEX idx_chunks_sermon ON chunks(sermon_id);
+    """)
+    asr = FakeAsr(seed=seed)
+    rng = random.Random(seed)
+    t0 = time.time()
+    for start in range(1, n + 1, GEN_BATCH):
+        sermons, chunks = [], []
+        for sid in range(start, min(n, start + GEN_BATCH - 1) + 1):
+            duration = max(120.0, rng.gauss(AVG_SPEECH_SEC, AVG_SPEECH_SEC * 0.35))
+            text = asr.text_for(f"gen-{sid}", duration)
+            nas = sid % 10 == 0
+            youtube_id = f"nas99-{sid}" if nas else f"yt{sid:09d}"
+            published = f"{2000 + sid % 25}-{1 + sid % 12:02d}-{1 + sid % 28:02d}"
+            sermons.append((sid, youtube_id, f"설교 {sid}", published, text, text, None, None))
+            chunks.extend((sid, idx, content) for idx, content in chunk_text(text))
+        conn.executemany("INSERT INTO sermons VALUES (?, ?, ?, ?, ?, ?, ?, ?)", sermons)
+        conn.executemany("INSERT INTO chunks (sermon_id, chunk_index, content) VALUES (?, ?, ?)", chunks)
+        conn.commit()
+        print(f"[generate] {sermons[-1][0]}/{n} ({time.time() - t0:.0f}s)", flush=True)
+    t1 = time.time()
+    rebuild_fts_and_triggers(conn)
+    print(f"[generate] fts {time.time() - t1:.1f}s")
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.close()
+    print(f"[generate] {n} sermons, {os.path.getsize(db_path) / 1e9:.2f}GB, {time.time() - t0:.0f}s")
+
+
+def bad_targets(db_path: str, count: int) -> list[int]:
+    """Same selection rule as retranscribe_bad.get_bad_sermon_ids, padded with random ids."""
+    conn = sqlite3.connect(db_path)
+    bad, ids = [], []
+    for sid, text in conn.execute("SELECT id, transcript_raw FROM sermons"):
+        ids.append(sid)
+        if text and (noise_score(text) > NOISE_THRESHOLD or len(text) < 1000 or is_hallucination(text)):
+            bad.append(sid)
+    conn.close()
+    rest = [sid for sid in random.Random(1).sample(ids, min(len(ids), count)) if sid not in set(bad)]
+    return (bad + rest)[:count]
+
+
+# ─── 측정 ───
+
+class Metrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.series: dict[str, list[float]] = {}
+        self.counts: dict[str, int] = {}
+
+    def add(self, name: str, value: float) -> None:
+        with self._lock:
+            self.series.setdefault(name, []).append(value)
+
+    def inc(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def line(self, name: str, unit: str = "ms", scale: float = 1000.0) -> str:
+        values = sorted(self.series.get(name) or [0.0])
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        return (
+            f"{name}: n={len(self.series.get(name) or [])} p50={statistics.median(values) * scale:.1f}{unit} "
+            f"p95={p95 * scale:.1f}{unit} max={values[-1] * scale:.1f}{unit}"
+        )
+
+
+def _sampler(db_path: str, metrics: Metrics, stop: threading.Event) -> None:
+    """WAL size + FTS query latency while ingest runs."""
+    wal = Path(db_path + "-wal")
+    conn = sqlite3.connect(db_path, timeout=30)
+    words = ["은혜", "믿음", "사랑", "십자가", "부활", "성령"]
+    i = 0
+    while not stop.is_set():
+        if wal.exists():
+            metrics.add("wal_mb", wal.stat().st_size / 1e6)
+        t0 = time.perf_counter()
+        try:
+            conn.execute(
+                "SELECT rowid FROM chunks_fts WHERE chunks_fts MATCH ? LIMIT 20", (words[i % len(words)],)
+            ).fetchall()
+            metrics.add("search", time.perf_counter() - t0)
+        except sqlite3.OperationalError:
+            metrics.inc("search_errors")
+        i += 1
+        stop.wait(0.05)
+    conn.close()
+
+
+def _asr_for(args: argparse.Namespace) -> FakeAsr:
+    return FakeAsr(args.model, rtf=args.rtf, overhead=args.overhead, loop_rate=args.loop_rate, seed=args.seed)
+
+
+def _duration(sid: int) -> float:
+    return max(120.0, random.Random(sid).gauss(AVG_SPEECH_SEC, AVG_SPEECH_SEC * 0.35))
+
+
+def run_threads(args: argparse.Namespace, ids: list[int], metrics: Metrics) -> None:
+    asr = _asr_for(args)
+    local = threading.local()
+
+    def process(sid: int) -> None:
+        duration = _duration(sid)
+        time.sleep(asr.latency(duration))
+        text = asr.text_for(f"run-{sid}", duration)
+        if not hasattr(local, "conn"):
+            local.conn = sqlite3.connect(args.db, timeout=30)
+            local.conn.execute("PRAGMA journal_mode=WAL")
+        t0 = time.perf_counter()
+        local.conn.execute("BEGIN IMMEDIATE")  # update_db 가 이 트랜잭션 안에서 쓰고 커밋한다
+        t1 = time.perf_counter()
+        update_db(local.conn, sid, text)
+        metrics.add("lock_wait", t1 - t0)
+        metrics.add("save", time.perf_counter() - t1)
+        metrics.inc("chars", len(text))
+        metrics.inc("done")
+        metrics.add("done_at", time.time())
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for f in [pool.submit(process, sid) for sid in ids]:
+            try:
+                f.result()
+            except Exception as e:
+                metrics.inc("failed")
+                print(f"[fail] {e}")
+
+
+def run_coordinator(args: argparse.Namespace, ids: list[int], metrics: Metrics) -> None:
+    from work_coordinator import Coordinator, WorkClient, WorkQueue, load_items, run_worker, serve
+
+    conn = sqlite3.connect(args.db, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    items = load_items(conn, ids)
+
+    def save(sid: int, transcript: str) -> None:
+        t0 = time.perf_counter()
+        update_db(conn, sid, transcript)
+        metrics.add("save", time.perf_counter() - t0)
+        metrics.inc("chars", len(transcript))
+        metrics.inc("done")
+        metrics.add("done_at", time.time())
+
+    # lease 가 길면 빈 claim 의 retry_after(lease/3, 최대 10초)만큼 워커가 자서 마지막 몇 편의
+    # 꼬리 구간이 처리량을 지배한다 → 부하 테스트는 짧은 lease 로 돌린다 (heartbeat 가 살려둔다)
+    coordinator = Coordinator(WorkQueue(items, lease_sec=args.lease_sec), save, log=lambda _: None)
+    server = serve(coordinator, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    asr = _asr_for(args)
+
+    def worker(n: int) -> None:
+        client = WorkClient(url, f"load-{n}")
+        orig_submit = client.submit
+
+        def timed_submit(sid: int, lease: int, transcript: str) -> None:
+            t0 = time.perf_counter()
+            orig_submit(sid, lease, transcript)
+            metrics.add("submit", time.perf_counter() - t0)
+
+        client.submit = timed_submit
+
+        def process(item: dict) -> str:
+            duration = _duration(item["sermon_id"])
+            time.sleep(asr.latency(duration))
+            return asr.text_for(f"run-{item['sermon_id']}", duration)
+
+        run_worker(client, process, log=lambda _: None)
+
+    try:
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        server.shutdown()
+        conn.close()
+
+
+def run_convex(args: argparse.Namespace, ids: list[int], metrics: Metrics) -> None:
+    import nas_whisper_convex
+
+    shim_dir = Path(tempfile.mkdtemp(prefix="fake-convex-"))
+    install_shims(shim_dir)
+    log = shim_dir / "calls.jsonl"
+    os.environ["PATH"] = f"{shim_dir}:{os.environ['PATH']}"
+    os.environ["FAKE_CONVEX_LOG"] = str(log)
+    os.environ["FAKE_CONVEX_LATENCY"] = str(args.convex_latency)
+    asr = _asr_for(args)
+
+    def process(sid: int) -> None:
+        duration = _duration(sid)
+        time.sleep(asr.latency(duration))
+        text = asr.text_for(f"run-{sid}", duration)
+        t0 = time.perf_counter()
+        nas_whisper_convex.convex_run(
+            "transcriptCleanup:saveNasTranscript",
+            {"sermonId": f"fake{sid}", "originalSermonId": sid, "rawTranscript": text},
+        )
+        metrics.add("save", time.perf_counter() - t0)
+        metrics.inc("chars", len(text))
+        metrics.inc("done")
+        metrics.add("done_at", time.time())
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for f in [pool.submit(process, sid) for sid in ids]:
+            try:
+                f.result()
+            except Exception as e:
+                metrics.inc("failed")
+                # 전사문 JSON 이 argv 하나로 넘어가므로 큰 설교는 E2BIG 로 실패할 수 있다
+                print(f"[fail] {str(e)[:160]}")
+    if log.exists():
+        sizes = [json.loads(line)["bytes"] for line in log.read_text().splitlines()]
+        if sizes:
+            metrics.series["convex_payload_kb"] = [s / 1000 for s in sizes]
+
+
+def run(args: argparse.Namespace) -> None:
+    ids = bad_targets(args.db, args.count)
+    print(f"[run] mode={args.mode} workers={args.workers} targets={len(ids)} rtf={args.rtf}")
+    conn = sqlite3.connect(args.db, timeout=30)
+    if args.mode != "convex":
+        drop_chunk_triggers(conn)  # 기존 스크립트와 같게: 저장 중엔 트리거 없이, 끝나고 재빌드
+
+    metrics = Metrics()
+    stop = threading.Event()
+    sampler = threading.Thread(target=_sampler, args=(args.db, metrics, stop), daemon=True)
+    sampler.start()
+    t0 = time.time()
+    {"threads": run_threads, "coordinator": run_coordinator, "convex": run_convex}[args.mode](args, ids, metrics)
+    elapsed = time.time() - t0
+    stop.set()
+    sampler.join()
+
+    fts_sec = 0.0
+    if args.mode != "convex":
+        t1 = time.time()
+        rebuild_fts_and_triggers(conn)
+        fts_sec = time.time() - t1
+    conn.close()
+
+    done = metrics.counts.get("done", 0)
+    # 처리량은 마지막 저장 시각까지로 잰다 — 그 뒤는 워커가 done 을 받고 빠져나가는 꼬리 구간
+    active = max(metrics.series.get("done_at") or [t0 + elapsed]) - t0
+    print(f"\n[result] done={done} failed={metrics.counts.get('failed', 0)} in {elapsed:.1f}s")
+    print(
+        f"  throughput: {done / active:.2f} sermons/s, {metrics.counts.get('chars', 0) / active / 1000:.0f}k chars/s "
+        f"(last save at {active:.1f}s, drain {elapsed - active:.1f}s)"
+    )
+    for name in ("lock_wait", "save", "submit", "search"):
+        if name in metrics.series:
+            print(f"  {metrics.line(name)}")
+    if "convex_payload_kb" in metrics.series:
+        print(f"  {metrics.line('convex_payload_kb', 'KB', 1.0)}")
+    if "wal_mb" in metrics.series:
+        print(f"  wal max: {max(metrics.series['wal_mb']):.1f}MB")
+    if metrics.counts.get("search_errors"):
+        print(f"  search errors: {metrics.counts['search_errors']}")
+    if fts_sec:
+        print(f"  fts rebuild: {fts_sec:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="가짜 ASR 로 전사 저장 경로 부하 테스트")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("generate", help="합성 sermons.db 생성")
+    p.add_argument("--db", required=True)
+    p.add_argument("--sermons", type=int, default=40_000)
+    p.add_argument("--seed", type=int, default=7)
+    p = sub.add_parser("run", help="재전사 부하 실행")
+    p.add_argument("--db", required=True)
+    p.add_argument("--mode", choices=["threads", "coordinator", "convex"], default="threads")
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--count", type=int, default=2000, help="재전사할 설교 수")
+    p.add_argument("--model", default="ggml-large-v3.bin", help="가짜 모델 이름 (large 가 아니면 불량률 2배)")
+    p.add_argument("--rtf", type=float, default=0.0, help="가짜 ASR 실시간 배율 (0 = 지연 없음)")
+    p.add_argument("--overhead", type=float, default=0.05, help="가짜 ASR 호출당 고정 지연(초)")
+    p.add_argument("--loop-rate", type=float, default=0.05, help="반복 루프 전사 비율")
+    p.add_argument("--lease-sec", type=float, default=3.0, help="--mode coordinator: lease (빈 claim 재시도 = lease/3)")
+    p.add_argument("--convex-latency", type=float, default=0.3, help="--mode convex: npx 호출당 지연(초)")
+    p.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate(args.db, args.sermons, args.seed)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+nas_whisper_convex.py 의 asyncio 동시 실행 모드 (--async).
+
+순차 모드에서는 ffmpeg → whisper → `npx convex run` 저장이 한 줄로 이어져서
+네트워크 저장과 다음 설교의 디코딩이 겹치지 않는다. 여기서는 단계마다
+세마포어를 따로 둔다 (디코딩 / ASR / Convex 저장).
+- 저장은 fire-and-track: 태스크만 띄워 두고 다음 전사로 넘어간다 (재시도 + 백오프)
+- Ctrl-C 시 실행 중인 ffmpeg / whisper-cli / npx 프로세스를 모두 종료한다
+- 설교마다 한 줄씩 상태를 출력하고, run_history 에 오디오 길이 / ASR 시간을 남긴다 (동시 ASR 수 = workers)
+"""
+
+import argparse
+import asyncio
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable
+
+from nas_whisper_convex import convert_to_wav_cmd, whisper_cmd
+from parallel_asr import wav_duration
+from run_history import RunRecorder
+from transcript_quality import is_hallucination
+from vad_regions import open_cache, prepare_speech_wav
+from whisper_segments import parse_whisper_output
+
+SAVE_RETRIES = 4
+
+
+class Progress:
+    def __init__(self) -> None:
+        self.counts = {"done": 0, "skipped": 0, "failed": 0}
+        self.started = time.time()
+
+    def line(self, tag: str, original_id: object, msg: str = "") -> None:
+        elapsed = int(time.time() - self.started)
+        print(f"[{tag:<13}] {elapsed:>6}s #{original_id} {msg}".rstrip(), flush=True)
+
+    def bump(self, key: str) -> None:
+        self.counts[key] += 1
+
+
+async def run_proc(cmd: list[str], capture: bool = True) -> tuple[int, str, str]:
+    """asyncio subprocess that is killed if the awaiting task is cancelled."""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE if capture else asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE if capture else asyncio.subprocess.DEVNULL,
+    )
+    try:
+        out, err = await proc.communicate()
+    except asyncio.CancelledError:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+    return (
+        proc.returncode,
+        (out or b"").decode("utf-8", errors="replace"),
+        (err or b"").decode("utf-8", errors="replace"),
+    )
+
+
+async def save_with_retry(payload: dict, original_id: object, sem: asyncio.Semaphore, progress: Progress) -> None:
+    cmd = ["npx", "convex", "run", "transcriptCleanup:saveNasTranscript", json.dumps(payload)]
+    for attempt in range(1, SAVE_RETRIES + 1):
+        try:
+            async with sem:
+                code, _, err = await run_proc(cmd)
+        except Exception as exc:
+            # npx 없음(FileNotFoundError), 인자 과대(E2BIG) 등은 재시도해도 같다 — 이 설교만 실패 처리
+            progress.bump("failed")
+            progress.line("save-fail", original_id, f"{type(exc).__name__}: {exc}")
+            return
+        if code == 0:
+            progress.bump("done")
+            progress.line("saved", original_id)
+            return
+        if attempt < SAVE_RETRIES:
+            delay = 2 ** attempt
+            progress.line("save-retry", original_id, f"attempt={attempt} in {delay}s: {err.strip()[-120:]}")
+            await asyncio.sleep(delay)
+        else:
+            progress.bump("failed")
+            progress.line("save-fail", original_id, err.strip()[-200:])
+
+
+async def process_sermon(
+    sermon: dict,
+    audio_path: Path,
+    args: argparse.Namespace,
+    sems: dict[str, asyncio.Semaphore],
+    saves: set[asyncio.Task],
+    progress: Progress,
+    recorder: RunRecorder | None = None,
+) -> None:
+    original_id = sermon["originalId"]
+    t0 = time.time()
+    audio_sec = asr_sec = 0.0
+    td = tempfile.mkdtemp(prefix="nas-whisper-")
+    try:
+        wav_path = Path(td) / "audio.wav"
+        async with sems["decode"]:
+            progress.line("decode", original_id, sermon["title"][:50])
+            code, _, err = await run_proc(convert_to_wav_cmd(audio_path, wav_path))
+            if code != 0:
+                raise RuntimeError(f"ffmpeg failed: {err.strip()[-200:]}")
+            if not args.no_speech_only:
+                wav_path, report = await asyncio.to_thread(_speech_only, audio_path, wav_path, args.vad_cache)
+                progress.line("vad", original_id, report)
+
+        audio_sec = wav_duration(str(wav_path))
+        async with sems["asr"]:
+            progress.line("asr", original_id)
+            t_asr = time.time()
+            code, out, err = await run_proc(whisper_cmd(wav_path, args.model, args.vad_model, args.no_gpu, args.threads))
+            asr_sec = time.time() - t_asr
+        if code != 0:
+            raise RuntimeError(err.strip()[-200:] or "whisper-cli failed")
+        transcript = parse_whisper_output(out)
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        progress.bump("failed")
+        progress.line("fail", original_id, str(exc))
+        return
+    finally:
+        shutil.rmtree(td, ignore_errors=True)
+
+    if recorder:
+        recorder.item(original_id, audio_sec, asr_sec, time.time() - t0,
+                      ok=bool(transcript) and not is_hallucination(transcript))
+    if not transcript:
+        progress.bump("failed")
+        progress.line("empty", original_id)
+        return
+    if is_hallucination(transcript):
+        progress.bump("skipped")
+        progress.line("hallucination", original_id, f"chars={len(transcript)} preview={transcript[:60]}")
+        return
+    progress.line("transcribed", original_id, f"chars={len(transcript)}")
+    if args.dry_run:
+        progress.bump("done")
+        return
+
+    payload = {"sermonId": sermon["_id"], "originalSermonId": original_id, "rawTranscript": transcript}
+    task = asyncio.create_task(save_with_retry(payload, original_id, sems["save"], progress))
+    saves.add(task)
+    task.add_done_callback(saves.discard)
+
+
+def _speech_only(audio_path: Path, wav_path: Path, cache_path: str) -> tuple[Path, str]:
+    cache = open_cache(cache_path)
+    try:
+        speech_wav, _, report = prepare_speech_wav(audio_path, wav_path, cache)
+    finally:
+        cache.close()
+    return speech_wav, report
+
+
+async def run_pipeline(
+    sermons: Iterable[dict],
+    resolve,
+    args: argparse.Namespace,
+    recorder: RunRecorder | None = None,
+) -> dict:
+    sems = {
+        "decode": asyncio.Semaphore(args.decode_jobs),
+        "asr": asyncio.Semaphore(args.asr_jobs),
+        "save": asyncio.Semaphore(args.save_jobs),
+    }
+    progress = Progress()
+    saves: set[asyncio.Task] = set()
+    # 디코딩/ASR 중인 설교 수를 제한해서 임시 wav 가 무한정 쌓이지 않게 한다
+    in_flight = asyncio.Semaphore(args.decode_jobs + args.asr_jobs)
+    workers: set[asyncio.Task] = set()
+
+    async def guarded(sermon: dict, audio_path: Path) -> None:
+        try:
+            await process_sermon(sermon, audio_path, args, sems, saves, progress, recorder)
+        finally:
+            in_flight.release()
+
+    it = iter(sermons)
+    try:
+        while True:
+            # 목록이 지연 생성(페이지 단위 조회)일 수 있으므로 스레드에서 꺼낸다
+            sermon = await asyncio.to_thread(next, it, None)
+            if sermon is None:
+                break
+            audio_path = resolve(sermon["transcriptRaw"])
+            if not audio_path:
+                progress.bump("skipped")
+                progress.line("skip", sermon["originalId"], f"audio not found: {sermon['transcriptRaw']}")
+                continue
+            await in_flight.acquire()
+            task = asyncio.create_task(guarded(sermon, audio_path))
+            workers.add(task)
+            task.add_done_callback(workers.discard)
+        await asyncio.gather(*workers)
+        if saves:
+            print(f"[info] waiting for {len(saves)} pending Convex saves...", flush=True)
+            await asyncio.gather(*saves)
+    except asyncio.CancelledError:
+        for task in (*workers, *saves):
+            task.cancel()
+        await asyncio.gather(*workers, *saves, return_exceptions=True)
+        print("\n[cancelled] stopped all running ffmpeg / whisper-cli / convex processes", flush=True)
+        raise
+    return progress.counts
+
+
+def run_async(
+    sermons: Iterable[dict], resolve, args: argparse.Namespace, recorder: RunRecorder | None = None
+) -> dict:
+    try:
+        return asyncio.run(run_pipeline(sermons, resolve, args, recorder))
+    except KeyboardInterrupt:
+        raise SystemExit(130)
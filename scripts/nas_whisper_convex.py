@@ -13,19 +13,28 @@ Usage:
 """
 
 import argparse
+import itertools
 import json
+import os
 import re
 import subprocess
 import tempfile
+import time
+from functools import partial
 from pathlib import Path
+from typing import Iterator
 
+from audio_manifest import DEFAULT_MANIFEST, discover_default_base_dir, open_refreshed, resolve_marker
+from asr_cascade import CascadeStats, make_cascade
+from asr_checkpoint import DEFAULT_CHECKPOINT_DIR, Checkpoint, checkpoint_key, transcribe_whisper_resumable
+from parallel_asr import plan_pieces, run_pieces, wav_duration
+from run_history import RunRecorder, open_history, print_plan
+from transcript_quality import NOISE_THRESHOLD, is_hallucination, noise_score
+from transcript_repair import repair_transcript, whisper_redo
+from whisper_segments import join_segments, parse_whisper_output, transcribe_segments
+from vad_regions import DEFAULT_CACHE, open_cache, prepare_speech_wav
 
-def discover_default_base_dir() -> Path:
-    docs = Path("/Users/johau/Documents")
-    candidates = sorted(docs.glob("99_*설교"))
-    if candidates:
-        return candidates[0]
-    return docs / "99_연희동~노량진설교"
+NAS_PAGE_SIZE = 200
 
 
 def resolve_audio(base_dir: Path, marker_text: str) -> Path | None:
@@ -39,25 +48,29 @@ def resolve_audio(base_dir: Path, marker_text: str) -> Path | None:
     return None
 
 
+def convert_to_wav_cmd(src: Path, out_wav: Path) -> list[str]:
+    return [
+        "ffmpeg", "-y", "-i", str(src),
+        "-ac", "1", "-ar", "16000",
+        "-af", ",".join([
+            "highpass=f=80",          # 80Hz 이하 저주파 잡음 제거
+            "afftdn=nf=-20",          # FFT 기반 노이즈 제거
+            "loudnorm=I=-16:TP=-1.5", # 볼륨 정규화 (EBU R128)
+        ]),
+        str(out_wav),
+    ]
+
+
 def convert_to_wav(src: Path, out_wav: Path) -> None:
     subprocess.run(
-        [
-            "ffmpeg", "-y", "-i", str(src),
-            "-ac", "1", "-ar", "16000",
-            "-af", ",".join([
-                "highpass=f=80",          # 80Hz 이하 저주파 잡음 제거
-                "afftdn=nf=-20",          # FFT 기반 노이즈 제거
-                "loudnorm=I=-16:TP=-1.5", # 볼륨 정규화 (EBU R128)
-            ]),
-            str(out_wav),
-        ],
+        convert_to_wav_cmd(src, out_wav),
         check=True,
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
     )
 
 
-def transcribe_whisper(wav_path: Path, model_path: str, vad_model: str, no_gpu: bool) -> str:
+def whisper_cmd(wav_path: Path, model_path: str, vad_model: str, no_gpu: bool, threads: int = 0) -> list[str]:
     cmd = [
         "whisper-cli",
         "-m", model_path,
@@ -65,42 +78,89 @@ def transcribe_whisper(wav_path: Path, model_path: str, vad_model: str, no_gpu:
         "--no-timestamps",
         "-f", str(wav_path),
     ]
+    if threads > 0:
+        cmd.extend(["-t", str(threads)])
     if vad_model:
         cmd.extend(["--vad", "-vm", vad_model])
     if no_gpu:
         cmd.append("--no-gpu")
+    return cmd
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
+
+def transcribe_whisper(
+    wav_path: Path, model_path: str, vad_model: str, no_gpu: bool, threads: int = 0
+) -> str:
+    result = subprocess.run(
+        whisper_cmd(wav_path, model_path, vad_model, no_gpu, threads), capture_output=True, text=True
+    )
     if result.returncode != 0:
         raise RuntimeError(result.stderr.strip() or "whisper-cli failed")
+    return parse_whisper_output(result.stdout)
 
-    lines: list[str] = []
-    for line in result.stdout.splitlines():
-        line = line.strip()
-        if re.match(r"^\[[\d:\.]+\s*-->\s*[\d:\.]+\]", line):
-            continue
-        if line:
-            lines.append(line)
-    return " ".join(lines).strip()
 
+def whisper_backend(args: argparse.Namespace, threads: int, cascade: CascadeStats | None):
+    """`wav -> text` for the configured model, wrapped in the --fast-model cascade if set."""
+    slow = partial(
+        transcribe_whisper, model_path=args.model, vad_model=args.vad_model, no_gpu=args.no_gpu, threads=threads
+    )
+    if cascade is None:
+        return slow
+    fast = partial(
+        transcribe_whisper, model_path=args.fast_model, vad_model=args.vad_model, no_gpu=args.no_gpu, threads=threads
+    )
+    return make_cascade(fast, slow, cascade)
 
-def is_hallucination(text: str, threshold: float = 0.4) -> bool:
-    """Detect Whisper hallucination (repeated short phrases).
 
-    Splits text into 2-3 word chunks and checks if any single chunk
-    accounts for more than `threshold` of all chunks.
+def transcribe_audio(
+    wav_path: Path,
+    args: argparse.Namespace,
+    time_map: list | None = None,
+    cascade: CascadeStats | None = None,
+    checkpoint: Checkpoint | None = None,
+) -> str:
+    """whisper-cli on the whole wav, or --parallel overlapping pieces stitched back together.
+
+    With a cascade, escalation to the large model happens per piece.
     """
-    words = text.split()
-    if len(words) < 20:
-        return False
-    # Check bigrams
-    bigrams = [f"{words[i]} {words[i+1]}" for i in range(len(words) - 1)]
-    if not bigrams:
-        return False
-    from collections import Counter
-    counts = Counter(bigrams)
-    most_common_count = counts.most_common(1)[0][1]
-    return most_common_count / len(bigrams) > threshold
+    if args.repair:
+        return transcribe_with_repair(wav_path, args)
+    if checkpoint:
+        return transcribe_whisper_resumable(
+            wav_path, args.model, checkpoint, args.vad_model, args.no_gpu, args.threads
+        )
+    if args.parallel <= 1:
+        return whisper_backend(args, args.threads, cascade)(wav_path)
+
+    duration = wav_duration(str(wav_path))
+    # 음성 구간만 이어붙인 wav 라면 구간 이음매가 곧 쉼 위치
+    cut_points = [compact for compact, _ in time_map[1:]] if time_map else None
+    pieces = plan_pieces(duration, args.piece_sec or duration / args.parallel, cut_points=cut_points)
+    if len(pieces) == 1:
+        return whisper_backend(args, args.threads, cascade)(wav_path)
+    threads = args.threads or max(1, (os.cpu_count() or 4) // args.parallel)
+    print(f"  [parallel] {len(pieces)} pieces x {threads} threads")
+    return run_pieces(str(wav_path), pieces, whisper_backend(args, threads, cascade), workers=args.parallel)
+
+
+def open_checkpoint(audio_path: Path, args: argparse.Namespace) -> Checkpoint | None:
+    """Per-segment checkpoint for the plain single-process whisper path."""
+    if args.no_checkpoint or args.repair or args.parallel > 1 or args.fast_model:
+        return None
+    key = checkpoint_key(audio_path, args.model, args.vad_model, not args.no_speech_only)
+    return Checkpoint(args.checkpoint_dir, key)
+
+
+def transcribe_with_repair(wav_path: Path, args: argparse.Namespace) -> str:
+    """Timestamped pass; if it looks hallucinated, re-transcribe only the damaged ranges."""
+    segments = transcribe_segments(
+        str(wav_path), args.model, vad_model=args.vad_model, no_gpu=args.no_gpu, threads=args.threads
+    )
+    transcript = join_segments(segments)
+    if not is_hallucination(transcript) and noise_score(transcript) <= NOISE_THRESHOLD:
+        return transcript
+    redo = whisper_redo(args.repair_model or args.model, args.vad_model, args.no_gpu)
+    transcript, _ = repair_transcript(str(wav_path), segments, redo)
+    return transcript
 
 
 def convex_run_raw(fn: str, args_dict: dict | None = None) -> dict | None:
@@ -132,6 +192,23 @@ def convex_run(fn: str, args_dict: dict | None = None) -> dict:
     return json.loads(result.stdout.strip())
 
 
+def iter_nas_sermons(page_size: int = NAS_PAGE_SIZE) -> Iterator[dict]:
+    """Walk getNasAudioPage cursor by cursor, yielding sermons as each page arrives.
+
+    transcriptCleanup:getNasSermons 는 서버에서 전체 목록을 모아 한 번에 반환하므로
+    첫 전사가 목록 전체 조회를 기다려야 하고 메모리도 카탈로그 크기만큼 쓴다.
+    """
+    cursor = None
+    while True:
+        page = convex_run(
+            "transcriptCleanupHelpers:getNasAudioPage", {"numItems": page_size, "cursor": cursor}
+        )
+        yield from page["sermons"]
+        if page["isDone"]:
+            return
+        cursor = page["continueCursor"]
+
+
 def retranscribe_single(args: argparse.Namespace) -> None:
     """Re-transcribe a specific sermon by originalId."""
     if not args.audio:
@@ -151,13 +228,25 @@ def retranscribe_single(args: argparse.Namespace) -> None:
     print(f"[info] #{args.id} {title}")
     print(f"[info] audio={audio_path}")
     print(f"[info] model={args.model}")
+    cascade = CascadeStats() if args.fast_model else None
 
     with tempfile.TemporaryDirectory() as td:
         wav_path = Path(td) / "audio.wav"
         print(f"  [ffmpeg] converting to wav...")
         convert_to_wav(audio_path, wav_path)
+        time_map = None
+        if not args.no_speech_only:
+            vad_cache = open_cache(args.vad_cache)
+            try:
+                wav_path, time_map, report = prepare_speech_wav(audio_path, wav_path, vad_cache)
+            finally:
+                vad_cache.close()
+            print(f"  [vad] {report}")
         print(f"  [whisper] transcribing...")
-        transcript = transcribe_whisper(wav_path, args.model, args.vad_model, args.no_gpu)
+        checkpoint = open_checkpoint(audio_path, args)
+        transcript = transcribe_audio(wav_path, args, time_map, cascade, checkpoint)
+    if cascade:
+        print(cascade.summary())
 
     if not transcript:
         raise SystemExit(f"empty transcript for #{args.id}")
@@ -165,6 +254,8 @@ def retranscribe_single(args: argparse.Namespace) -> None:
     if is_hallucination(transcript):
         print(f"[hallucination] #{args.id} chars={len(transcript)} — skipped")
         print(f"  preview: {transcript[:100]}")
+        if checkpoint:
+            checkpoint.finish()
         return
 
     print(f"[transcribed] #{args.id} chars={len(transcript)}")
@@ -173,6 +264,8 @@ def retranscribe_single(args: argparse.Namespace) -> None:
         print(f"[dry-run] #{args.id} skipping Convex save")
         print("---")
         print(transcript[:500])
+        if checkpoint:
+            checkpoint.finish()
         return
 
     convex_run(
@@ -183,44 +276,101 @@ def retranscribe_single(args: argparse.Namespace) -> None:
             "rawTranscript": transcript,
         },
     )
+    if checkpoint:
+        checkpoint.finish()
     print(f"[done] #{args.id} saved to Convex")
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="NAS audio → Whisper → Convex pipeline")
     parser.add_argument("--model", default="models/ggml-large-v3.bin")
+    parser.add_argument("--fast-model", default="",
+                        help="캐스케이드: 이 모델(예: models/ggml-small.bin)로 먼저 전사, 품질 불량일 때만 --model 사용")
     parser.add_argument("--vad-model", default="models/ggml-silero-v6.2.0.bin")
-    parser.add_argument("--base-dir", default=str(discover_default_base_dir()))
+    parser.add_argument("--vad-cache", default=DEFAULT_CACHE, help="음성 구간 캐시 DB 경로")
+    parser.add_argument("--no-speech-only", action="store_true", help="음성 구간만 잘라내지 않고 전체 wav 전사")
+    parser.add_argument("--base-dir", default="", help="NAS 설교 폴더 (기본: 자동 탐색)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="오디오 매니페스트 DB 경로")
+    parser.add_argument("--no-manifest", action="store_true", help="매니페스트 없이 파일마다 exists() 확인")
     parser.add_argument("--limit", type=int, default=0, help="0이면 전체")
+    parser.add_argument("--page-size", type=int, default=NAS_PAGE_SIZE, help="Convex 목록 조회 페이지 크기")
     parser.add_argument("--no-gpu", action="store_true", help="GPU 비활성화")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="설교 한 편을 N개 조각으로 나눠 병렬 전사 (겹침 구간 자동 정리)")
+    parser.add_argument("--piece-sec", type=float, default=0, help="--parallel 조각 길이 (0이면 길이/N)")
+    parser.add_argument("--threads", type=int, default=0, help="whisper-cli 프로세스당 스레드 (0이면 자동)")
+    parser.add_argument("--repair", action="store_true",
+                        help="환각 판정 시 설교 전체를 버리지 않고 망가진 시간 구간만 재전사")
+    parser.add_argument("--repair-model", default="", help="--repair 구간용 모델 (기본: --model + 루프 방지 설정)")
+    parser.add_argument("--async", dest="async_mode", action="store_true",
+                        help="asyncio 모드: 디코딩/ASR/Convex 저장을 겹쳐서 실행")
+    parser.add_argument("--decode-jobs", type=int, default=2, help="--async: 동시 ffmpeg 디코딩 수")
+    parser.add_argument("--asr-jobs", type=int, default=1, help="--async: 동시 whisper-cli 수")
+    parser.add_argument("--save-jobs", type=int, default=2, help="--async: 동시 Convex 저장 수")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CHECKPOINT_DIR,
+                        help="세그먼트 단위 체크포인트 저장 위치 (중단된 설교는 이어서 전사)")
+    parser.add_argument("--no-checkpoint", action="store_true", help="체크포인트 비활성화")
     parser.add_argument("--dry-run", action="store_true", help="전사만 하고 Convex 저장 안 함")
     parser.add_argument("--id", type=int, help="특정 설교 originalId 재전사")
     parser.add_argument("--audio", help="--id와 함께 사용: 오디오 파일 경로")
     args = parser.parse_args()
+    if args.repair and (args.parallel > 1 or args.fast_model):
+        parser.error("--repair cannot be combined with --parallel or --fast-model")
+    if args.async_mode and (args.repair or args.parallel > 1 or args.fast_model or args.id):
+        parser.error("--async runs plain whisper-cli jobs; drop --repair/--parallel/--fast-model/--id")
 
     # Single sermon re-transcription mode
     if args.id:
         retranscribe_single(args)
         return
 
-    base_dir = Path(args.base_dir)
+    base_dir = Path(args.base_dir) if args.base_dir else discover_default_base_dir()
     if not base_dir.exists():
         raise FileNotFoundError(f"base dir not found: {base_dir}")
+    manifest = None if args.no_manifest else open_refreshed(args.manifest, base_dir)
+    vad_cache = None if args.no_speech_only else open_cache(args.vad_cache)
 
     # 1. Get NAS sermon list from Convex
-    print("[info] Fetching NAS sermons from Convex...")
-    data = convex_run("transcriptCleanup:getNasSermons")
-    sermons = data["sermons"]
-    print(f"[info] Found {len(sermons)} NAS audio sermons")
+    #    페이지 단위로 받아오면서 바로 전사를 시작한다 (전체 목록을 기다리지 않음)
+    print(f"[info] Streaming NAS sermons from Convex (page size {args.page_size})...")
+    sermons = iter_nas_sermons(args.page_size)
 
     if args.limit > 0:
-        sermons = sermons[: args.limit]
-        print(f"[info] Limited to {len(sermons)}")
+        sermons = itertools.islice(sermons, args.limit)
+        print(f"[info] Limited to {args.limit}")
+        history = open_history()
+        try:
+            print_plan(history, args.limit, max_workers=1)
+        finally:
+            history.close()
 
     print(f"[info] base_dir={base_dir}")
     print(f"[info] model={args.model}")
     print(f"[info] vad_model={args.vad_model}")
+    cascade = CascadeStats() if args.fast_model else None
+    if cascade:
+        print(f"[info] fast_model={args.fast_model} (cascade)")
+
+    if args.async_mode:
+        from nas_whisper_async import run_async
+
+        if vad_cache:
+            vad_cache.close()
+        print(f"[info] async decode={args.decode_jobs} asr={args.asr_jobs} save={args.save_jobs}")
+        # 동시에 도는 whisper-cli 는 --asr-jobs 개 → 그게 작업자 수
+        recorder = RunRecorder("nas_whisper_convex", args.model, "", args.asr_jobs, args.threads)
+        try:
+            if manifest:
+                resolve = lambda marker: resolve_marker(manifest, base_dir, marker)  # noqa: E731
+            else:
+                resolve = lambda marker: resolve_audio(base_dir, marker)  # noqa: E731
+            counts = run_async(sermons, resolve, args, recorder)
+        finally:
+            recorder.finish()
+        print(f"\n[summary] done={counts['done']} skipped={counts['skipped']} failed={counts['failed']}")
+        return
 
+    recorder = RunRecorder("nas_whisper_convex", args.model, args.fast_model, 1, args.threads, args.parallel)
     done = 0
     skipped = 0
     failed = 0
@@ -231,18 +381,32 @@ def main() -> None:
         title = sermon["title"]
         marker = sermon["transcriptRaw"]
 
-        audio_path = resolve_audio(base_dir, marker)
+        if manifest:
+            audio_path = resolve_marker(manifest, base_dir, marker)
+        else:
+            audio_path = resolve_audio(base_dir, marker)
         if not audio_path:
             skipped += 1
-            print(f"[skip] ({i}/{len(sermons)}) #{original_id} audio not found: {marker}")
+            print(f"[skip] ({i}) #{original_id} audio not found: {marker}")
             continue
 
-        print(f"[start] ({i}/{len(sermons)}) #{original_id} {title[:50]}")
+        print(f"[start] ({i}) #{original_id} {title[:50]}")
+        t0 = time.time()
         try:
             with tempfile.TemporaryDirectory() as td:
                 wav_path = Path(td) / "audio.wav"
                 convert_to_wav(audio_path, wav_path)
-                transcript = transcribe_whisper(wav_path, args.model, args.vad_model, args.no_gpu)
+                time_map = None
+                if vad_cache:
+                    wav_path, time_map, report = prepare_speech_wav(audio_path, wav_path, vad_cache)
+                    print(f"  [vad] {report}")
+                checkpoint = open_checkpoint(audio_path, args)
+                audio_sec = wav_duration(str(wav_path))
+                t_asr = time.time()
+                transcript = transcribe_audio(wav_path, args, time_map, cascade, checkpoint)
+                asr_sec = time.time() - t_asr
+            ok = bool(transcript) and not is_hallucination(transcript)
+            recorder.item(original_id, audio_sec, asr_sec, time.time() - t0, ok=ok)
 
             if not transcript:
                 failed += 1
@@ -253,6 +417,8 @@ def main() -> None:
                 skipped += 1
                 print(f"[hallucination] #{original_id} chars={len(transcript)} — skipped")
                 print(f"  preview: {transcript[:80]}")
+                if checkpoint:
+                    checkpoint.finish()
                 continue
 
             print(f"[transcribed] #{original_id} chars={len(transcript)}")
@@ -260,6 +426,8 @@ def main() -> None:
             if args.dry_run:
                 print(f"[dry-run] #{original_id} skipping Convex save")
                 done += 1
+                if checkpoint:
+                    checkpoint.finish()
                 continue
 
             convex_run(
@@ -271,13 +439,18 @@ def main() -> None:
                 },
             )
             done += 1
+            if checkpoint:
+                checkpoint.finish()
             print(f"[done] #{original_id}")
 
         except Exception as exc:
             failed += 1
             print(f"[fail] #{original_id} {exc}")
 
-    print(f"\n[summary] done={done} skipped={skipped} failed={failed} total={len(sermons)}")
+    recorder.finish(cascade)
+    print(f"\n[summary] done={done} skipped={skipped} failed={failed} total={done + skipped + failed}")
+    if cascade:
+        print(cascade.summary())
 
 
 if __name__ == "__main__":
@@ -3,12 +3,16 @@
 
 import argparse
 import os
-import re
 import sqlite3
 import subprocess
 import tempfile
 from pathlib import Path
-from typing import Iterable
+
+from audio_fingerprint import DEFAULT_INDEX, open_index, reuse_transcript
+from audio_manifest import DEFAULT_MANIFEST, discover_default_base_dir, open_refreshed, resolve_marker
+from sermon_db import drop_chunk_triggers, rebuild_fts_and_triggers, update_db
+from vad_regions import DEFAULT_CACHE, open_cache, prepare_speech_wav
+from whisper_segments import parse_whisper_output
 
 
 def convert_to_wav(src: Path, out_wav: Path) -> None:
@@ -42,98 +46,7 @@ def transcribe_whisper(wav_path: Path, model_path: str, no_gpu: bool) -> str:
     if result.returncode != 0:
         raise RuntimeError(result.stderr.strip() or "whisper-cli failed")
 
-    lines: list[str] = []
-    for line in result.stdout.splitlines():
-        line = line.strip()
-        if re.match(r"^\[[\d:\.]+\s*-->\s*[\d:\.]+\]", line):
-            continue
-        if line:
-            lines.append(line)
-    return " ".join(lines).strip()
-
-
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 150) -> Iterable[tuple[int, str]]:
-    cleaned = " ".join(text.split()).strip()
-    if len(cleaned) <= chunk_size:
-        return [(0, cleaned)]
-
-    chunks: list[tuple[int, str]] = []
-    start = 0
-    idx = 0
-    while start < len(cleaned):
-        end = start + chunk_size
-        if end < len(cleaned):
-            seg = cleaned[start:end]
-            last = max(
-                seg.rfind(". "),
-                seg.rfind("다. "),
-                seg.rfind("요. "),
-                seg.rfind("! "),
-                seg.rfind("? "),
-            )
-            if last > chunk_size * 0.5:
-                end = start + last + 2
-        else:
-            end = len(cleaned)
-        chunks.append((idx, cleaned[start:end].strip()))
-        if end >= len(cleaned):
-            break
-        start = end - overlap
-        idx += 1
-    return chunks
-
-
-def drop_chunk_triggers(conn: sqlite3.Connection) -> None:
-    conn.executescript(
-        """
-        DROP TRIGGER IF EXISTS chunks_ai;
-        DROP TRIGGER IF EXISTS chunks_ad;
-        DROP TRIGGER IF EXISTS chunks_au;
-        """
-    )
-
-
-def rebuild_fts_and_triggers(conn: sqlite3.Connection) -> None:
-    conn.executescript(
-        """
-        DROP TABLE IF EXISTS chunks_fts;
-        CREATE VIRTUAL TABLE chunks_fts USING fts5(
-          content, content_rowid='id', tokenize='unicode61'
-        );
-        INSERT INTO chunks_fts(rowid, content) SELECT id, content FROM chunks;
-
-        CREATE TRIGGER chunks_ai AFTER INSERT ON chunks BEGIN
-          INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
-        END;
-        CREATE TRIGGER chunks_ad AFTER DELETE ON chunks BEGIN
-          INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
-        END;
-        CREATE TRIGGER chunks_au AFTER UPDATE OF content ON chunks BEGIN
-          INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
-          INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
-        END;
-        """
-    )
-
-
-def update_db(conn: sqlite3.Connection, sermon_id: int, transcript: str) -> None:
-    cur = conn.cursor()
-    cur.execute("UPDATE sermons SET transcript_raw=? WHERE id=?", (transcript, sermon_id))
-    cur.execute("DELETE FROM chunks WHERE sermon_id=?", (sermon_id,))
-    for idx, content in chunk_text(transcript):
-        cur.execute(
-            "INSERT INTO chunks (sermon_id, chunk_index, content) VALUES (?, ?, ?)",
-            (sermon_id, idx, content),
-        )
-    conn.commit()
-
-
-def discover_default_base_dir() -> Path:
-    docs = Path("/Users/johau/Documents")
-    candidates = sorted(docs.glob("99_*설교"))
-    if candidates:
-        return candidates[0]
-    return docs / "99_연희동~노량진설교"
+    return parse_whisper_output(result.stdout)
 
 
 def resolve_audio(base_dir: Path, marker_text: str) -> Path | None:
@@ -151,15 +64,24 @@ def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--db", default="data/sermons.db")
     parser.add_argument("--model", default="models/ggml-large-v3.bin")
-    parser.add_argument("--base-dir", default=str(discover_default_base_dir()))
+    parser.add_argument("--base-dir", default="", help="NAS 설교 폴더 (기본: 자동 탐색)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="오디오 매니페스트 DB 경로")
+    parser.add_argument("--no-manifest", action="store_true", help="매니페스트 없이 파일마다 exists() 확인")
+    parser.add_argument("--vad-cache", default=DEFAULT_CACHE, help="음성 구간 캐시 DB 경로")
+    parser.add_argument("--no-speech-only", action="store_true", help="음성 구간만 잘라내지 않고 전체 wav 전사")
     parser.add_argument("--limit", type=int, default=0, help="0이면 전체")
     parser.add_argument("--ids", default="", help="쉼표 구분 sermon id 목록")
     parser.add_argument("--no-gpu", action="store_true", help="GPU 비활성화")
+    parser.add_argument("--dedup", action="store_true", help="오디오 지문으로 이미 전사된 중복 설교면 그 전사문 재사용")
+    parser.add_argument("--dedup-index", default=DEFAULT_INDEX, help="오디오 지문 인덱스 DB 경로")
     args = parser.parse_args()
 
-    base_dir = Path(args.base_dir)
+    base_dir = Path(args.base_dir) if args.base_dir else discover_default_base_dir()
     if not base_dir.exists():
         raise FileNotFoundError(f"base dir not found: {base_dir}")
+    manifest = None if args.no_manifest else open_refreshed(args.manifest, base_dir)
+    vad_cache = None if args.no_speech_only else open_cache(args.vad_cache)
+    fp_index = open_index(args.dedup_index) if args.dedup else None
 
     conn = sqlite3.connect(args.db)
     conn.execute("PRAGMA journal_mode=WAL;")
@@ -189,8 +111,12 @@ def main() -> None:
         done = 0
         skipped = 0
         failed = 0
+        reused = 0
         for sermon_id, title, marker in rows:
-            audio_path = resolve_audio(base_dir, marker or "")
+            if manifest:
+                audio_path = resolve_marker(manifest, base_dir, marker or "")
+            else:
+                audio_path = resolve_audio(base_dir, marker or "")
             if not audio_path:
                 skipped += 1
                 print(f"[skip] {sermon_id} audio not found")
@@ -198,9 +124,18 @@ def main() -> None:
 
             print(f"[start] {sermon_id} {title[:50]}")
             try:
+                dup = reuse_transcript(fp_index, conn, sermon_id, audio_path) if fp_index else None
+                if dup:
+                    update_db(conn, sermon_id, dup[1])
+                    reused += 1
+                    print(f"[reuse] {sermon_id} <- {dup[0]} chars={len(dup[1])}")
+                    continue
                 with tempfile.TemporaryDirectory() as td:
                     wav_path = Path(td) / "audio.wav"
                     convert_to_wav(audio_path, wav_path)
+                    if vad_cache:
+                        wav_path, _, report = prepare_speech_wav(audio_path, wav_path, vad_cache)
+                        print(f"  [vad] {report}")
                     transcript = transcribe_whisper(wav_path, args.model, args.no_gpu)
                 if transcript:
                     update_db(conn, sermon_id, transcript)
@@ -213,10 +148,14 @@ def main() -> None:
                 failed += 1
                 print(f"[fail] {sermon_id} {exc}")
 
-        print(f"[summary] done={done} skipped={skipped} failed={failed} total={total}")
+        print(f"[summary] done={done} reused={reused} skipped={skipped} failed={failed} total={total}")
     finally:
         rebuild_fts_and_triggers(conn)
         conn.close()
+        if fp_index:
+            fp_index.close()
+        if manifest:
+            manifest.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+설교 한 편을 여러 조각으로 나눠 병렬 전사 + 겹침 구간 이어붙이기.
+
+90분짜리 설교 하나도 코어 수만큼 나눠서 돌린다.
+- 조각 경계는 쉼(VAD 구간 사이)에 맞추고, 앞뒤로 overlap_sec 만큼 겹친다.
+- 각 조각은 whisper-cli 프로세스 또는 Qwen 워커 프로세스에서 따로 전사한다.
+- 이웃 조각의 끝/시작 단어열을 정렬해서 겹친 부분의 중복 단어를 제거한다.
+
+nas_whisper_convex.py / qwen_asr_batch_transcribe.py 의 --parallel 옵션에서 사용한다.
+"""
+
+import os
+import tempfile
+import wave
+from concurrent.futures import Executor, ThreadPoolExecutor
+from difflib import SequenceMatcher
+from typing import Callable
+
+Pieces = list[tuple[float, float]]
+
+
+def plan_pieces(
+    duration: float,
+    piece_sec: float,
+    overlap_sec: float = 2.0,
+    cut_points: list[float] | None = None,
+) -> Pieces:
+    """Split [0, duration] into ~piece_sec pieces, snapping cuts to the nearest pause.
+
+    `cut_points` are candidate pause times (e.g. joins between VAD regions);
+    a cut snaps to one if it lies within a quarter piece of the target.
+    """
+    if duration <= piece_sec * 1.25:
+        return [(0.0, duration)]
+    candidates = sorted(cut_points or [])
+    cuts: list[float] = []
+    target = piece_sec
+    while target < duration - piece_sec * 0.25:
+        cut = target
+        if candidates:
+            nearest = min(candidates, key=lambda c: abs(c - target))
+            prev = cuts[-1] if cuts else 0.0
+            if abs(nearest - target) <= piece_sec * 0.25 and nearest > prev:
+                cut = nearest
+        cuts.append(cut)
+        target = cut + piece_sec
+
+    bounds = [0.0, *cuts, duration]
+    return [
+        (max(0.0, bounds[i] - overlap_sec), min(duration, bounds[i + 1] + overlap_sec))
+        for i in range(len(bounds) - 1)
+    ]
+
+
+def wav_duration(wav_path: str) -> float:
+    with wave.open(wav_path, "rb") as w:
+        return w.getnframes() / w.getframerate()
+
+
+def cut_wav(wav_in: str, pieces: Pieces, out_dir: str) -> list[str]:
+    """Slice a PCM wav into piece files without re-decoding."""
+    paths: list[str] = []
+    with wave.open(wav_in, "rb") as src:
+        rate = src.getframerate()
+        for i, (start, end) in enumerate(pieces):
+            out = os.path.join(out_dir, f"piece-{i:03d}.wav")
+            src.setpos(int(start * rate))
+            with wave.open(out, "wb") as dst:
+                dst.setparams(src.getparams())
+                dst.writeframes(src.readframes(int((end - start) * rate)))
+            paths.append(out)
+    return paths
+
+
+# ─── 이어붙이기 ───────────────────────────────────────────────────
+WORDS_PER_SEC = 3.0   # 한국어 설교 어절 속도 (넉넉하게)
+
+
+def stitch_pair(left: list[str], right: list[str], overlap_sec: float = 4.0, min_match: int = 3) -> list[str]:
+    """Join two word lists whose edges overlap in time, dropping duplicated words.
+
+    Only the words that can fall inside the `overlap_sec` of shared audio are
+    aligned, and the common run (>= min_match words) must sit at the seam:
+    ending near the end of `left` and starting near the start of `right`.
+    A phrase repeated away from the seam is not an overlap → plain concatenation.
+    """
+    expected = max(min_match, int(overlap_sec * WORDS_PER_SEC + 0.5))
+    window = expected * 2
+    slack = max(2, expected // 3)  # 경계에서 잘린 단어 / 인식 차이
+    tail = left[-window:]
+    head = right[:window]
+    m = SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+    if m.size < min_match:
+        return left + right
+    # 겹침 안에서 일치하지 않은 나머지 단어 + 여유보다 경계에서 멀면 겹침이 아니다
+    edge = max(0, expected - m.size) + slack
+    if len(tail) - (m.a + m.size) > edge or m.b > edge:
+        return left + right
+    cut_left = len(left) - len(tail) + m.a
+    return left[:cut_left] + right[m.b:]
+
+
+def stitch(texts: list[str], overlap_sec: float = 4.0) -> str:
+    words: list[str] = []
+    for text in texts:
+        piece = text.split()
+        words = stitch_pair(words, piece, overlap_sec) if words else piece
+    return " ".join(words)
+
+
+# ─── 실행 ─────────────────────────────────────────────────────────
+def run_pieces(
+    wav_path: str,
+    pieces: Pieces,
+    transcribe_fn: Callable[[str], str],
+    workers: int = 0,
+    executor: Executor | None = None,
+    log: Callable[[str], None] = print,
+) -> str:
+    """Transcribe pieces concurrently and stitch them back in order.
+
+    Subprocess backends (whisper-cli) only need the default thread pool of
+    `workers`. In-process models (Qwen) pass a long-lived ProcessPoolExecutor
+    whose initializer loads the model once per worker; `transcribe_fn` must
+    then be a picklable top-level function.
+    """
+    with tempfile.TemporaryDirectory() as td:
+        paths = cut_wav(wav_path, pieces, td)
+        pool = executor or ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            futures = [pool.submit(transcribe_fn, p) for p in paths]
+            texts: list[str] = []
+            for i, (fut, (start, end)) in enumerate(zip(futures, pieces)):
+                # 조각 하나가 실패해도 설교 전체를 버리지 않는다 (순차 모드의 구간 실패와 같게)
+                try:
+                    text = fut.result()
+                except Exception as e:
+                    log(f"  [piece {i + 1}/{len(pieces)}] {start:7.1f}s → {end:7.1f}s fail: {e}")
+                    text = ""
+                else:
+                    log(f"  [piece {i + 1}/{len(pieces)}] {start:7.1f}s → {end:7.1f}s chars={len(text)}")
+                texts.append(text)
+        finally:
+            if executor is None:
+                pool.shutdown()
+    # 이웃 조각이 공유하는 오디오 길이 (plan_pieces 의 overlap_sec × 2)
+    shared = max((pieces[i][1] - pieces[i + 1][0] for i in range(len(pieces) - 1)), default=0.0)
+    return stitch(texts, max(shared, 1.0))
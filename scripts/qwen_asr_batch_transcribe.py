@@ -1,12 +1,27 @@
 import argparse
 import os
+import platform
 import sqlite3
 import subprocess
 import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-import torch
-from qwen_asr import Qwen3ASRModel
+from asr_checkpoint import DEFAULT_CHECKPOINT_DIR, Checkpoint, checkpoint_key
+from parallel_asr import plan_pieces, run_pieces, wav_duration
+from run_history import RunRecorder
+from sermon_db import drop_chunk_triggers, rebuild_fts_and_triggers, update_db
+from whisper_segments import Segment
+from vad_regions import (
+    DEFAULT_CACHE,
+    format_report,
+    open_cache,
+    plan_segments,
+    speech_regions,
+    speech_seconds,
+    write_speech_wav,
+)
 
 
 def audio_duration_seconds(audio_path: str) -> float:
@@ -24,7 +39,7 @@ def audio_duration_seconds(audio_path: str) -> float:
     return float(out)
 
 
-def extract_chunk(src: str, start: int, duration: int, out_wav: str) -> None:
+def extract_chunk(src: str, start: float, duration: float, out_wav: str) -> None:
     cmd = [
         "ffmpeg",
         "-y",
@@ -43,82 +58,172 @@ def extract_chunk(src: str, start: int, duration: int, out_wav: str) -> None:
     subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
 
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 150):
-    cleaned = " ".join(text.split()).strip()
-    if len(cleaned) <= chunk_size:
-        return [(0, cleaned)]
-    chunks = []
-    start = 0
-    idx = 0
-    while start < len(cleaned):
-        end = start + chunk_size
-        if end < len(cleaned):
-            seg = cleaned[start:end]
-            last = max(
-                seg.rfind(". "),
-                seg.rfind("다. "),
-                seg.rfind("요. "),
-                seg.rfind("! "),
-                seg.rfind("? "),
-            )
-            if last > chunk_size * 0.5:
-                end = start + last + 2
-        else:
-            end = len(cleaned)
-        chunks.append((idx, cleaned[start:end].strip()))
-        if end >= len(cleaned):
-            break
-        start = end - overlap
-        idx += 1
-    return chunks
-
-
-def drop_chunk_triggers(conn: sqlite3.Connection) -> None:
-    conn.executescript(
-        """
-        DROP TRIGGER IF EXISTS chunks_ai;
-        DROP TRIGGER IF EXISTS chunks_ad;
-        DROP TRIGGER IF EXISTS chunks_au;
-        """
+# ─── 모델 로딩 (torch / qwen_asr 는 실제로 모델이 필요할 때만 import) ────────
+def cpu_supports_bf16() -> bool:
+    """Native bf16 matmul on this CPU (AVX512-BF16 / AMX on x86, ARMv8.6 BF16 on Apple M2+)."""
+    if platform.system() == "Linux":
+        try:
+            flags = Path("/proc/cpuinfo").read_text()
+        except OSError:
+            return False
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    if platform.system() == "Darwin":
+        out = subprocess.run(
+            ["sysctl", "-n", "hw.optional.arm.FEAT_BF16"], capture_output=True, text=True
+        ).stdout.strip()
+        return out == "1"
+    return False
+
+
+def physical_cores() -> int:
+    """Physical core count (hyperthreads / efficiency-core splits aside); falls back to os.cpu_count()."""
+    if platform.system() == "Darwin":
+        out = subprocess.run(["sysctl", "-n", "hw.physicalcpu"], capture_output=True, text=True).stdout.strip()
+        if out.isdigit() and int(out) > 0:
+            return int(out)
+    try:
+        import psutil  # 선택 의존성
+    except ImportError:
+        pass
+    else:
+        n = psutil.cpu_count(logical=False)
+        if n:
+            return n
+    if platform.system() == "Linux":
+        # psutil 없이: (physical id, core id) 쌍의 개수 = 물리 코어 수
+        try:
+            cores, phys = set(), "0"
+            for line in Path("/proc/cpuinfo").read_text().splitlines():
+                key, _, value = line.partition(":")
+                if key.strip() == "physical id":
+                    phys = value.strip()
+                elif key.strip() == "core id":
+                    cores.add((phys, value.strip()))
+            if cores:
+                return len(cores)
+        except OSError:
+            pass
+    return os.cpu_count() or 1
+
+
+def threads_per_worker(threads: int, parallel: int) -> int:
+    """Split the intra-op thread budget (--threads, or all logical CPUs) across `parallel` processes."""
+    return max(1, (threads or os.cpu_count() or 2) // parallel)
+
+
+def load_model(
+    model_path: str,
+    dtype: str = "float32",
+    threads: int = 0,
+    interop_threads: int = 0,
+    mmap: bool = False,
+) -> tuple[object, str]:
+    """(model, dtype actually loaded) — bf16 / int8 fall back to float32 when unsupported."""
+    import torch
+    from qwen_asr import Qwen3ASRModel
+
+    # interop 스레드 수는 torch 가 병렬 작업을 한 번이라도 돌리기 전에 정해야 한다
+    if interop_threads > 0 and torch.get_num_interop_threads() != interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            print("[perf] interop threads already fixed for this process")
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+    if dtype == "bfloat16" and not cpu_supports_bf16():
+        print("[perf] bf16 not supported natively on this CPU → float32")
+        dtype = "float32"
+
+    kwargs = dict(
+        dtype=torch.bfloat16 if dtype == "bfloat16" else torch.float32,
+        device_map="cpu",
+        max_inference_batch_size=1,
+        max_new_tokens=384,
     )
+    t0 = time.time()
+    if mmap:
+        # safetensors 를 mmap 한 채로 로딩 → 가중치 복사본을 만들지 않아 RSS/콜드 스타트 감소
+        try:
+            model = Qwen3ASRModel.from_pretrained(model_path, low_cpu_mem_usage=True, **kwargs)
+        except TypeError:
+            model = Qwen3ASRModel.from_pretrained(model_path, **kwargs)
+    else:
+        model = Qwen3ASRModel.from_pretrained(model_path, **kwargs)
 
+    if dtype == "int8":
+        inner = getattr(model, "model", None)
+        if isinstance(inner, torch.nn.Module):
+            model.model = torch.ao.quantization.quantize_dynamic(inner, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            print("[perf] int8 dynamic quantization unavailable for this model wrapper → float32")
+            dtype = "float32"
 
-def rebuild_fts_and_triggers(conn: sqlite3.Connection) -> None:
-    conn.executescript(
-        """
-        DROP TABLE IF EXISTS chunks_fts;
-        CREATE VIRTUAL TABLE chunks_fts USING fts5(
-          content,
-          content_rowid='id',
-          tokenize='unicode61'
-        );
-        INSERT INTO chunks_fts(rowid, content)
-        SELECT id, content FROM chunks;
-
-        CREATE TRIGGER chunks_ai AFTER INSERT ON chunks BEGIN
-          INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
-        END;
-        CREATE TRIGGER chunks_ad AFTER DELETE ON chunks BEGIN
-          INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
-        END;
-        CREATE TRIGGER chunks_au AFTER UPDATE OF content ON chunks BEGIN
-          INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
-          INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
-        END;
-        """
+    print(
+        f"[perf] model loaded dtype={dtype} threads={torch.get_num_threads()} "
+        f"interop={torch.get_num_interop_threads()} mmap={mmap} {time.time() - t0:.1f}s"
     )
+    return model, dtype
 
 
-def update_db(conn: sqlite3.Connection, sermon_id: int, transcript: str) -> None:
-    cur = conn.cursor()
-    cur.execute("UPDATE sermons SET transcript_raw=? WHERE id=?", (transcript, sermon_id))
-    cur.execute("DELETE FROM chunks WHERE sermon_id=?", (sermon_id,))
-    for idx, content in chunk_text(transcript):
-        cur.execute(
-            "INSERT INTO chunks (sermon_id, chunk_index, content) VALUES (?, ?, ?)",
-            (sermon_id, idx, content),
-        )
-    conn.commit()
+# --parallel 워커 프로세스마다 모델을 한 번만 로딩한다
+_worker_model = None
+
+
+def _init_worker(model_path: str, dtype: str, threads: int, mmap: bool) -> None:
+    global _worker_model
+    _worker_model, _ = load_model(model_path, dtype, threads, 1, mmap)
+
+
+def _transcribe_piece(wav: str) -> str:
+    return _worker_model.transcribe(audio=wav, language="Korean")[0].text.strip()
+
+
+def transcribe_parallel(
+    audio_path: Path, regions: list | None, segment_sec: int, pool: ProcessPoolExecutor, td: str
+) -> str:
+    """Decode once, cut into overlapping pause-aligned pieces, transcribe on the pool, stitch."""
+    full_wav = os.path.join(td, "full.wav")
+    extract_chunk(str(audio_path), 0, audio_duration_seconds(str(audio_path)), full_wav)
+    wav, cut_points = full_wav, None
+    if regions:
+        wav = os.path.join(td, "speech.wav")
+        time_map = write_speech_wav(full_wav, regions, wav)
+        cut_points = [compact for compact, _ in time_map[1:]]
+    pieces = plan_pieces(wav_duration(wav), segment_sec, cut_points=cut_points)
+    return run_pieces(wav, pieces, _transcribe_piece, executor=pool)
+
+
+def char_error_rate(ref: str, hyp: str) -> float:
+    """Levenshtein distance over characters (spaces ignored) / len(ref)."""
+    ref = "".join(ref.split())
+    hyp = "".join(hyp.split())
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    prev = list(range(len(hyp) + 1))
+    for i, rc in enumerate(ref, 1):
+        cur = [i]
+        for j, hc in enumerate(hyp, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (rc != hc)))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+def compare_with_float32(args: argparse.Namespace) -> None:
+    """Transcribe a fixed clip with float32 and the chosen perf settings, report CER and speed."""
+    results = {}
+    for label, dtype in (("float32", "float32"), ("perf", args.dtype)):
+        model, _ = load_model(args.model_path, dtype, args.threads, args.interop_threads, args.mmap)
+        t0 = time.time()
+        text = model.transcribe(audio=args.compare_clip, language="Korean")[0].text.strip()
+        results[label] = (text, time.time() - t0)
+        del model
+
+    ref, ref_sec = results["float32"]
+    hyp, hyp_sec = results["perf"]
+    print(f"[compare] float32 {ref_sec:.1f}s chars={len(ref)}")
+    print(f"[compare] {args.dtype} {hyp_sec:.1f}s chars={len(hyp)} speedup={ref_sec / max(hyp_sec, 1e-6):.2f}x")
+    print(f"[compare] CER vs float32 = {char_error_rate(ref, hyp) * 100:.2f}%")
 
 
 def main():
@@ -128,16 +233,60 @@ def main():
     parser.add_argument("--audio-dir", default="data/audio")
     parser.add_argument("--db", default="data/sermons.db")
     parser.add_argument("--segment-sec", type=int, default=120)
+    parser.add_argument("--vad-cache", default=DEFAULT_CACHE, help="음성 구간 캐시 DB 경로")
+    parser.add_argument("--no-speech-only", action="store_true", help="VAD 없이 고정 길이 구간으로 자름")
+    parser.add_argument("--perf", action="store_true",
+                        help="CPU 성능 모드: bf16(지원 시) 또는 int8, 물리 코어 수 스레드, mmap 로딩")
+    parser.add_argument("--dtype", choices=["float32", "bfloat16", "int8"],
+                        help="가중치 dtype (기본 float32, --perf 면 bfloat16 지원 시 bfloat16 아니면 int8)")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op 스레드 수 (0이면 torch 기본값)")
+    parser.add_argument("--interop-threads", type=int, default=0, help="inter-op 스레드 수 (0이면 torch 기본값)")
+    parser.add_argument("--mmap", action="store_true", help="가중치를 mmap 으로 로딩 (low_cpu_mem_usage)")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="N개 워커 프로세스로 설교 한 편을 나눠 전사 (프로세스마다 모델 로딩)")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CHECKPOINT_DIR,
+                        help="세그먼트 단위 체크포인트 저장 위치 (중단된 설교는 이어서 전사)")
+    parser.add_argument("--no-checkpoint", action="store_true", help="체크포인트 비활성화")
+    parser.add_argument("--compare-clip", help="float32 대비 정확도(CER)/속도 비교용 고정 wav 클립")
     args = parser.parse_args()
 
-    model = Qwen3ASRModel.from_pretrained(
-        args.model_path,
-        dtype=torch.float32,
-        device_map="cpu",
-        max_inference_batch_size=1,
-        max_new_tokens=384,
+    if args.dtype is None:  # 명시한 --dtype 은 --perf 가 덮어쓰지 않는다
+        args.dtype = ("bfloat16" if cpu_supports_bf16() else "int8") if args.perf else "float32"
+    if args.perf:
+        if not args.threads:
+            args.threads = physical_cores()
+        if not args.interop_threads:
+            args.interop_threads = 1
+        args.mmap = True
+
+    if args.compare_clip:
+        compare_with_float32(args)
+        return
+
+    pool = None
+    model = None
+    if args.parallel > 1:
+        # --threads (--perf 면 물리 코어 수)는 전체 예산 — 프로세스마다 다 주면 N배 과다 구독
+        per_worker = threads_per_worker(args.threads, args.parallel)
+        pool = ProcessPoolExecutor(
+            max_workers=args.parallel,
+            initializer=_init_worker,
+            initargs=(args.model_path, args.dtype, per_worker, args.mmap),
+        )
+        # 워커 프로세스 안의 폴백은 여기서 못 보지만 bf16 미지원 폴백은 같은 판단이다
+        used_dtype = "float32" if args.dtype == "bfloat16" and not cpu_supports_bf16() else args.dtype
+        used_threads = per_worker
+    else:
+        import torch
+
+        model, used_dtype = load_model(args.model_path, args.dtype, args.threads, args.interop_threads, args.mmap)
+        used_threads = torch.get_num_threads()
+    recorder = RunRecorder(
+        "qwen_asr_batch_transcribe", args.model_path, threads=used_threads, parallel=args.parallel,
+        backend="qwen3-asr", dtype=used_dtype,
     )
 
+    vad_cache = None if args.no_speech_only else open_cache(args.vad_cache)
     conn = sqlite3.connect(args.db)
     cur = conn.cursor()
     drop_chunk_triggers(conn)
@@ -155,33 +304,70 @@ def main():
                 print(f"[skip] sermon {sermon_id}: audio missing ({audio_path})")
                 continue
 
-            total = int(audio_duration_seconds(str(audio_path)))
+            t0 = time.time()
+            regions = None
+            if vad_cache:
+                # 쉼 위치에 맞춘 세그먼트 — 찬양/무음 구간은 아예 디코딩하지 않는다
+                total, regions = speech_regions(str(audio_path), vad_cache)
+                segments = plan_segments(regions, args.segment_sec)
+                audio_sec = speech_seconds(regions)
+                print(f"[start] sermon {sermon_id} ({youtube_id}) {format_report(total, regions)}")
+            else:
+                total = audio_duration_seconds(str(audio_path))
+                audio_sec = total
+                segments = [
+                    (start, min(total, start + args.segment_sec))
+                    for start in range(0, int(total), args.segment_sec)
+                ]
+                print(f"[start] sermon {sermon_id} ({youtube_id}) duration={int(total)}s")
             texts = []
-            print(f"[start] sermon {sermon_id} ({youtube_id}) duration={total}s")
+            checkpoint = None
+            if not pool and not args.no_checkpoint:
+                key = checkpoint_key(audio_path, args.model_path, args.dtype, args.segment_sec, bool(vad_cache))
+                checkpoint = Checkpoint(args.checkpoint_dir, key)
+                texts = [seg.text for seg in checkpoint.segments]
+                if checkpoint.offset > 0:
+                    print(f"[{sermon_id}] checkpoint: resuming at {checkpoint.offset:.1f}s")
 
+            t_asr = time.time()
             with tempfile.TemporaryDirectory() as td:
-                i = 0
-                for start in range(0, total, args.segment_sec):
+                if pool:
+                    texts.append(transcribe_parallel(audio_path, regions, args.segment_sec, pool, td))
+                    segments = []
+                for i, (start, end) in enumerate(segments):
+                    if checkpoint and end <= checkpoint.offset:
+                        continue
                     wav = os.path.join(td, f"seg-{i:04d}.wav")
-                    extract_chunk(str(audio_path), start, args.segment_sec, wav)
+                    extract_chunk(str(audio_path), start, end - start, wav)
                     try:
                         res = model.transcribe(audio=wav, language="Korean")
-                        texts.append(res[0].text.strip())
-                        print(f"[{sermon_id}] {start:5d}s ok")
+                        text = res[0].text.strip()
+                        texts.append(text)
+                        if checkpoint:
+                            checkpoint.append(Segment(start, end, text))
+                        print(f"[{sermon_id}] {start:7.1f}s ok")
                     except Exception as e:
-                        print(f"[{sermon_id}] {start:5d}s fail: {e}")
-                    i += 1
+                        print(f"[{sermon_id}] {start:7.1f}s fail: {e}")
 
+            asr_sec = time.time() - t_asr
             transcript = " ".join(t for t in texts if t).strip()
             transcript = transcript.replace("  ", " ").strip()
+            recorder.item(sermon_id, audio_sec, asr_sec, time.time() - t0, ok=bool(transcript))
             if transcript:
                 update_db(conn, sermon_id, transcript)
+                if checkpoint:
+                    checkpoint.finish()
                 print(f"[done] sermon {sermon_id} chars={len(transcript)}")
             else:
                 print(f"[done] sermon {sermon_id} empty transcript")
     finally:
+        recorder.finish()
         rebuild_fts_and_triggers(conn)
         conn.close()
+        if vad_cache:
+            vad_cache.close()
+        if pool:
+            pool.shutdown()
 
 
 if __name__ == "__main__":
@@ -6,7 +6,6 @@
 
 import argparse
 import os
-import re
 import sqlite3
 import subprocess
 import tempfile
@@ -15,6 +14,18 @@ import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from asr_admission import RESERVE_MB, AdmissionController
+from asr_cascade import CascadeStats, make_cascade
+from audio_download import DownloadManager, parse_rate
+from audio_manifest import DEFAULT_MANIFEST, open_refreshed
+from parallel_asr import wav_duration
+from run_history import DEFAULT_THREADS, RunRecorder, open_history, print_plan
+import sermon_db
+from transcript_codec import TranscriptCodec
+from transcript_quality import NOISE_THRESHOLD, needs_retranscription, noise_score
+from vad_regions import DEFAULT_CACHE, open_cache, prepare_speech_wav
+from whisper_segments import parse_whisper_output
+
 _lock = threading.Lock()
 _print_lock = threading.Lock()
 
@@ -24,67 +35,28 @@ def tprint(*args, **kwargs):
         print(*args, **kwargs, flush=True)
 
 
-# ─── 노이즈 점수 계산 ──────────────────────────────────────────────
-def noise_score(text: str) -> float:
-    if not text:
-        return 999.0
-    count = sum(
-        len(text) - len(text.replace(f" {n} ", ""))
-        for n in ("0", "1", "2", "3")
-    )
-    return count / len(text) * 1000
-
-
+# ─── 불량 전사 탐지 ────────────────────────────────────────────────
 def get_bad_sermon_ids(db: str, threshold: float, already_done: set) -> list:
     conn = sqlite3.connect(db)
+    codec = TranscriptCodec(conn)
     cur = conn.cursor()
     rows = cur.execute(
         "SELECT id, youtube_id, title, transcript_raw FROM sermons WHERE transcript_raw IS NOT NULL"
-    ).fetchall()
-    conn.close()
+    )
 
     bad = []
-    for sid, yt_id, title, transcript in rows:
+    for sid, yt_id, title, value in rows:
         if sid in already_done:
             continue
-        score = noise_score(transcript)
-        if score > threshold or len(transcript) < 1000:
-            bad.append((sid, yt_id, title, score))
+        transcript = codec.decode(value)
+        if needs_retranscription(transcript, threshold):
+            bad.append((sid, yt_id, title, noise_score(transcript)))
 
+    conn.close()
     bad.sort(key=lambda x: x[3], reverse=True)
     return bad
 
 
-# ─── 오디오 다운로드 ───────────────────────────────────────────────
-def download_audio(youtube_id: str, audio_dir: Path) -> Path | None:
-    for ext in ("webm", "mp4", "m4a", "mp3", "wav"):
-        p = audio_dir / f"{youtube_id}.{ext}"
-        if p.exists():
-            return p
-
-    out_tmpl = str(audio_dir / f"{youtube_id}.%(ext)s")
-    result = subprocess.run(
-        [
-            "yt-dlp",
-            "--cookies-from-browser", "chrome",
-            "--js-runtimes", "deno",
-            "-f", "bestaudio",
-            "-o", out_tmpl,
-            f"https://www.youtube.com/watch?v={youtube_id}",
-        ],
-        capture_output=True, text=True,
-    )
-    if result.returncode != 0:
-        tprint(f"    [오류] 다운로드 실패: {result.stderr[-200:]}")
-        return None
-
-    for ext in ("webm", "mp4", "m4a", "mp3", "wav"):
-        p = audio_dir / f"{youtube_id}.{ext}"
-        if p.exists():
-            return p
-    return None
-
-
 # ─── WAV 변환 + 전사 ──────────────────────────────────────────────
 def convert_to_wav(src: str, out_wav: str) -> None:
     subprocess.run(
@@ -93,73 +65,28 @@ def convert_to_wav(src: str, out_wav: str) -> None:
     )
 
 
-def transcribe_whisper(wav_path: str, model_path: str) -> str:
-    result = subprocess.run(
-        ["whisper-cli", "-m", model_path, "-l", "ko", "--no-timestamps", "-f", wav_path],
-        capture_output=True, text=True,
-    )
-    lines = []
-    for line in result.stdout.splitlines():
-        line = line.strip()
-        if re.match(r"^\[[\d:\.]+\s*-->\s*[\d:\.]+\]", line):
-            continue
-        if line:
-            lines.append(line)
-    return " ".join(lines).strip()
+def transcribe_whisper(
+    wav_path: str, model_path: str, admission: AdmissionController | None = None, threads: int = DEFAULT_THREADS
+) -> str:
+    cmd = ["whisper-cli", "-m", model_path, "-l", "ko", "--no-timestamps", "-t", str(threads), "-f", wav_path]
+    if admission:
+        result = admission.run(cmd, key=Path(model_path).name, model_path=model_path)
+    else:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    return parse_whisper_output(result.stdout)
 
 
 # ─── DB 업데이트 ──────────────────────────────────────────────────
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 150):
-    cleaned = " ".join(text.split()).strip()
-    if len(cleaned) <= chunk_size:
-        return [(0, cleaned)]
-    chunks, start, idx = [], 0, 0
-    while start < len(cleaned):
-        end = start + chunk_size
-        if end < len(cleaned):
-            seg = cleaned[start:end]
-            last = max(seg.rfind(". "), seg.rfind("다. "), seg.rfind("요. "),
-                       seg.rfind("! "), seg.rfind("? "))
-            if last > chunk_size * 0.5:
-                end = start + last + 2
-        else:
-            end = len(cleaned)
-        chunks.append((idx, cleaned[start:end].strip()))
-        if end >= len(cleaned):
-            break
-        start = end - overlap
-        idx += 1
-    return chunks
-
-
 def disable_fts_triggers(db: str) -> None:
     conn = sqlite3.connect(db)
-    conn.executescript("""
-        DROP TRIGGER IF EXISTS chunks_ai;
-        DROP TRIGGER IF EXISTS chunks_ad;
-        DROP TRIGGER IF EXISTS chunks_au;
-    """)
+    sermon_db.drop_chunk_triggers(conn)
     conn.close()
 
 
 def rebuild_fts(db: str) -> None:
     print("FTS 재빌드 중...", flush=True)
     conn = sqlite3.connect(db)
-    conn.executescript("""
-        DROP TABLE IF EXISTS chunks_fts;
-        CREATE VIRTUAL TABLE chunks_fts USING fts5(content, content_rowid='id', tokenize='unicode61');
-        INSERT INTO chunks_fts(rowid, content) SELECT id, content FROM chunks;
-        CREATE TRIGGER chunks_ai AFTER INSERT ON chunks BEGIN
-          INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
-        END;
-        CREATE TRIGGER chunks_ad AFTER DELETE ON chunks BEGIN
-          INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
-        END;
-        CREATE TRIGGER chunks_au AFTER UPDATE OF content ON chunks BEGIN
-          INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
-          INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
-        END;
-    """)
+    sermon_db.rebuild_fts_and_triggers(conn)
     conn.close()
     print("FTS 재빌드 완료!", flush=True)
 
@@ -168,16 +95,10 @@ def update_db(db: str, sermon_id: int, transcript: str) -> None:
     with _lock:
         conn = sqlite3.connect(db, timeout=30)
         conn.execute("PRAGMA journal_mode=WAL")
-        cur = conn.cursor()
-        cur.execute("UPDATE sermons SET transcript_raw=? WHERE id=?", (transcript, sermon_id))
-        cur.execute("DELETE FROM chunks WHERE sermon_id=?", (sermon_id,))
-        for idx, content in chunk_text(transcript):
-            cur.execute(
-                "INSERT INTO chunks (sermon_id, chunk_index, content) VALUES (?, ?, ?)",
-                (sermon_id, idx, content),
-            )
-        conn.commit()
-        conn.close()
+        try:
+            sermon_db.update_db(conn, sermon_id, transcript)
+        finally:
+            conn.close()
 
 
 # ─── 진행 상황 파일 ───────────────────────────────────────────────
@@ -200,10 +121,21 @@ def main():
     parser.add_argument("--model", default="models/ggml-large-v3.bin")
     parser.add_argument("--db", default="data/sermons.db")
     parser.add_argument("--audio-dir", default="data/audio")
-    parser.add_argument("--threshold", type=float, default=8.0, help="노이즈 점수 임계값")
+    parser.add_argument("--threshold", type=float, default=NOISE_THRESHOLD, help="노이즈 점수 임계값")
+    parser.add_argument("--fast-model", default="",
+                        help="캐스케이드: 이 모델로 먼저 전사하고 품질 불량일 때만 --model 로 재전사")
     parser.add_argument("--keep-audio", action="store_true", help="전사 후 오디오 파일 보존")
     parser.add_argument("--dry-run", action="store_true", help="목록만 출력, 실행 안 함")
-    parser.add_argument("--workers", type=int, default=1, help="병렬 작업자 수 (기본: 1)")
+    parser.add_argument("--vad-cache", default=DEFAULT_CACHE, help="음성 구간 캐시 DB 경로")
+    parser.add_argument("--no-speech-only", action="store_true", help="음성 구간만 잘라내지 않고 전체 wav 전사")
+    parser.add_argument("--workers", type=int, default=1, help="병렬 작업자 수 (기본: 1, 메모리 여유에 따라 자동 조절되는 상한)")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="whisper-cli 스레드 수 (-t, 작업자마다)")
+    parser.add_argument("--reserve-mb", type=int, default=RESERVE_MB, help="whisper 에 내주지 않고 남겨둘 메모리(MB)")
+    parser.add_argument("--no-adaptive", action="store_true", help="메모리 보고 동시 실행 수를 조절하지 않고 --workers 개를 그대로 실행")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="오디오 매니페스트 DB 경로")
+    parser.add_argument("--no-manifest", action="store_true", help="매니페스트 없이 확장자별 exists() 확인")
+    parser.add_argument("--download-concurrency", type=int, default=2, help="동시 다운로드 수 (작업자 전체 공유)")
+    parser.add_argument("--rate-limit", default="0", help="다운로드 전체 대역폭 제한 (예: 4M, 500K; 0=무제한)")
     args = parser.parse_args()
 
     audio_dir = Path(args.audio_dir)
@@ -216,17 +148,43 @@ def main():
     if args.dry_run:
         for sid, yt_id, title, score in bad_sermons:
             tprint(f"  [{sid}] score={score:.1f} {title[:50]}")
+        history = open_history()
+        try:
+            print_plan(history, len(bad_sermons), max_workers=max(args.workers, 8))
+        finally:
+            history.close()
         return
 
     total = len(bad_sermons)
     completed = [0]
+    manifest = None
+    if not args.no_manifest:
+        open_refreshed(args.manifest, audio_dir).close()
+        manifest = args.manifest
+    downloader = DownloadManager(
+        audio_dir, args.download_concurrency, parse_rate(args.rate_limit), log=tprint, manifest=manifest
+    )
+    admission = None if args.no_adaptive else AdmissionController(args.workers, args.reserve_mb, log=tprint)
+    cascade = CascadeStats() if args.fast_model else None
+    if cascade:
+        transcribe = make_cascade(
+            lambda wav: transcribe_whisper(wav, args.fast_model, admission, args.threads),
+            lambda wav: transcribe_whisper(wav, args.model, admission, args.threads),
+            cascade,
+            log=tprint,
+        )
+    else:
+        transcribe = lambda wav: transcribe_whisper(wav, args.model, admission, args.threads)  # noqa: E731
+    recorder = RunRecorder(
+        "retranscribe_bad", args.model, args.fast_model, args.workers, args.threads, adaptive=admission is not None
+    )
 
     def process_sermon(item):
         sermon_id, youtube_id, title, score = item
         t0 = time.time()
         tprint(f"\n[{sermon_id}] score={score:.1f} | {title[:45]}")
 
-        audio_path = download_audio(youtube_id, audio_dir)
+        audio_path = downloader.download(youtube_id)
         if not audio_path:
             tprint(f"  [{sermon_id}] skip: 다운로드 실패")
             return
@@ -235,16 +193,30 @@ def main():
             with tempfile.TemporaryDirectory() as td:
                 wav_path = os.path.join(td, "audio.wav")
                 convert_to_wav(str(audio_path), wav_path)
-                transcript = transcribe_whisper(wav_path, args.model)
+                if not args.no_speech_only:
+                    # sqlite 연결은 스레드 간 공유 불가 → 작업마다 연다
+                    vad_cache = open_cache(args.vad_cache)
+                    try:
+                        speech_wav, _, report = prepare_speech_wav(audio_path, Path(wav_path), vad_cache)
+                    finally:
+                        vad_cache.close()
+                    wav_path = str(speech_wav)
+                    tprint(f"  [{sermon_id}] VAD {report}")
+                audio_sec = wav_duration(wav_path)
+                t_asr = time.time()
+                transcript = transcribe(wav_path)
+                asr_sec = time.time() - t_asr
 
             if transcript:
                 update_db(args.db, sermon_id, transcript)
                 mark_done(sermon_id)
+                recorder.item(sermon_id, audio_sec, asr_sec, time.time() - t0)
                 with _lock:
                     completed[0] += 1
                 elapsed = int(time.time() - t0)
                 tprint(f"  [{sermon_id}] 완료 {completed[0]}/{total} | chars={len(transcript)} | {elapsed}s")
             else:
+                recorder.item(sermon_id, audio_sec, asr_sec, time.time() - t0, ok=False)
                 tprint(f"  [{sermon_id}] 경고: 전사 결과 없음")
         except Exception as e:
             tprint(f"  [{sermon_id}] 오류: {e}")
@@ -259,8 +231,15 @@ def main():
         for f in as_completed(futures):
             f.result()
 
+    # 적응형이면 --workers 는 상한일 뿐 — 실제로 같이 돈 최대 수를 기록해야 plan 이 맞는 처리량을 쓴다
+    recorder.finish(cascade, admission.peak_running if admission else 0)
     rebuild_fts(args.db)
     tprint(f"\n전체 완료! ({completed[0]}/{total}개 성공)")
+    tprint(downloader.summary())
+    if admission:
+        tprint(admission.summary())
+    if cascade:
+        tprint(cascade.summary())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+전사 실행 기록 + 배치 용량 계획.
+
+retranscribe_bad.py --dry-run / nas_whisper_convex.py --limit 은 대상 개수만 알려줄 뿐
+얼마나 걸릴지, 어떤 설정이 제일 빠른지는 알려주지 않는다.
+전사 스크립트가 실행마다 설정(백엔드, 모델/dtype, 캐스케이드, 작업자/스레드 수, 호스트)을 runs 에,
+설교마다 오디오 길이(VAD 후 음성 길이)와 ASR 시간 / 전체 처리 시간을 items 에 남기고 (data/run_history.db),
+plan 명령이 그 기록으로 제안된 배치의 벽시계 시간, CPU 시간, 최대 메모리를 설정별로 추정해서 하나를 추천한다.
+
+- 처리량: 같은 설정으로 돈 과거 실행의 설교당 (전체 처리 시간 / 오디오 길이) 중앙값 = 작업자 하나의 실시간 배율
+- 기록에 없는 작업자 수는 가장 가까운 관측값에서 CPU 경합(작업자 × 스레드 / 코어)만큼 늘려 추정 (~ 표시)
+- 메모리 / CPU 병렬도는 asr_admission 이 모델별로 학습한 data/asr_memory.json 을 쓴다
+- 캐스케이드 실행의 시간에는 승격된 재전사 시간이 이미 들어 있다 (승격률은 참고로 표시)
+- 적응형 동시 실행(asr_admission)이면 --workers 는 상한일 뿐이라, 실행이 끝날 때 실제 최대 동시 실행 수로 바꿔 적는다
+
+Usage:
+  python3 scripts/run_history.py runs
+  python3 scripts/run_history.py plan --count 300
+  python3 scripts/run_history.py plan --count 300 --avg-min 40 --max-workers 6
+  python3 scripts/retranscribe_bad.py --dry-run      # 대상 목록 + plan
+"""
+
+import argparse
+import os
+import socket
+import sqlite3
+import statistics
+import threading
+import time
+
+from asr_admission import RESERVE_MB, MemoryHistory
+
+DEFAULT_HISTORY = "data/run_history.db"
+DEFAULT_THREADS = 4   # whisper-cli -t 기본값
+
+
+def open_history(path: str = DEFAULT_HISTORY) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS runs (
+          id INTEGER PRIMARY KEY,
+          script TEXT NOT NULL,
+          host TEXT NOT NULL,
+          cpus INTEGER,
+          mem_mb INTEGER,
+          backend TEXT NOT NULL,
+          model TEXT NOT NULL,
+          fast_model TEXT NOT NULL DEFAULT '',
+          workers INTEGER NOT NULL,
+          threads INTEGER NOT NULL,
+          parallel INTEGER NOT NULL DEFAULT 1,
+          started_at TEXT NOT NULL,
+          finished_at TEXT,
+          items INTEGER DEFAULT 0,
+          escalated INTEGER DEFAULT 0,
+          dtype TEXT NOT NULL DEFAULT '',
+          adaptive INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS items (
+          run_id INTEGER NOT NULL,
+          sermon_id TEXT NOT NULL,
+          audio_sec REAL NOT NULL,
+          asr_sec REAL NOT NULL,
+          total_sec REAL NOT NULL,
+          ok INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS items_run ON items(run_id);
+    """)
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(runs)")}
+    for name, decl in (("dtype", "TEXT NOT NULL DEFAULT ''"), ("adaptive", "INTEGER NOT NULL DEFAULT 0")):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE runs ADD COLUMN {name} {decl}")
+    conn.commit()
+    return conn
+
+
+def total_memory_mb() -> int:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+# ─── 기록 ───
+
+class RunRecorder:
+    """One row in runs + one row per sermon; safe to call from worker threads.
+
+    `workers` is the configured concurrency; with `adaptive` admission pass the concurrency
+    that actually ran to finish() instead.
+    """
+
+    def __init__(
+        self,
+        script: str,
+        model: str,
+        fast_model: str = "",
+        workers: int = 1,
+        threads: int = 0,
+        parallel: int = 1,
+        backend: str = "whisper.cpp",
+        dtype: str = "",
+        adaptive: bool = False,
+        path: str = DEFAULT_HISTORY,
+    ) -> None:
+        self.conn = open_history(path)
+        self._lock = threading.Lock()
+        cur = self.conn.execute(
+            "INSERT INTO runs (script, host, cpus, mem_mb, backend, model, fast_model, workers, threads, parallel,"
+            " started_at, dtype, adaptive) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                script, socket.gethostname(), os.cpu_count(), total_memory_mb(), backend,
+                os.path.basename(model), os.path.basename(fast_model), workers, threads or DEFAULT_THREADS,
+                parallel, time.strftime("%Y-%m-%dT%H:%M:%S"), dtype, int(adaptive),
+            ),
+        )
+        self.conn.commit()
+        self.run_id = cur.lastrowid
+
+    def item(self, sermon_id, audio_sec: float, asr_sec: float, total_sec: float, ok: bool = True) -> None:
+        if audio_sec <= 0:
+            return
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO items (run_id, sermon_id, audio_sec, asr_sec, total_sec, ok) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.run_id, str(sermon_id), audio_sec, asr_sec, total_sec, int(ok)),
+            )
+            self.conn.commit()
+
+    def finish(self, cascade=None, workers: int = 0) -> None:
+        """Close the run; `workers` (if > 0) replaces the configured count with the effective one."""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE runs SET finished_at=?, items=(SELECT count(*) FROM items WHERE run_id=?), escalated=?,"
+                " workers=CASE WHEN ? > 0 THEN ? ELSE workers END WHERE id=?",
+                (
+                    time.strftime("%Y-%m-%dT%H:%M:%S"), self.run_id, cascade.escalated if cascade else 0,
+                    workers, workers, self.run_id,
+                ),
+            )
+            self.conn.commit()
+            self.conn.close()
+
+
+# ─── 계획 ───
+
+def _configs(conn: sqlite3.Connection, host: str | None) -> list[dict]:
+    """Observed (backend, model, dtype, fast_model, workers, threads, parallel) groups with per-worker wall RTF."""
+    where, params = "WHERE i.ok = 1", []
+    if host:
+        where += " AND r.host = ?"
+        params.append(host)
+    groups: dict[tuple, dict] = {}
+    for backend, model, dtype, fast, workers, threads, parallel, audio, asr, total, run_id, items, esc in conn.execute(
+        f"""SELECT r.backend, r.model, r.dtype, r.fast_model, r.workers, r.threads, r.parallel,
+                   i.audio_sec, i.asr_sec, i.total_sec, r.id, r.items, r.escalated
+            FROM items i JOIN runs r ON r.id = i.run_id {where}""",
+        params,
+    ):
+        g = groups.setdefault(
+            (backend, model, dtype, fast, workers, threads, parallel),
+            {"rtf": [], "asr_rtf": [], "audio": [], "runs": {}},
+        )
+        g["rtf"].append(total / audio)
+        g["asr_rtf"].append(asr / audio)
+        g["audio"].append(audio)
+        g["runs"][run_id] = (items or 0, esc or 0)
+    out = []
+    for (backend, model, dtype, fast, workers, threads, parallel), g in groups.items():
+        items = sum(n for n, _ in g["runs"].values())
+        out.append({
+            "backend": backend, "model": model, "dtype": dtype, "fast_model": fast, "workers": workers,
+            "threads": threads, "parallel": parallel, "n": len(g["rtf"]),
+            "rtf": statistics.median(g["rtf"]), "asr_rtf": statistics.median(g["asr_rtf"]),
+            "audio_sec": statistics.mean(g["audio"]),
+            "escalation": sum(e for _, e in g["runs"].values()) / items if items and fast else None,
+        })
+    return out
+
+
+def estimate(
+    conn: sqlite3.Connection,
+    count: int,
+    avg_audio_sec: float | None = None,
+    max_workers: int = 8,
+    host: str | None = None,
+) -> list[dict]:
+    """Wall time / CPU-hours / peak memory for `count` sermons under each observed or extrapolated config."""
+    if host == "":
+        observed = _configs(conn, None)
+    else:
+        observed = _configs(conn, host or socket.gethostname())
+        if not observed and host is None:
+            observed = _configs(conn, None)  # 이 머신 기록이 없으면 다른 머신 기록이라도
+    if not observed:
+        return []
+    if avg_audio_sec is None:
+        avg_audio_sec = statistics.mean(c["audio_sec"] for c in observed)
+    total_audio = count * avg_audio_sec
+    cpus = os.cpu_count() or 4
+    memory = MemoryHistory()
+    budget = total_memory_mb() - RESERVE_MB
+
+    families: dict[tuple, list[dict]] = {}
+    for c in observed:
+        families.setdefault(
+            (c["backend"], c["model"], c["dtype"], c["fast_model"], c["threads"], c["parallel"]), []
+        ).append(c)
+
+    plans = []
+    for (backend, model, dtype, fast, threads, parallel), seen in families.items():
+        by_workers = {c["workers"]: c for c in seen}
+        for workers in range(1, max_workers + 1):
+            base = by_workers.get(workers) or min(seen, key=lambda c: abs(c["workers"] - workers))
+            contention = max(1.0, workers * threads * parallel / cpus) / max(1.0, base["workers"] * threads * parallel / cpus)
+            rtf = base["rtf"] * contention
+            wall = total_audio * rtf / workers
+            keys = [model] + ([fast] if fast else [])
+            per_job = max(memory.peak_mb(k) for k in keys)
+            parallelism = max(memory.parallelism(k) for k in keys)
+            peak = per_job * workers * parallel
+            plans.append({
+                "config": f"{model}" + (f" {dtype}" if dtype else "") + (f" (cascade {fast})" if fast else "")
+                          + f" w={workers} t={threads}"
+                          + (f" p={parallel}" if parallel > 1 else ""),
+                "workers": workers,
+                "measured": workers in by_workers,
+                "samples": base["n"],
+                "rtf": rtf,
+                "wall_h": wall / 3600,
+                "cpu_h": wall * workers * parallel * parallelism / 3600,
+                "peak_mb": peak,
+                "fits": budget <= 0 or peak <= budget,
+                "escalation": base["escalation"],
+            })
+    plans.sort(key=lambda p: (not p["fits"], p["wall_h"], p["cpu_h"]))
+    return plans
+
+
+def print_plan(conn: sqlite3.Connection, count: int, avg_audio_sec: float | None = None,
+               max_workers: int = 8, host: str | None = None, top: int = 12) -> None:
+    plans = estimate(conn, count, avg_audio_sec, max_workers, host)
+    if not plans:
+        print("[plan] 실행 기록이 없습니다 — 한 번 돌리고 나면 추정할 수 있습니다")
+        return
+    print(f"[plan] {count}편, 메모리 예산 {total_memory_mb() - RESERVE_MB}MB, 코어 {os.cpu_count()}")
+    print(f"  {'config':<44} {'wall':>7} {'cpu-h':>7} {'peak':>8}  samples")
+    for p in plans[:top]:
+        wall = ("" if p["measured"] else "~") + f"{p['wall_h']:.1f}h"
+        esc = f" esc={p['escalation'] * 100:.0f}%" if p["escalation"] is not None else ""
+        over = "" if p["fits"] else "  메모리 초과"
+        print(
+            f"  {p['config']:<44} {wall:>7} {p['cpu_h']:>6.1f}h {p['peak_mb'] / 1024:>6.1f}GB"
+            f"  {p['samples']}{esc}{over}"
+        )
+    best = plans[0]
+    if best["fits"]:
+        print(f"[plan] 추천: {best['config']} → 약 {best['wall_h']:.1f}시간")
+    else:
+        print("[plan] 메모리 안에 들어가는 설정이 없습니다 (--reserve-mb / 작업자 수 확인)")
+
+
+def print_runs(conn: sqlite3.Connection, limit: int = 20) -> None:
+    rows = conn.execute(
+        """SELECT r.id, r.started_at, r.script, r.host, r.backend, r.model, r.dtype, r.fast_model, r.workers,
+                  r.adaptive, r.threads, count(i.run_id), sum(i.audio_sec), sum(i.asr_sec), r.escalated
+           FROM runs r LEFT JOIN items i ON i.run_id = r.id GROUP BY r.id ORDER BY r.id DESC LIMIT ?""",
+        (limit,),
+    ).fetchall()
+    for rid, started, script, host, backend, model, dtype, fast, workers, adaptive, threads, n, audio, asr, esc in rows:
+        rtf = f"asr_rtf={asr / audio:.2f}" if audio else ""
+        cascade = f" cascade={fast} esc={esc}" if fast else ""
+        model = f"{model} {dtype}" if dtype else model
+        w = f"w={workers}" + ("(adaptive)" if adaptive else "")
+        print(f"#{rid} {started} {script} @{host} {backend} {model} {w} t={threads}{cascade} items={n} {rtf}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="전사 실행 기록 / 배치 용량 계획")
+    parser.add_argument("command", choices=["runs", "plan"])
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="실행 기록 DB 경로")
+    parser.add_argument("--count", type=int, default=0, help="plan: 전사할 설교 수")
+    parser.add_argument("--avg-min", type=float, default=0, help="plan: 설교당 음성 길이(분), 0이면 기록 평균")
+    parser.add_argument("--max-workers", type=int, default=8, help="plan: 비교할 최대 작업자 수")
+    parser.add_argument("--any-host", action="store_true", help="plan: 다른 머신 기록도 같이 사용")
+    args = parser.parse_args()
+
+    conn = open_history(args.history)
+    try:
+        if args.command == "runs":
+            print_runs(conn)
+        else:
+            if args.count <= 0:
+                parser.error("plan 에는 --count 가 필요합니다")
+            host = "" if args.any_host else None
+            print_plan(conn, args.count, args.avg_min * 60 or None, args.max_workers, host)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+sermons.db 쓰기 공용 함수 (청킹 / FTS 트리거 / 전사 저장).
+
+whisper_transcribe.py, nas_whisper_transcribe.py, qwen_asr_batch_transcribe.py,
+retranscribe_bad.py 에 각각 복사돼 있던 chunk_text / update_db / 트리거 관리를 모았다.
+전사 저장 시 asr_corrections 로 ASR 교정을 한 번 적용하고 청크는 교정문으로 만든다
+(Convex saveNasTranscript 와 같은 규칙: transcript_raw = 원문, transcript_corrected = 교정문).
+compression_dicts 사전이 있으면(transcript_codec.py compress) 전사문은 압축해서 쓴다.
+"""
+
+import sqlite3
+import time
+
+from asr_corrections import correct as asr_correct
+from transcript_codec import codec_for
+
+
+def chunk_text(text: str, chunk_size: int = 800, overlap: int = 150) -> list[tuple[int, str]]:
+    cleaned = " ".join(text.split()).strip()
+    if len(cleaned) <= chunk_size:
+        return [(0, cleaned)]
+    chunks = []
+    start = 0
+    idx = 0
+    while start < len(cleaned):
+        end = start + chunk_size
+        if end < len(cleaned):
+            seg = cleaned[start:end]
+            last = max(
+                seg.rfind(". "), seg.rfind("다. "),
+                seg.rfind("요. "), seg.rfind("! "), seg.rfind("? "),
+            )
+            if last > chunk_size * 0.5:
+                end = start + last + 2
+        else:
+            end = len(cleaned)
+        chunks.append((idx, cleaned[start:end].strip()))
+        if end >= len(cleaned):
+            break
+        start = end - overlap
+        idx += 1
+    return chunks
+
+
+def drop_chunk_triggers(conn: sqlite3.Connection) -> None:
+    conn.executescript("""
+        DROP TRIGGER IF EXISTS chunks_ai;
+        DROP TRIGGER IF EXISTS chunks_ad;
+        DROP TRIGGER IF EXISTS chunks_au;
+    """)
+
+
+FTS_BATCH = 5000
+
+_FTS_TRIGGERS = (
+    """CREATE TRIGGER chunks_ai AFTER INSERT ON chunks BEGIN
+      INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER chunks_ad AFTER DELETE ON chunks BEGIN
+      INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER chunks_au AFTER UPDATE OF content ON chunks BEGIN
+      INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
+      INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+)
+
+
+def create_chunk_triggers(conn: sqlite3.Connection) -> None:
+    for stmt in _FTS_TRIGGERS:
+        conn.execute(stmt)
+
+
+def _fill_shadow(conn: sqlite3.Connection, after_id: int, batch: int) -> int:
+    """Copy chunks with id > after_id into chunks_fts_new in rowid order; returns the last id copied."""
+    while True:
+        row = conn.execute(
+            "SELECT max(id) FROM (SELECT id FROM chunks WHERE id > ? ORDER BY id LIMIT ?)", (after_id, batch)
+        ).fetchone()
+        if row[0] is None:
+            return after_id
+        conn.execute(
+            "INSERT INTO chunks_fts_new(rowid, content) SELECT id, content FROM chunks WHERE id > ? AND id <= ? ORDER BY id",
+            (after_id, row[0]),
+        )
+        conn.commit()  # 배치마다 커밋 → WAL 자동 체크포인트가 따라올 수 있다
+        after_id = row[0]
+
+
+def _resync_shadow(conn: sqlite3.Connection, last_id: int) -> None:
+    """Bring chunks_fts_new up to date with chunks changed while it was being filled.
+
+    id > last_id 는 새로 추가된 청크, 그 이하는 제자리 UPDATE (correct-chunks.ts) 나
+    --no-fts 병렬 실행의 rowid 재사용으로 내용이 바뀌었을 수 있다 → FTS5 의 content 섀도
+    테이블(chunks_fts_new_content: id, c0)과 비교해서 다르거나 빠진 행만 다시 넣는다.
+    """
+    stale = [
+        row[0] for row in conn.execute(
+            "SELECT c.id FROM chunks c JOIN chunks_fts_new_content s ON s.id = c.id "
+            "WHERE c.id <= ? AND c.content IS NOT s.c0",
+            (last_id,),
+        )
+    ]
+    for i in range(0, len(stale), 500):
+        part = stale[i:i + 500]
+        conn.execute(f"DELETE FROM chunks_fts_new WHERE rowid IN ({','.join('?' * len(part))})", part)
+    conn.execute(
+        "INSERT INTO chunks_fts_new(rowid, content) SELECT id, content FROM chunks "
+        "WHERE id > ? OR id NOT IN (SELECT id FROM chunks_fts_new_content) ORDER BY id",
+        (last_id,),
+    )
+    conn.execute("DELETE FROM chunks_fts_new WHERE rowid NOT IN (SELECT id FROM chunks)")
+
+
+def rebuild_fts_and_triggers(conn: sqlite3.Connection, batch: int = FTS_BATCH) -> None:
+    """Build chunks_fts_new beside the live index, then swap it in with one short transaction.
+
+    기존 chunks_fts 는 빌드 동안 계속 검색에 쓰이고, 교체는 빌드 중 바뀐 청크 따라잡기 +
+    DROP + RENAME + 트리거 생성만 하는 짧은 트랜잭션이라 검색이 비거나 오류를 내는 구간이 없다.
+    따라잡기는 락 밖에서 한 번 (대부분 여기서 처리), 락 안에서 다시 한 번 한다.
+    """
+    conn.commit()
+    conn.executescript("""
+        DROP TABLE IF EXISTS chunks_fts_new;
+        CREATE VIRTUAL TABLE chunks_fts_new USING fts5(
+          content, content_rowid='id', tokenize='unicode61'
+        );
+    """)
+    last_id = _fill_shadow(conn, 0, batch)
+    # 배치로 넣으면 세그먼트가 많이 생기므로 교체 전에 병합해 둔다 (검색은 아직 옛 인덱스)
+    conn.execute("INSERT INTO chunks_fts_new(chunks_fts_new) VALUES('optimize')")
+    conn.commit()
+    _resync_shadow(conn, last_id)
+    last_id = conn.execute("SELECT coalesce(max(id), 0) FROM chunks_fts_new_content").fetchone()[0]
+    conn.commit()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # 빌드 중 다른 프로세스(--no-fts 병렬 실행, correct-chunks.ts)가 바꾼 청크 따라잡기
+        _resync_shadow(conn, last_id)
+        conn.execute("DROP TRIGGER IF EXISTS chunks_ai")
+        conn.execute("DROP TRIGGER IF EXISTS chunks_ad")
+        conn.execute("DROP TRIGGER IF EXISTS chunks_au")
+        conn.execute("DROP TABLE IF EXISTS chunks_fts")
+        conn.execute("ALTER TABLE chunks_fts_new RENAME TO chunks_fts")
+        create_chunk_triggers(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def update_db(
+    conn: sqlite3.Connection,
+    sermon_id: int,
+    transcript: str,
+    max_retries: int = 5,
+    correct: bool = True,
+) -> None:
+    """Store a raw transcript, its ASR-corrected form, and re-chunk the corrected text."""
+    corrected = asr_correct(transcript) if correct else transcript
+    chunks = chunk_text(corrected)
+    codec = codec_for(conn)
+    raw_value, corrected_value = codec.encode(transcript), codec.encode(corrected)
+    for attempt in range(max_retries):
+        try:
+            cur = conn.cursor()
+            if correct:
+                cur.execute(
+                    "UPDATE sermons SET transcript_raw=?, transcript_corrected=? WHERE id=?",
+                    (raw_value, corrected_value, sermon_id),
+                )
+            else:
+                cur.execute("UPDATE sermons SET transcript_raw=? WHERE id=?", (raw_value, sermon_id))
+            cur.execute("DELETE FROM chunks WHERE sermon_id=?", (sermon_id,))
+            cur.executemany(
+                "INSERT INTO chunks (sermon_id, chunk_index, content) VALUES (?, ?, ?)",
+                [(sermon_id, idx, content) for idx, content in chunks],
+            )
+            conn.commit()
+            return
+        except sqlite3.OperationalError:
+            conn.rollback()
+            if attempt < max_retries - 1:
+                time.sleep(1 + attempt)
+                continue
+            raise
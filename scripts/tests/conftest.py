@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# scripts/ 의 모듈은 `python3 scripts/x.py` 로 실행되며 서로를 형제 모듈로 import 한다
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,25 @@
+import shutil
+
+import pytest
+
+from asr_corrections import AsrCorrector, fuzz_inputs, run_node
+
+
+@pytest.fixture(scope="module")
+def corrector() -> AsrCorrector:
+    return AsrCorrector()
+
+
+@pytest.fixture(scope="module")
+def inputs(corrector: AsrCorrector) -> list[str]:
+    return fuzz_inputs(corrector.entries, 3000)
+
+
+def test_merged_passes_match_sequential(corrector, inputs):
+    sequential = AsrCorrector(merge=False)
+    assert [corrector(x) for x in inputs] == [sequential(x) for x in inputs]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node 없음")
+def test_matches_typescript_apply_asr_corrections(corrector, inputs):
+    assert [corrector(x) for x in inputs] == run_node(inputs)
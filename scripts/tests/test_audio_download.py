@@ -0,0 +1,135 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import audio_download
+from audio_download import AudioFormat, DownloadError, DownloadManager, RateLimiter
+from audio_manifest import open_refreshed
+
+PAYLOAD = bytes(range(256)) * 1200   # 300KB
+
+
+class _Media(BaseHTTPRequestHandler):
+    """Serves PAYLOAD with Range support; `faults` lists one-shot misbehaviours per request."""
+
+    faults: list[str] = []
+    ranges: list[str] = []
+
+    def do_GET(self) -> None:
+        fault = self.faults.pop(0) if self.faults else ""
+        self.ranges.append(self.headers.get("Range", ""))
+        if fault == "403":
+            self.send_error(403)
+            return
+        start, end = 0, len(PAYLOAD) - 1
+        rng = self.headers.get("Range", "")
+        if rng.startswith("bytes=") and fault != "ignore-range":
+            a, _, b = rng[6:].partition("-")
+            start, end = int(a), min(int(b or end), end)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")
+        else:
+            self.send_response(200)
+        body = PAYLOAD[start:end + 1]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if fault == "cut":
+            self.wfile.write(body[:len(body) // 2])  # 청크 중간에서 연결이 끊긴다
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(audio_download, "CHUNK_BYTES", 64 * 1024)
+    monkeypatch.setattr(audio_download, "BACKOFF_SEC", 0.0)
+    handler = type("Media", (_Media,), {"faults": [], "ranges": []})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield handler, f"http://127.0.0.1:{httpd.server_address[1]}/x.webm"
+    httpd.shutdown()
+
+
+def _fmt(url: str, size: int | None = len(PAYLOAD)) -> AudioFormat:
+    return AudioFormat("251", "webm", url, {}, size, None, 48.0)
+
+
+def test_resumes_from_leftover_part(tmp_path, server):
+    handler, url = server
+    (tmp_path / "a.f251.webm.part").write_bytes(PAYLOAD[:100_000])
+    logs = []
+    path = DownloadManager(tmp_path, log=logs.append).fetch("a", _fmt(url))
+    assert path.read_bytes() == PAYLOAD
+    assert handler.ranges[0].startswith("bytes=100000-")
+    assert "이어받기" in logs[-1]
+
+
+def test_connection_cut_mid_chunk_resumes(tmp_path, server):
+    handler, url = server
+    handler.faults[:] = ["", "cut"]
+    path = DownloadManager(tmp_path, log=lambda _: None).fetch("a", _fmt(url))
+    assert path.read_bytes() == PAYLOAD
+    # 끊긴 요청이 받은 절반부터 다시 요청한다
+    cut_at = 64 * 1024 + 32 * 1024
+    assert handler.ranges[2].startswith(f"bytes={cut_at}-")
+
+
+def test_single_403_re_resolves_and_keeps_part(tmp_path, server):
+    handler, url = server
+    handler.faults[:] = ["", "403"]
+    refreshed = []
+
+    def refresh() -> AudioFormat:
+        refreshed.append(1)
+        return _fmt(url)
+
+    path = DownloadManager(tmp_path, log=lambda _: None).fetch("a", _fmt(url), refresh=refresh)
+    assert path.read_bytes() == PAYLOAD
+    assert refreshed == [1]
+    assert handler.ranges[2].startswith(f"bytes={64 * 1024}-")  # 같은 포맷이면 .part 유지
+
+
+def test_server_ignoring_range_restarts_from_zero(tmp_path, server):
+    handler, url = server
+    (tmp_path / "a.f251.webm.part").write_bytes(b"stale" * 1000)
+    handler.faults[:] = ["ignore-range"]
+    path = DownloadManager(tmp_path, log=lambda _: None).fetch("a", _fmt(url))
+    assert path.read_bytes() == PAYLOAD
+
+
+def test_size_mismatch_is_rejected(tmp_path, server):
+    _, url = server
+    manager = DownloadManager(tmp_path, retries=2, log=lambda _: None)
+    with pytest.raises(DownloadError):
+        manager.fetch("a", _fmt(url, size=len(PAYLOAD) + 10))
+    assert not (tmp_path / "a.webm").exists()
+    assert not (tmp_path / "a.f251.webm.part").exists()
+
+
+def test_rate_limiter_throttles_to_rate():
+    limiter = RateLimiter(200 * 1024)
+    t0 = time.monotonic()
+    for _ in range(40):
+        limiter.consume(10 * 1024)   # 400KB, 버킷에 처음 200KB 가 있으므로 나머지 200KB 에 약 1초
+    elapsed = time.monotonic() - t0
+    assert 0.9 <= elapsed < 2.0
+
+
+def test_existing_uses_manifest(tmp_path):
+    audio = tmp_path / "audio"
+    audio.mkdir()
+    (audio / "abc.m4a").write_bytes(b"x")
+    manifest = str(tmp_path / "m.db")
+    open_refreshed(manifest, audio).close()
+    manager = DownloadManager(audio, manifest=manifest, log=lambda _: None)
+    assert manager.existing("abc") == (audio / "abc.m4a").resolve()
+    (audio / "abc.m4a").unlink()   # 매니페스트에는 남아 있지만 파일은 없다
+    assert manager.existing("abc") is None
+    assert DownloadManager(audio, log=lambda _: None).existing("abc") is None
@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import audio_fingerprint
+from audio_fingerprint import HOP, SAMPLE_RATE, add_file, find_duplicates, open_index
+from transcript_quality import MIN_TRANSCRIPT_CHARS, needs_retranscription
+
+
+def _noise(seed: int, seconds: float):
+    x = np.random.default_rng(seed).normal(0, 3000, int(seconds * SAMPLE_RATE))
+    return np.convolve(x, np.ones(4) / 4, mode="same").astype("<i2")
+
+
+@pytest.fixture
+def recordings(tmp_path, monkeypatch):
+    """Synthetic PCM served through decode_pcm/probe_duration (no ffmpeg here)."""
+    sermon = _noise(1, 1000)
+    audio = {
+        "a.opus": sermon,
+        # 같은 예배 인트로(앞 320초)에 다른 설교
+        "b.opus": np.concatenate([sermon[:320 * SAMPLE_RATE], _noise(2, 680)]),
+        # 같은 설교, 인트로가 150 프레임 더 붙은 NAS 사본
+        "c.mp3": np.concatenate([_noise(3, 150 * HOP / SAMPLE_RATE), sermon]),
+    }
+    paths = {}
+    for name, pcm in audio.items():
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        paths[name] = path
+
+    def decode_pcm(path, seconds=audio_fingerprint.HEAD_SEC, start=0.0):
+        pcm = audio[path.name]
+        lo = int(round(start * SAMPLE_RATE))
+        return pcm[lo:lo + int(seconds * SAMPLE_RATE)].tobytes()
+
+    monkeypatch.setattr(audio_fingerprint, "decode_pcm", decode_pcm)
+    monkeypatch.setattr(audio_fingerprint, "probe_duration", lambda p: len(audio[p.name]) / SAMPLE_RATE)
+    return paths
+
+
+def test_shared_intro_is_not_a_duplicate(tmp_path, recordings):
+    index = open_index(str(tmp_path / "fp.db"))
+    add_file(index, recordings["a.opus"], 1)
+    item = add_file(index, recordings["b.opus"], 2)
+    assert find_duplicates(index, item) == []
+
+
+def test_same_sermon_with_longer_intro_matches(tmp_path, recordings):
+    index = open_index(str(tmp_path / "fp.db"))
+    a = add_file(index, recordings["a.opus"], 1)
+    add_file(index, recordings["b.opus"], 2)
+    c = add_file(index, recordings["c.mp3"], 3)
+    dups = find_duplicates(index, c)
+    assert [d[0] for d in dups] == [a]
+    assert dups[0][3] == pytest.approx(-150 * HOP / SAMPLE_RATE)
+
+
+def test_reuse_applies_retranscribe_criteria():
+    clean = "하나님의 은혜를 구하는 말씀입니다. " * 100
+    assert not needs_retranscription(clean)
+    assert needs_retranscription(clean[:MIN_TRANSCRIPT_CHARS - 1])
+    assert needs_retranscription(clean + " 1 2 3 4 5 6 7 8 9 10" * 200)
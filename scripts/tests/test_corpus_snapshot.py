@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from corpus_snapshot import export_snapshot, load_snapshot, list_snapshots  # noqa: E402
+from sermon_db import chunk_text, drop_chunk_triggers, rebuild_fts_and_triggers, update_db  # noqa: E402
+
+
+def _text(word: str, n: int = 400) -> str:
+    return " ".join(f"{word}{i}입니다." for i in range(n))
+
+
+def _source(path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE sermons (id INTEGER PRIMARY KEY, youtube_id TEXT, title TEXT, published_at TEXT,
+                              transcript_raw TEXT, transcript_corrected TEXT, summary TEXT, tags TEXT);
+        CREATE TABLE chunks (id INTEGER PRIMARY KEY, sermon_id INTEGER, chunk_index INTEGER, content TEXT);
+    """)
+    for sid, word in ((1, "믿음"), (2, "소망"), (3, "사랑")):
+        text = _text(word)
+        conn.execute("INSERT INTO sermons VALUES (?, ?, ?, NULL, ?, ?, NULL, NULL)", (sid, f"yt{sid}", word, text, text))
+        conn.executemany(
+            "INSERT INTO chunks (sermon_id, chunk_index, content) VALUES (?, ?, ?)",
+            [(sid, idx, content) for idx, content in chunk_text(text)],
+        )
+    conn.commit()
+    rebuild_fts_and_triggers(conn)
+    return conn
+
+
+def _state(conn: sqlite3.Connection):
+    sermons = conn.execute("SELECT id, transcript_raw FROM sermons ORDER BY id").fetchall()
+    chunks = conn.execute("SELECT sermon_id, chunk_index, content FROM chunks ORDER BY sermon_id, chunk_index").fetchall()
+    fts = conn.execute("SELECT rowid, content FROM chunks_fts ORDER BY rowid").fetchall()
+    return sermons, chunks, fts
+
+
+def test_incremental_catches_reused_ids_deletes_and_chunk_edits(tmp_path):
+    src = _source(tmp_path / "src.db")
+    out = tmp_path / "snaps"
+    export_snapshot(src, out)
+
+    dst = sqlite3.connect(tmp_path / "dst.db")
+    load_snapshot(dst, out / list_snapshots(out)[0]["name"])
+    assert _state(dst) == _state(src)
+
+    max_chunk = src.execute("SELECT max(id) FROM chunks").fetchone()[0]
+    drop_chunk_triggers(src)  # 전사 스크립트처럼 트리거 없이 쓴다
+    update_db(src, 3, _text("은혜", 200), correct=False)  # 가장 큰 청크 id 를 다시 쓴다
+    assert src.execute("SELECT max(id) FROM chunks").fetchone()[0] <= max_chunk
+    src.execute("DELETE FROM chunks WHERE sermon_id = 1")
+    src.execute("DELETE FROM sermons WHERE id = 1")
+    src.execute("UPDATE chunks SET content = '고친 청크' WHERE sermon_id = 2 AND chunk_index = 0")
+    src.commit()
+    rebuild_fts_and_triggers(src)
+
+    manifest = export_snapshot(src, out, incremental=True)
+    assert manifest["deleted"] == [1]
+    assert manifest["tables"]["sermons"]["rows"] == 2
+    load_snapshot(dst, out / manifest["name"])
+    assert _state(dst) == _state(src)
+
+
+def test_force_full_reload_into_populated_db(tmp_path):
+    src = _source(tmp_path / "src.db")
+    out = tmp_path / "snaps"
+    export_snapshot(src, out)
+    name = list_snapshots(out)[0]["name"]
+
+    dst = sqlite3.connect(tmp_path / "dst.db")
+    load_snapshot(dst, out / name)
+    load_snapshot(dst, out / name, force=True)
+    assert _state(dst) == _state(src)
@@ -0,0 +1,15 @@
+import asyncio
+
+from nas_whisper_async import Progress, save_with_retry
+
+
+def test_save_failure_to_spawn_counts_as_failed(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))  # npx 가 없는 환경
+    progress = Progress()
+
+    async def main() -> None:
+        sem = asyncio.Semaphore(2)
+        await asyncio.gather(*(save_with_retry({"rawTranscript": "x"}, sid, sem, progress) for sid in (1, 2)))
+
+    asyncio.run(main())
+    assert progress.counts == {"done": 0, "skipped": 0, "failed": 2}
@@ -0,0 +1,41 @@
+import wave
+
+from parallel_asr import plan_pieces, run_pieces, stitch_pair
+
+
+def _words(prefix: str, n: int) -> list[str]:
+    return [f"{prefix}{i}" for i in range(n)]
+
+
+def test_stitch_drops_duplicated_seam_words():
+    left = _words("a", 40) + ["은혜가", "넘치는", "하루", "되시길", "바랍니다"]
+    right = ["은혜가", "넘치는", "하루", "되시길", "바랍니다"] + _words("b", 40)
+    assert stitch_pair(left, right, overlap_sec=2.0) == _words("a", 40) + right
+
+
+def test_stitch_ignores_repeated_phrase_away_from_seam():
+    phrase = ["주님", "감사합니다", "아멘"]
+    left = _words("a", 5) + phrase + _words("c", 40)
+    right = _words("d", 30) + phrase + _words("e", 6)
+    assert stitch_pair(left, right, overlap_sec=4.0) == left + right
+
+
+def test_failing_piece_does_not_abort(tmp_path):
+    wav = tmp_path / "a.wav"
+    with wave.open(str(wav), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(b"\0\0" * 16000 * 30)
+    pieces = plan_pieces(30.0, 10.0)
+    calls = []
+
+    def transcribe(path: str) -> str:
+        calls.append(path)
+        if path.endswith("piece-001.wav"):
+            raise RuntimeError("worker died")
+        return path.rsplit("-", 1)[1]
+
+    text = run_pieces(str(wav), pieces, transcribe, workers=2, log=lambda _: None)
+    assert len(calls) == len(pieces)
+    assert text == "000.wav 002.wav"
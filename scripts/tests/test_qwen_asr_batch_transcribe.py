@@ -0,0 +1,10 @@
+import os
+
+from qwen_asr_batch_transcribe import threads_per_worker
+
+
+def test_thread_budget_is_split_across_pool_workers():
+    assert threads_per_worker(8, 4) == 2
+    assert threads_per_worker(8, 3) == 2
+    assert threads_per_worker(2, 4) == 1
+    assert threads_per_worker(0, 2) == max(1, (os.cpu_count() or 2) // 2)
@@ -0,0 +1,39 @@
+import sqlite3
+
+from run_history import RunRecorder, _configs, open_history
+
+
+def test_adaptive_run_records_effective_concurrency(tmp_path):
+    path = str(tmp_path / "h.db")
+    recorder = RunRecorder("retranscribe_bad", "models/ggml-large-v3.bin", workers=6, threads=4,
+                           adaptive=True, path=path)
+    recorder.item(1, 600.0, 300.0, 320.0)
+    recorder.finish(workers=2)
+    conn = open_history(path)
+    assert conn.execute("SELECT workers, adaptive, items FROM runs").fetchone() == (2, 1, 1)
+
+
+def test_backends_and_dtypes_are_separate_configs(tmp_path):
+    path = str(tmp_path / "h.db")
+    for kwargs in ({}, {"backend": "qwen3-asr", "dtype": "int8"}, {"backend": "qwen3-asr", "dtype": "bfloat16"}):
+        recorder = RunRecorder("x", "models/m.bin", path=path, **kwargs)
+        recorder.item(1, 600.0, 300.0, 320.0)
+        recorder.finish()
+    configs = _configs(open_history(path), None)
+    assert sorted((c["backend"], c["dtype"]) for c in configs) == [
+        ("qwen3-asr", "bfloat16"), ("qwen3-asr", "int8"), ("whisper.cpp", ""),
+    ]
+
+
+def test_old_history_gains_new_columns(tmp_path):
+    path = tmp_path / "h.db"
+    old = sqlite3.connect(path)
+    old.execute(
+        "CREATE TABLE runs (id INTEGER PRIMARY KEY, script TEXT NOT NULL, host TEXT NOT NULL, cpus INTEGER,"
+        " mem_mb INTEGER, backend TEXT NOT NULL, model TEXT NOT NULL, fast_model TEXT NOT NULL DEFAULT '',"
+        " workers INTEGER NOT NULL, threads INTEGER NOT NULL, parallel INTEGER NOT NULL DEFAULT 1,"
+        " started_at TEXT NOT NULL, finished_at TEXT, items INTEGER DEFAULT 0, escalated INTEGER DEFAULT 0)"
+    )
+    old.close()
+    columns = {r[1] for r in open_history(str(path)).execute("PRAGMA table_info(runs)")}
+    assert {"dtype", "adaptive"} <= columns
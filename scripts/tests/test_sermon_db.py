@@ -0,0 +1,49 @@
+import sqlite3
+
+import sermon_db
+from sermon_db import rebuild_fts_and_triggers
+
+
+def _db(path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE chunks (id INTEGER PRIMARY KEY, sermon_id INTEGER, chunk_index INTEGER, content TEXT)")
+    conn.executemany(
+        "INSERT INTO chunks (sermon_id, chunk_index, content) VALUES (?, ?, ?)",
+        [(sid, 0, f"설교 {sid} 본문 은혜") for sid in range(1, 21)],
+    )
+    conn.commit()
+    return conn
+
+
+def _hits(conn: sqlite3.Connection, word: str) -> list[int]:
+    return [r[0] for r in conn.execute("SELECT rowid FROM chunks_fts WHERE chunks_fts MATCH ? ORDER BY rowid", (word,))]
+
+
+def test_rebuild_catches_up_chunks_changed_during_fill(tmp_path, monkeypatch):
+    path = tmp_path / "s.db"
+    conn = _db(path)
+    fill = sermon_db._fill_shadow
+
+    def fill_then_edit(conn_, after_id, batch):
+        last = fill(conn_, after_id, batch)
+        # 채우는 동안 다른 프로세스가: 낮은 id 제자리 수정, 삭제, 삭제된 rowid 재사용, 새 청크 추가
+        other = sqlite3.connect(path)
+        other.execute("UPDATE chunks SET content='설교 1 본문 교정됨' WHERE id=1")
+        other.execute("DELETE FROM chunks WHERE id=5")
+        other.execute("INSERT INTO chunks (id, sermon_id, chunk_index, content) VALUES (5, 99, 0, '재사용 행')")
+        other.execute("DELETE FROM chunks WHERE id=7")
+        other.execute("INSERT INTO chunks (sermon_id, chunk_index, content) VALUES (21, 0, '새 청크')")
+        other.commit()
+        other.close()
+        return last
+
+    monkeypatch.setattr(sermon_db, "_fill_shadow", fill_then_edit)
+    rebuild_fts_and_triggers(conn, batch=4)
+
+    assert _hits(conn, "교정됨") == [1]
+    assert _hits(conn, "재사용") == [5]
+    assert _hits(conn, "새") == [21]
+    assert _hits(conn, "은혜") == [i for i in range(2, 21) if i not in (5, 7)]
+    indexed = conn.execute("SELECT count(*) FROM chunks_fts").fetchone()[0]
+    assert indexed == conn.execute("SELECT count(*) FROM chunks").fetchone()[0]
@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+
+import transcript_codec
+from transcript_codec import codec_for, compress_db, decompress_db, text_consumers
+
+
+def _db(path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE sermons (id INTEGER PRIMARY KEY, transcript_raw TEXT, transcript_corrected TEXT)")
+    text = " ".join(f"하나님의 말씀 {i % 50} 을 들으십시오." for i in range(300))
+    conn.executemany("INSERT INTO sermons VALUES (?, ?, ?)", [(i, text, text) for i in range(1, 6)])
+    conn.commit()
+    return conn
+
+
+def test_text_consumers_skip_scripts_that_decode(tmp_path):
+    (tmp_path / "scripts").mkdir()
+    (tmp_path / "scripts" / "plain.mjs").write_text("db.prepare('SELECT transcript_raw FROM sermons')")
+    (tmp_path / "scripts" / "aware.ts").write_text("// transcript_codec decode\nSELECT transcript_corrected")
+    (tmp_path / "scripts" / "other.mjs").write_text("SELECT title FROM sermons")
+    assert text_consumers(tmp_path) == ["scripts/plain.mjs"]
+
+
+def test_compress_refuses_while_text_consumers_exist(tmp_path, monkeypatch):
+    conn = _db(tmp_path / "a.db")
+    monkeypatch.setattr(transcript_codec, "text_consumers", lambda: ["scripts/correct-transcripts.mjs"])
+    with pytest.raises(SystemExit):
+        compress_db(conn, "zlib")
+    assert isinstance(conn.execute("SELECT transcript_raw FROM sermons WHERE id=1").fetchone()[0], str)
+
+
+def test_codec_cached_per_connection_until_dicts_change(tmp_path):
+    path = tmp_path / "a.db"
+    conn = _db(path)
+    compress_db(conn, "zlib", allow_text_consumers=True)
+    codec = codec_for(conn)
+    assert codec.enabled and codec_for(conn) is codec
+
+    other = sqlite3.connect(path)
+    decompress_db(other)  # 다른 연결(프로세스)이 압축을 끄면
+    other.close()
+    assert not codec_for(conn).enabled
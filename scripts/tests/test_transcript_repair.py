@@ -0,0 +1,35 @@
+from transcript_repair import find_damaged_ranges, splice
+from whisper_segments import Segment
+
+
+def _segments() -> list[Segment]:
+    segs = []
+    for k in range(30):
+        start = k * 6.0
+        # 60~120초 구간만 whisper 반복 루프
+        text = "아멘 할렐루야 아멘." if 60 <= start < 120 else f"하나님의 {chr(0xAC00 + k * 97)}{chr(0xB098 + k * 31)} 말씀을 듣습니다."
+        segs.append(Segment(start, start + 6.0, text))
+    return segs
+
+
+def test_ranges_cover_boundary_segments_whole():
+    segs = _segments()
+    ranges = find_damaged_ranges(segs)
+    assert ranges == [(54.0, 126.0)]
+    for lo, hi in ranges:
+        for s in segs:
+            if s.end > lo and s.start < hi:
+                assert lo <= s.start and s.end <= hi
+
+
+def test_splice_keeps_speech_outside_redone_range():
+    segs = _segments()
+    ranges = find_damaged_ranges(segs)
+    text = splice(segs, ranges, ["다시 전사한 구간."])
+    lo, hi = ranges[0]
+    for s in segs:
+        # 다시 디코딩하지 않은 부분이 걸친 세그먼트는 원문 그대로 남아야 한다
+        if not (lo <= s.start and s.end <= hi):
+            assert s.text in text
+    assert text.count("다시 전사한 구간.") == 1
+    assert "아멘 할렐루야" not in text
@@ -0,0 +1,15 @@
+from whisper_segments import Segment, parse_segment_line, parse_whisper_output
+
+
+def test_parse_keeps_text_after_timestamps():
+    out = "[00:00:00.000 --> 00:00:02.500]   하나님의 은혜입니다.\n[00:00:02.500 --> 00:00:05.000]   아멘.\n"
+    assert parse_whisper_output(out) == "하나님의 은혜입니다. 아멘."
+
+
+def test_parse_no_timestamps_output():
+    assert parse_whisper_output("  첫 줄\n\n둘째 줄  \n") == "첫 줄 둘째 줄"
+
+
+def test_parse_segment_line():
+    assert parse_segment_line("[00:01:02.340 --> 00:01:05.120]  말씀") == Segment(62.34, 65.12, "말씀")
+    assert parse_segment_line("plain") is None
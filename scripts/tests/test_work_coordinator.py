@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+from work_coordinator import Coordinator, WorkClient, WorkQueue, run_worker, serve
+
+
+def test_skipped_item_goes_to_another_worker_without_spending_attempts():
+    saved: dict[int, str] = {}
+    queue = WorkQueue([{"sermon_id": sid} for sid in range(1, 7)], lease_sec=0.3, max_attempts=1)
+    coordinator = Coordinator(queue, saved.__setitem__, log=lambda _: None)
+    server = serve(coordinator, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    # a 에는 2번 오디오가 없고, 6번은 어느 머신에도 없다
+    missing = {"a": {2, 6}, "b": {6}}
+    counts = {}
+
+    def worker(name: str) -> None:
+        def process(item: dict) -> str | None:
+            return None if item["sermon_id"] in missing[name] else f"{name}:{item['sermon_id']}"
+
+        counts[name] = run_worker(WorkClient(url, name), process, log=lambda _: None)
+
+    try:
+        threads = [threading.Thread(target=worker, args=(name,)) for name in missing]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=20)
+        assert not any(t.is_alive() for t in threads)
+    finally:
+        server.shutdown()
+
+    # max_attempts=1 이라 release 가 시도 횟수를 썼다면 2번은 실패로 끝났을 것
+    assert sorted(saved) == [1, 2, 3, 4, 5]
+    assert saved[2] == "b:2"
+    assert queue.attempts[2] == 0
+    assert list(queue.failed) == [6]
+    assert "a" in queue.failed[6] and "b" in queue.failed[6]
+    assert counts["a"]["failed"] == counts["b"]["failed"] == 0
+    assert coordinator.finished.is_set()
+
+
+class _FlakyClient:
+    """claim 한 번 → submit 은 코디네이터 연결 끊김으로 실패 → 다음 claim 은 done."""
+
+    worker = "flaky"
+
+    def __init__(self) -> None:
+        self.claims = 0
+
+    def claim(self) -> dict:
+        self.claims += 1
+        if self.claims == 1:
+            return {"item": {"sermon_id": 7}, "lease": 1, "heartbeat_sec": 60}
+        return {"item": None, "done": True}
+
+    def submit(self, sermon_id: int, lease: int, transcript: str) -> None:
+        raise ConnectionRefusedError("coordinator unreachable")
+
+    def fail(self, sermon_id: int, lease: int, error: str) -> None:
+        pass
+
+    @contextmanager
+    def heartbeating(self, sermon_id: int, lease: int, interval: float):
+        yield threading.Event()
+
+
+def test_on_submitted_only_after_successful_submit():
+    submitted = []
+    run_worker(_FlakyClient(), lambda item: "전사문", log=lambda _: None, on_submitted=submitted.append)
+    assert submitted == []
+
+
+# ─── 워커 프로세스 ───
+
+def _healthy_worker(url: str, name: str) -> None:
+    def process(item: dict) -> str:
+        time.sleep(0.05)
+        return f"{name}:{item['sermon_id']}"
+
+    run_worker(WorkClient(url, name), process, log=lambda _: None)
+
+
+def _stuck_worker(url: str, claimed) -> None:
+    def process(item: dict) -> str:
+        claimed.put(item["sermon_id"])
+        time.sleep(60)  # 여기서 SIGKILL 된다
+        return "never"
+
+    run_worker(WorkClient(url, "stuck"), process, log=lambda _: None)
+
+
+def test_killed_worker_process_item_is_reclaimed_and_saved_once():
+    ctx = multiprocessing.get_context("fork")
+    saves: dict[int, list[str]] = {}
+    queue = WorkQueue([{"sermon_id": sid} for sid in range(1, 9)], lease_sec=1.0)
+    coordinator = Coordinator(queue, lambda sid, text: saves.setdefault(sid, []).append(text), log=lambda _: None)
+    server = serve(coordinator, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    claimed = ctx.Queue()
+    procs = []
+    try:
+        stuck = ctx.Process(target=_stuck_worker, args=(url, claimed))
+        stuck.start()
+        procs.append(stuck)
+        victim = claimed.get(timeout=10)
+        os.kill(stuck.pid, signal.SIGKILL)  # lease 를 쥔 채로 죽는다 (heartbeat 도 같이 멈춤)
+        stuck.join(5)
+
+        for name in ("w1", "w2", "w3"):
+            p = ctx.Process(target=_healthy_worker, args=(url, name))
+            p.start()
+            procs.append(p)
+        for p in procs[1:]:
+            p.join(30)
+        assert all(p.exitcode == 0 for p in procs[1:])
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.kill()
+        server.shutdown()
+
+    assert sorted(saves) == list(range(1, 9))
+    assert all(len(texts) == 1 for texts in saves.values())
+    assert not saves[victim][0].startswith("stuck")
+    assert queue.attempts[victim] == 1  # 만료로 한 번 소모
+    assert not queue.failed
+    assert coordinator.finished.is_set()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+sermons.db 전사문 압축 저장 (선택 모드).
+
+sermons.transcript_raw / transcript_corrected 는 설교당 수십 KB 평문이라 DB 파일과 백업의 대부분을 차지한다.
+compress 명령을 한 번 돌리면 코퍼스로 학습한 사전을 compression_dicts 테이블에 저장하고
+긴 전사문을 BLOB(헤더 + zstd/zlib 압축)으로 바꾼다. 이후 sermon_db.update_db 는
+사전이 있으면 새 전사문도 압축해서 쓰고, read_transcript 가 평문/압축을 가리지 않고 읽는다.
+
+- chunks 는 그대로 평문 (FTS 영향 없음)
+- [nas-audio] 마커 같은 짧은 값은 평문 유지 (LIKE 조회가 그대로 동작)
+- zstandard 패키지가 있으면 zstd + 학습 사전, 없으면 zlib + preset dictionary
+- 이득은 파일/백업 크기다. 캐시가 따뜻할 때 전체 스캔은 압축 해제 CPU 때문에 오히려 느리다
+  (합성 3,900편 zlib: 0.3s → 1.0s). 디스크/NAS 에서 읽는 시간이 지배적일 때만 스캔도 빨라진다.
+- 전사문 컬럼을 평문으로 읽고 String(raw) 로 되쓰는 JS/TS 스크립트(correct-transcripts.mjs,
+  migrate-to-convex.ts 등)는 BLOB 을 깨뜨린다. compress 는 이 컬럼을 읽는 스크립트 중
+  transcript_codec 을 거치지 않는 것이 저장소에 남아 있으면 목록을 보여주고 거부한다.
+  --allow-text-consumers 는 그 스크립트들이 건드리지 않는 사본(백업, 스냅샷 load 대상)용이다.
+
+Usage:
+  python3 scripts/transcript_codec.py stats --db data/sermons.db
+  python3 scripts/transcript_codec.py compress --db data/sermons.db [--codec zlib] [--vacuum]
+  python3 scripts/transcript_codec.py compress --db /backup/sermons.db --allow-text-consumers
+  python3 scripts/transcript_codec.py decompress --db data/sermons.db
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import struct
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Callable
+
+try:
+    import zstandard
+except ImportError:  # 선택 의존성
+    zstandard = None
+
+MAGIC = b"\x00SZ"
+HEADER = struct.Struct("<3scI")  # magic, codec(b"s" zstd / b"z" zlib), dict id
+MIN_COMPRESS_CHARS = 512
+ZLIB_DICT_SIZE = 32 * 1024  # zlib 창 크기보다 큰 사전은 의미 없음
+ZSTD_DICT_SIZE = 112 * 1024
+TRAIN_SAMPLES = 2000
+COLUMNS = ("transcript_raw", "transcript_corrected")
+REPO_ROOT = Path(__file__).resolve().parent.parent
+TEXT_CONSUMER_GLOBS = ("scripts/*.mjs", "scripts/*.ts", "scripts/*.js", "src/**/*.ts", "src/**/*.tsx", "convex/**/*.ts")
+CODEC_CACHE_SIZE = 16
+
+_cache: dict[tuple[bytes, bytes], tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {}
+
+
+# ─── 사전 / 코덱 ───
+
+def ensure_dict_table(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compression_dicts (
+          id INTEGER PRIMARY KEY,
+          codec TEXT NOT NULL,
+          dict BLOB NOT NULL,
+          active INTEGER NOT NULL DEFAULT 1,
+          created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """)
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone() is not None
+
+
+def _codec_fns(codec: bytes, zdict: bytes) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    key = (codec, hashlib.blake2b(zdict, digest_size=16).digest())
+    if key not in _cache:
+        if codec == b"s":
+            if zstandard is None:
+                raise RuntimeError("zstd 로 압축된 전사문입니다: pip install zstandard")
+            d = zstandard.ZstdCompressionDict(zdict)
+            cctx = zstandard.ZstdCompressor(level=19, dict_data=d)
+            dctx = zstandard.ZstdDecompressor(dict_data=d)
+            _cache[key] = (cctx.compress, dctx.decompress)
+        else:
+            def compress(data: bytes) -> bytes:
+                c = zlib.compressobj(9, zdict=zdict) if zdict else zlib.compressobj(9)
+                return c.compress(data) + c.flush()
+
+            def decompress(data: bytes) -> bytes:
+                d = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+                return d.decompress(data) + d.flush()
+
+            _cache[key] = (compress, decompress)
+    return _cache[key]
+
+
+class TranscriptCodec:
+    """Per-connection view of compression_dicts: encodes with the active dict, decodes any."""
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+        self.dicts: dict[int, tuple[bytes, bytes]] = {}
+        self.active: int | None = None
+        if _table_exists(conn, "compression_dicts"):
+            for did, codec, zdict, active in conn.execute("SELECT id, codec, dict, active FROM compression_dicts"):
+                self.dicts[did] = (b"s" if codec == "zstd" else b"z", zdict)
+                if active:
+                    self.active = did
+
+    @property
+    def enabled(self) -> bool:
+        return self.active is not None
+
+    def encode(self, text: str | None) -> str | bytes | None:
+        if not self.enabled or text is None or len(text) < MIN_COMPRESS_CHARS:
+            return text
+        codec, zdict = self.dicts[self.active]
+        compress, _ = _codec_fns(codec, zdict)
+        return HEADER.pack(MAGIC, codec, self.active) + compress(text.encode("utf-8"))
+
+    def decode(self, value: str | bytes | None) -> str | None:
+        if not isinstance(value, bytes):
+            return value
+        if value[:3] != MAGIC:
+            return value.decode("utf-8", errors="replace")
+        _, codec, did = HEADER.unpack_from(value)
+        if did not in self.dicts:
+            raise ValueError(f"compression dict {did} not found in compression_dicts")
+        _, decompress = _codec_fns(codec, self.dicts[did][1])
+        return decompress(value[HEADER.size:]).decode("utf-8")
+
+
+_conn_codecs: dict[int, tuple[sqlite3.Connection, tuple, TranscriptCodec]] = {}
+
+
+def _dict_stamp(conn: sqlite3.Connection) -> tuple:
+    try:
+        return conn.execute(
+            "SELECT count(*), coalesce(max(id), 0), coalesce(max(CASE WHEN active THEN id END), 0) FROM compression_dicts"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return ()  # 사전 테이블 없음 = 압축 꺼짐
+
+
+def codec_for(conn: sqlite3.Connection) -> TranscriptCodec:
+    """TranscriptCodec cached per connection; reloaded only when compression_dicts changes.
+
+    사전 BLOB 을 매번 읽지 않고 작은 집계 조회 하나로 다른 프로세스의 compress/decompress 를 알아챈다.
+    """
+    stamp = _dict_stamp(conn)
+    cached = _conn_codecs.get(id(conn))
+    if cached and cached[0] is conn and cached[1] == stamp:
+        return cached[2]
+    codec = TranscriptCodec(conn)
+    _conn_codecs.pop(id(conn), None)
+    while len(_conn_codecs) >= CODEC_CACHE_SIZE:
+        _conn_codecs.pop(next(iter(_conn_codecs)))
+    _conn_codecs[id(conn)] = (conn, stamp, codec)
+    return codec
+
+
+def read_transcript(conn: sqlite3.Connection, value: str | bytes | None) -> str | None:
+    """Decode one column value (plain text or compressed BLOB)."""
+    if not isinstance(value, bytes):
+        return value
+    return codec_for(conn).decode(value)
+
+
+def text_consumers(root: Path = REPO_ROOT) -> list[str]:
+    """Repo scripts that read the transcript columns as text without going through transcript_codec."""
+    column = re.compile(r"transcript_(raw|corrected)")
+    found = set()
+    for pattern in TEXT_CONSUMER_GLOBS:
+        for path in root.glob(pattern):
+            if "node_modules" in path.parts:
+                continue
+            source = path.read_text(encoding="utf-8", errors="replace")
+            if column.search(source) and "transcript_codec" not in source:
+                found.add(str(path.relative_to(root)))
+    return sorted(found)
+
+
+def train_dict(samples: list[str], codec: str) -> bytes:
+    data = [s.encode("utf-8") for s in samples if s]
+    if codec == "zstd":
+        return zstandard.train_dictionary(ZSTD_DICT_SIZE, data).as_bytes()
+    # zlib preset dictionary: 자주 나오는 어절 3-gram 을 모아 만든다.
+    # 뒤쪽(가까운 거리)에 있을수록 짧은 거리 코드로 참조되므로 빈도 높은 것을 끝에 둔다
+    counts: Counter[str] = Counter()
+    for s in samples:
+        words = s.split()
+        counts.update(" ".join(words[i:i + 3]) for i in range(0, len(words) - 2, 2))
+    picked: list[bytes] = []
+    size = 0
+    for phrase, n in counts.most_common():
+        if n < 3:
+            break
+        b = (phrase + " ").encode("utf-8")
+        if size + len(b) > ZLIB_DICT_SIZE:
+            break
+        picked.append(b)
+        size += len(b)
+    return b"".join(reversed(picked))
+
+
+# ─── 마이그레이션 ───
+
+def _sample_texts(conn: sqlite3.Connection, codec: TranscriptCodec, n: int) -> list[str]:
+    ids = [r[0] for r in conn.execute("SELECT id FROM sermons WHERE length(transcript_raw) >= ?", (MIN_COMPRESS_CHARS,))]
+    random.Random(0).shuffle(ids)
+    out = []
+    for sid in ids[:n]:
+        raw, = conn.execute("SELECT transcript_raw FROM sermons WHERE id=?", (sid,)).fetchone()
+        out.append(codec.decode(raw))
+    return out
+
+
+def stored_bytes(conn: sqlite3.Connection) -> int:
+    # length() 는 TEXT 면 글자 수라서 BLOB 으로 캐스팅해 실제 바이트를 센다
+    cols = " + ".join(f"coalesce(length(CAST({c} AS BLOB)), 0)" for c in COLUMNS)
+    return conn.execute(f"SELECT coalesce(sum({cols}), 0) FROM sermons").fetchone()[0]
+
+
+def scan_seconds(conn: sqlite3.Connection) -> float:
+    """Time a full get_bad_sermon_ids-style scan: read + decode every transcript_raw."""
+    codec = TranscriptCodec(conn)
+    t0 = time.perf_counter()
+    for (value,) in conn.execute("SELECT transcript_raw FROM sermons WHERE transcript_raw IS NOT NULL"):
+        codec.decode(value)
+    return time.perf_counter() - t0
+
+
+def rewrite(conn: sqlite3.Connection, transform: Callable[[str | bytes | None], str | bytes | None], batch: int = 200) -> int:
+    ids = [r[0] for r in conn.execute("SELECT id FROM sermons ORDER BY id")]
+    changed = 0
+    for i in range(0, len(ids), batch):
+        part = ids[i:i + batch]
+        rows = conn.execute(
+            f"SELECT id, {', '.join(COLUMNS)} FROM sermons WHERE id IN ({','.join('?' * len(part))})", part
+        ).fetchall()
+        updates = []
+        for sid, *values in rows:
+            new = [transform(v) for v in values]
+            if new != values:
+                updates.append((*new, sid))
+        conn.executemany(f"UPDATE sermons SET {', '.join(f'{c}=?' for c in COLUMNS)} WHERE id=?", updates)
+        conn.commit()
+        changed += len(updates)
+    return changed
+
+
+def compress_db(conn: sqlite3.Connection, codec_name: str, allow_text_consumers: bool = False) -> None:
+    consumers = text_consumers()
+    if consumers and not allow_text_consumers:
+        listing = "\n  ".join(consumers)
+        raise SystemExit(
+            "압축 BLOB 을 읽지 못하고 평문으로 되쓸 수 있는 스크립트가 있어 compress 를 거부합니다:\n  "
+            f"{listing}\n이 스크립트들이 쓰지 않는 사본이면 --allow-text-consumers"
+        )
+    ensure_dict_table(conn)
+    old = TranscriptCodec(conn)
+    print(f"[train] {codec_name} dictionary from up to {TRAIN_SAMPLES} transcripts...")
+    zdict = train_dict(_sample_texts(conn, old, TRAIN_SAMPLES), codec_name)
+    conn.execute("UPDATE compression_dicts SET active=0")
+    conn.execute("INSERT INTO compression_dicts (codec, dict) VALUES (?, ?)", (codec_name, zdict))
+    conn.commit()
+    new = TranscriptCodec(conn)
+    print(f"[train] dict id={new.active} size={len(zdict) / 1024:.1f}KB")
+    # 이전 사전으로 압축된 값도 풀어서 새 사전으로 다시 압축한다
+    changed = rewrite(conn, lambda v: new.encode(new.decode(v)) if v is not None else None)
+    print(f"[compress] {changed} sermons rewritten")
+
+
+def decompress_db(conn: sqlite3.Connection) -> None:
+    codec = TranscriptCodec(conn)
+    changed = rewrite(conn, codec.decode)
+    if _table_exists(conn, "compression_dicts"):
+        conn.execute("UPDATE compression_dicts SET active=0")  # 사전은 남겨 둔다 (백업 복원용)
+        conn.commit()
+    print(f"[decompress] {changed} sermons rewritten as plain text")
+
+
+def report(conn: sqlite3.Connection, label: str) -> tuple[int, float]:
+    size, secs = stored_bytes(conn), scan_seconds(conn)
+    print(f"[{label}] transcripts={size / 1e6:.1f}MB full scan={secs:.2f}s")
+    return size, secs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="sermons.db 전사문 압축 저장")
+    parser.add_argument("command", choices=["stats", "compress", "decompress"])
+    parser.add_argument("--db", default="data/sermons.db")
+    parser.add_argument("--codec", choices=["zstd", "zlib"], default="zstd" if zstandard else "zlib")
+    parser.add_argument("--vacuum", action="store_true", help="변환 후 VACUUM 으로 파일 크기까지 줄이기")
+    parser.add_argument("--allow-text-consumers", action="store_true",
+                        help="compress: 전사문을 평문으로 읽는 JS/TS 스크립트가 있어도 진행 (그들이 안 쓰는 사본 전용)")
+    args = parser.parse_args()
+    if args.codec == "zstd" and zstandard is None:
+        parser.error("zstd 는 zstandard 패키지가 필요합니다 (pip install zstandard) — 또는 --codec zlib")
+
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    try:
+        before = report(conn, "before")
+        if args.command == "stats":
+            codec = TranscriptCodec(conn)
+            print(f"[stats] compression {'on (dict ' + str(codec.active) + ')' if codec.enabled else 'off'}")
+            return
+        if args.command == "compress":
+            compress_db(conn, args.codec, args.allow_text_consumers)
+        else:
+            decompress_db(conn)
+        after = report(conn, "after")
+        print(f"[summary] size {before[0] / 1e6:.1f}MB → {after[0] / 1e6:.1f}MB "
+              f"({after[0] / max(before[0], 1) * 100:.0f}% of before), "
+              f"scan {before[1]:.2f}s → {after[1]:.2f}s")
+        if args.vacuum:
+            file_before = os.path.getsize(args.db)
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+            print(f"[vacuum] file {file_before / 1e6:.1f}MB → {os.path.getsize(args.db) / 1e6:.1f}MB")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+전사 품질 신호 (노이즈 점수 / 환각 / 발화 속도).
+
+retranscribe_bad.py 의 noise_score, nas_whisper_convex.py 의 is_hallucination 을
+한 곳으로 모았다. 모델 캐스케이드(asr_cascade.py)의 승격 판단에도 쓴다.
+"""
+
+from collections import Counter
+
+NOISE_THRESHOLD = 8.0
+# 한국어 설교 기준 글자/초 (공백 포함). 이 범위를 벗어나면 누락 또는 반복 루프를 의심
+MIN_CHARS_PER_SEC = 2.5
+MAX_CHARS_PER_SEC = 14.0
+MIN_TRANSCRIPT_CHARS = 1000
+
+
+def noise_score(text: str) -> float:
+    if not text:
+        return 999.0
+    count = sum(
+        len(text) - len(text.replace(f" {n} ", ""))
+        for n in ("0", "1", "2", "3")
+    )
+    return count / len(text) * 1000
+
+
+def needs_retranscription(text: str, threshold: float = NOISE_THRESHOLD) -> bool:
+    """retranscribe_bad 의 불량 기준: 숫자 노이즈가 많거나 설교치고 너무 짧다."""
+    return noise_score(text) > threshold or len(text) < MIN_TRANSCRIPT_CHARS
+
+
+def is_hallucination(text: str, threshold: float = 0.4) -> bool:
+    """Detect Whisper hallucination (repeated short phrases).
+
+    Splits text into 2-3 word chunks and checks if any single chunk
+    accounts for more than `threshold` of all chunks.
+    """
+    words = text.split()
+    if len(words) < 20:
+        return False
+    # Check bigrams
+    bigrams = [f"{words[i]} {words[i+1]}" for i in range(len(words) - 1)]
+    if not bigrams:
+        return False
+    counts = Counter(bigrams)
+    most_common_count = counts.most_common(1)[0][1]
+    return most_common_count / len(bigrams) > threshold
+
+
+def chars_per_second(text: str, duration: float) -> float:
+    return len(text) / duration if duration > 0 else 0.0
+
+
+def assess(text: str, duration: float, noise_threshold: float = NOISE_THRESHOLD) -> list[str]:
+    """Reasons this transcript looks bad (empty list = acceptable).
+
+    `duration` is the audio actually fed to ASR (speech-only length when VAD is on).
+    """
+    reasons: list[str] = []
+    if not text:
+        return ["empty"]
+    if is_hallucination(text):
+        reasons.append("hallucination")
+    score = noise_score(text)
+    if score > noise_threshold:
+        reasons.append(f"noise={score:.1f}")
+    if duration > 30:
+        cps = chars_per_second(text, duration)
+        if cps < MIN_CHARS_PER_SEC:
+            reasons.append(f"cps={cps:.1f}<{MIN_CHARS_PER_SEC}")
+        elif cps > MAX_CHARS_PER_SEC:
+            reasons.append(f"cps={cps:.1f}>{MAX_CHARS_PER_SEC}")
+    return reasons
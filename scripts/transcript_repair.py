@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+환각 구간만 골라서 재전사 (부분 수리).
+
+is_hallucination 이 설교 전체를 불량으로 판정해도 실제로 망가진 곳은
+보통 몇 분짜리 반복 루프나 숫자 노이즈 구간뿐이다.
+세그먼트 타임스탬프로 그 시간 구간만 찾아내서 다른 설정
+(-mc 0: 이전 문맥 끊기, beam search) 또는 다른 모델로 그 부분만 다시 전사하고
+원래 전사문에 끼워 넣는다. 비용은 설교 길이가 아니라 망가진 분량에 비례한다.
+
+Usage:
+  python3 scripts/transcript_repair.py --audio data/audio/abc.wav
+  python3 scripts/transcript_repair.py --audio abc.wav --repair-model models/ggml-medium.bin
+"""
+
+import argparse
+import tempfile
+from typing import Callable
+
+from parallel_asr import cut_wav
+from transcript_quality import NOISE_THRESHOLD, is_hallucination, noise_score
+from whisper_segments import Segment, join_segments, transcribe_segments
+
+WINDOW_SEC = 60.0
+PAD_SEC = 3.0
+# 반복 루프를 끊는 디코딩 설정: 이전 텍스트 문맥 미사용 + beam search
+REPAIR_ARGS = ["-mc", "0", "-bs", "5"]
+
+Ranges = list[tuple[float, float]]
+
+
+def _window_is_bad(segs: list[Segment], noise_threshold: float) -> bool:
+    text = join_segments(segs)
+    if is_hallucination(text, threshold=0.3):
+        return True
+    if len(text) > 100 and noise_score(text) > noise_threshold:
+        return True
+    # 같은 세그먼트 문장이 3번 이상 연달아 나오면 전형적인 whisper 루프
+    run = 1
+    for prev, cur in zip(segs, segs[1:]):
+        run = run + 1 if cur.text == prev.text else 1
+        if run >= 3:
+            return True
+    return False
+
+
+def find_damaged_ranges(
+    segments: list[Segment],
+    window_sec: float = WINDOW_SEC,
+    noise_threshold: float = NOISE_THRESHOLD,
+) -> Ranges:
+    """Time ranges whose segments show repetition loops or digit-noise bursts."""
+    if not segments:
+        return []
+    ranges: Ranges = []
+    i = 0
+    while i < len(segments):
+        start = segments[i].start
+        j = i
+        while j < len(segments) and segments[j].end - start <= window_sec:
+            j += 1
+        j = max(j, i + 1)
+        window = segments[i:j]
+        if _window_is_bad(window, noise_threshold):
+            lo, hi = max(0.0, window[0].start - PAD_SEC), window[-1].end + PAD_SEC
+            if ranges and lo <= ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], hi))
+            else:
+                ranges.append((lo, hi))
+        i = j
+    return _snap_to_segments(segments, ranges)
+
+
+def _snap_to_segments(segments: list[Segment], ranges: Ranges) -> Ranges:
+    """Widen each range to whole segments so splice never drops speech that was not re-decoded."""
+    snapped: Ranges = []
+    for lo, hi in ranges:
+        while True:
+            touched = [s for s in segments if s.end > lo and s.start < hi]
+            new_lo = min([lo] + [s.start for s in touched])
+            new_hi = max([hi] + [s.end for s in touched])
+            if (new_lo, new_hi) == (lo, hi):
+                break
+            lo, hi = new_lo, new_hi
+        if snapped and lo <= snapped[-1][1]:
+            snapped[-1] = (snapped[-1][0], max(snapped[-1][1], hi))
+        else:
+            snapped.append((lo, hi))
+    return snapped
+
+
+def splice(segments: list[Segment], ranges: Ranges, fixed: list[str]) -> str:
+    """Replace every segment overlapping a damaged range with that range's new text.
+
+    Ranges come from find_damaged_ranges, so every overlapping segment lies fully inside its range.
+    """
+    out: list[str] = []
+    r = 0
+    emitted = [False] * len(ranges)
+    for seg in segments:
+        while r < len(ranges) and seg.start >= ranges[r][1]:
+            r += 1
+        if r < len(ranges) and seg.end > ranges[r][0] and seg.start < ranges[r][1]:
+            if not emitted[r]:
+                out.append(fixed[r])
+                emitted[r] = True
+            continue
+        out.append(seg.text)
+    return " ".join(t for t in out if t).strip()
+
+
+def repair_transcript(
+    wav_path: str,
+    segments: list[Segment],
+    redo_fn: Callable[[str], str],
+    log: Callable[[str], None] = print,
+) -> tuple[str, Ranges]:
+    """Re-transcribe only the damaged ranges of `wav_path` and splice the result in."""
+    ranges = find_damaged_ranges(segments)
+    if not ranges:
+        return join_segments(segments), []
+    damaged = sum(e - s for s, e in ranges)
+    total = segments[-1].end or 1.0
+    log(f"  [repair] {len(ranges)} ranges, {damaged / 60:.1f}min of {total / 60:.1f}min ({damaged / total * 100:.1f}%)")
+    with tempfile.TemporaryDirectory() as td:
+        pieces = cut_wav(wav_path, ranges, td)
+        fixed = []
+        for (start, end), piece in zip(ranges, pieces):
+            text = redo_fn(piece)
+            log(f"  [repair] {start:7.1f}s → {end:7.1f}s chars={len(text)}")
+            fixed.append(text)
+    return splice(segments, ranges, fixed), ranges
+
+
+def whisper_redo(model_path: str, vad_model: str = "", no_gpu: bool = False) -> Callable[[str], str]:
+    def redo(wav: str) -> str:
+        return join_segments(
+            transcribe_segments(wav, model_path, vad_model=vad_model, no_gpu=no_gpu, extra=REPAIR_ARGS)
+        )
+
+    return redo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="환각 구간만 재전사")
+    parser.add_argument("--audio", required=True, help="16kHz mono wav")
+    parser.add_argument("--model", default="models/ggml-large-v3.bin")
+    parser.add_argument("--repair-model", default="", help="수리 구간용 모델 (기본: --model + 루프 방지 설정)")
+    parser.add_argument("--vad-model", default="")
+    parser.add_argument("--no-gpu", action="store_true")
+    args = parser.parse_args()
+
+    segments = transcribe_segments(args.audio, args.model, vad_model=args.vad_model, no_gpu=args.no_gpu)
+    text, ranges = repair_transcript(
+        args.audio, segments, whisper_redo(args.repair_model or args.model, args.vad_model, args.no_gpu)
+    )
+    print(f"[repair] ranges={len(ranges)} chars={len(text)} hallucination={is_hallucination(text)}")
+    print(text[:500])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+음성 구간(VAD) 맵 계산 + 캐시.
+
+오디오 파일마다 한 번만 음성 구간을 계산해서 data/vad_cache.db 에 저장한다.
+(키 = audio_manifest.quick_fingerprint, 구간은 ms 단위 uint32 배열로 압축 저장)
+whisper 계열은 음성 구간만 이어붙인 wav 를 받고, Qwen 은 쉼(pause) 위치에 맞춘
+세그먼트 경계를 받는다. 설교 앞뒤의 찬양/묵도 같은 무음·음악 구간을 건너뛴다.
+
+검출기: silero-vad 패키지가 있으면 Silero, 없으면 ffmpeg silencedetect.
+
+Usage:
+  python3 scripts/vad_regions.py data/audio/abc.webm
+  python3 scripts/vad_regions.py data/audio/*.webm --segment-sec 120
+"""
+
+import argparse
+import re
+import sqlite3
+import subprocess
+import time
+import wave
+from array import array
+from pathlib import Path
+
+from audio_manifest import quick_fingerprint
+
+DEFAULT_CACHE = "data/vad_cache.db"
+MIN_SPEECH_SEC = 0.25
+MERGE_GAP_SEC = 0.5
+PAD_SEC = 0.2
+
+Regions = list[tuple[float, float]]
+
+
+# ─── 검출 ─────────────────────────────────────────────────────────
+def audio_duration_seconds(audio_path: str) -> float:
+    out = subprocess.check_output(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", audio_path],
+        text=True,
+    ).strip()
+    return float(out)
+
+
+def detect_silencedetect(audio_path: str, noise_db: int = -35, min_silence: float = 0.6) -> tuple[float, Regions]:
+    """Speech = complement of ffmpeg silencedetect output."""
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", audio_path,
+         "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}", "-f", "null", "-"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip()[-300:] or "ffmpeg silencedetect failed")
+    duration = audio_duration_seconds(audio_path)
+
+    regions: Regions = []
+    cursor = 0.0
+    for m in re.finditer(r"silence_(start|end): (-?[\d.]+)", result.stderr):
+        t = max(0.0, float(m.group(2)))
+        if m.group(1) == "start":
+            if t > cursor:
+                regions.append((cursor, t))
+        else:
+            cursor = t
+    # 마지막 silence_start 뒤에 silence_end 가 없으면 파일 끝까지 무음
+    last_start = result.stderr.rfind("silence_start")
+    if last_start == -1 or result.stderr.rfind("silence_end") > last_start:
+        if duration > cursor:
+            regions.append((cursor, duration))
+    return duration, regions
+
+
+def detect_silero(audio_path: str) -> tuple[float, Regions]:
+    from silero_vad import get_speech_timestamps, load_silero_vad, read_audio
+
+    wav = read_audio(audio_path, sampling_rate=16000)
+    stamps = get_speech_timestamps(wav, load_silero_vad(), sampling_rate=16000, return_seconds=True)
+    return len(wav) / 16000, [(float(s["start"]), float(s["end"])) for s in stamps]
+
+
+def detect_speech(audio_path: str) -> tuple[str, float, Regions]:
+    try:
+        import silero_vad  # noqa: F401
+    except ImportError:
+        return ("silencedetect", *detect_silencedetect(audio_path))
+    return ("silero", *detect_silero(audio_path))
+
+
+def normalize_regions(regions: Regions, duration: float) -> Regions:
+    """Pad, merge short gaps and drop blips so cuts land inside pauses."""
+    out: Regions = []
+    for start, end in sorted(regions):
+        if end - start < MIN_SPEECH_SEC:
+            continue
+        start, end = max(0.0, start - PAD_SEC), min(duration, end + PAD_SEC)
+        if out and start - out[-1][1] <= MERGE_GAP_SEC:
+            out[-1] = (out[-1][0], max(out[-1][1], end))
+        else:
+            out.append((start, end))
+    return out
+
+
+# ─── 캐시 ─────────────────────────────────────────────────────────
+def open_cache(path: str = DEFAULT_CACHE) -> sqlite3.Connection:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS speech_regions (
+          fingerprint TEXT PRIMARY KEY,
+          method TEXT NOT NULL,
+          duration REAL NOT NULL,
+          regions BLOB NOT NULL,
+          created_at REAL NOT NULL
+        )
+        """
+    )
+    return conn
+
+
+def _pack(regions: Regions) -> bytes:
+    return array("I", (round(t * 1000) for r in regions for t in r)).tobytes()
+
+
+def _unpack(blob: bytes) -> Regions:
+    ms = array("I")
+    ms.frombytes(blob)
+    return [(ms[i] / 1000, ms[i + 1] / 1000) for i in range(0, len(ms), 2)]
+
+
+def speech_regions(
+    audio_path: str,
+    cache: sqlite3.Connection | None = None,
+    detect_on: str | None = None,
+) -> tuple[float, Regions]:
+    """Cached speech regions for `audio_path`.
+
+    `detect_on` lets callers run detection on an already-decoded 16kHz wav
+    while keying the cache on the original (NAS/YouTube) file.
+    """
+    size = Path(audio_path).stat().st_size
+    key = quick_fingerprint(audio_path, size)
+    if cache is not None:
+        row = cache.execute(
+            "SELECT duration, regions FROM speech_regions WHERE fingerprint=?", (key,)
+        ).fetchone()
+        if row:
+            return row[0], _unpack(row[1])
+
+    method, duration, raw = detect_speech(detect_on or audio_path)
+    regions = normalize_regions(raw, duration)
+    if cache is not None:
+        cache.execute(
+            "INSERT OR REPLACE INTO speech_regions (fingerprint, method, duration, regions, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, method, duration, _pack(regions), time.time()),
+        )
+        cache.commit()
+    return duration, regions
+
+
+def speech_seconds(regions: Regions) -> float:
+    return sum(end - start for start, end in regions)
+
+
+def format_report(duration: float, regions: Regions) -> str:
+    speech = speech_seconds(regions)
+    skipped = max(0.0, duration - speech)
+    pct = skipped / duration * 100 if duration else 0.0
+    return f"speech={speech:.0f}s/{duration:.0f}s skipped={skipped:.0f}s ({pct:.1f}%) regions={len(regions)}"
+
+
+# ─── 백엔드용 변환 ─────────────────────────────────────────────────
+def plan_segments(regions: Regions, max_sec: float, max_gap: float = 2.0) -> Regions:
+    """Pack speech regions into ASR windows of at most `max_sec`, cutting in pauses.
+
+    Regions separated by more than `max_gap` of silence never share a window,
+    and a single region longer than `max_sec` (continuous preaching) is split evenly.
+    """
+    segments: Regions = []
+    for start, end in regions:
+        if end - start > max_sec:
+            n = int((end - start) // max_sec) + 1
+            step = (end - start) / n
+            pieces = [(start + i * step, start + (i + 1) * step) for i in range(n)]
+        else:
+            pieces = [(start, end)]
+        for ps, pe in pieces:
+            if segments and ps - segments[-1][1] <= max_gap and pe - segments[-1][0] <= max_sec:
+                segments[-1] = (segments[-1][0], pe)
+            else:
+                segments.append((ps, pe))
+    return segments
+
+
+def write_speech_wav(wav_in: str, regions: Regions, wav_out: str) -> list[tuple[float, float]]:
+    """Copy only the speech regions of a PCM wav into `wav_out`.
+
+    Returns the time map [(compact_start, source_start), ...] so timestamps
+    from the compacted audio can be mapped back with `to_source_time`.
+    """
+    time_map: list[tuple[float, float]] = []
+    with wave.open(wav_in, "rb") as src, wave.open(wav_out, "wb") as dst:
+        dst.setparams(src.getparams())
+        rate = src.getframerate()
+        total = src.getnframes()
+        written = 0
+        for start, end in regions:
+            first = min(total, int(start * rate))
+            last = min(total, int(end * rate))
+            if last <= first:
+                continue
+            time_map.append((written / rate, first / rate))
+            src.setpos(first)
+            remaining = last - first
+            while remaining > 0:
+                n = min(remaining, rate * 30)
+                dst.writeframes(src.readframes(n))
+                remaining -= n
+            written += last - first
+    return time_map
+
+
+def to_source_time(time_map: list[tuple[float, float]], t: float) -> float:
+    src_t = t
+    for compact_start, source_start in time_map:
+        if compact_start > t:
+            break
+        src_t = source_start + (t - compact_start)
+    return src_t
+
+
+def prepare_speech_wav(
+    audio_path: Path,
+    wav_path: Path,
+    cache: sqlite3.Connection | None,
+) -> tuple[Path, list[tuple[float, float]], str]:
+    """Decoded wav → speech-only wav next to it. Returns (wav, time_map, report)."""
+    duration, regions = speech_regions(str(audio_path), cache, detect_on=str(wav_path))
+    if not regions:
+        return wav_path, [(0.0, 0.0)], format_report(duration, [(0.0, duration)])
+    out = wav_path.with_name(wav_path.stem + "-speech.wav")
+    time_map = write_speech_wav(str(wav_path), regions, str(out))
+    return out, time_map, format_report(duration, regions)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="음성 구간 계산 / 캐시")
+    parser.add_argument("audio", nargs="+")
+    parser.add_argument("--cache", default=DEFAULT_CACHE)
+    parser.add_argument("--segment-sec", type=float, default=0, help="Qwen 세그먼트 계획 출력")
+    args = parser.parse_args()
+
+    cache = open_cache(args.cache)
+    total_dur = total_speech = 0.0
+    try:
+        for path in args.audio:
+            duration, regions = speech_regions(path, cache)
+            total_dur += duration
+            total_speech += speech_seconds(regions)
+            print(f"[vad] {Path(path).name} {format_report(duration, regions)}")
+            if args.segment_sec:
+                for start, end in plan_segments(regions, args.segment_sec):
+                    print(f"  {start:8.2f} → {end:8.2f} ({end - start:.1f}s)")
+    finally:
+        cache.close()
+    if len(args.audio) > 1 and total_dur:
+        print(f"[summary] skipped {(total_dur - total_speech) / total_dur * 100:.1f}% of {total_dur / 3600:.1f}h")
+
+
+if __name__ == "__main__":
+    main()
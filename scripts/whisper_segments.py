@@ -0,0 +1,96 @@
+"""
+whisper-cli 출력 파싱: 타임스탬프 줄 → 세그먼트 목록, stdout → 평문 전사문.
+
+--no-timestamps 대신 `[00:01:02.340 --> 00:01:05.120]  텍스트` 줄을 그대로 받아
+(start, end, text) 로 파싱한다. stdout 을 줄 단위로 스트리밍하므로
+긴 설교도 세그먼트가 나오는 즉시 처리할 수 있다.
+"""
+
+import re
+import subprocess
+import tempfile
+from typing import Iterator, NamedTuple
+
+SEGMENT_RE = re.compile(
+    r"^\[(\d+):(\d+):(\d+(?:\.\d+)?)\s*-->\s*(\d+):(\d+):(\d+(?:\.\d+)?)\]\s*(.*)$"
+)
+
+
+class Segment(NamedTuple):
+    start: float
+    end: float
+    text: str
+
+
+def _seconds(h: str, m: str, s: str) -> float:
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+def parse_segment_line(line: str) -> Segment | None:
+    m = SEGMENT_RE.match(line.strip())
+    if not m:
+        return None
+    return Segment(_seconds(*m.group(1, 2, 3)), _seconds(*m.group(4, 5, 6)), m.group(7).strip())
+
+
+def whisper_segments_cmd(
+    wav_path: str,
+    model_path: str,
+    vad_model: str = "",
+    no_gpu: bool = False,
+    threads: int = 0,
+    offset_ms: int = 0,
+    extra: list[str] | None = None,
+) -> list[str]:
+    cmd = ["whisper-cli", "-m", model_path, "-l", "ko", "-f", str(wav_path)]
+    if threads > 0:
+        cmd.extend(["-t", str(threads)])
+    if offset_ms > 0:
+        cmd.extend(["-ot", str(offset_ms)])
+    if vad_model:
+        cmd.extend(["--vad", "-vm", vad_model])
+    if no_gpu:
+        cmd.append("--no-gpu")
+    if extra:
+        cmd.extend(extra)
+    return cmd
+
+
+def iter_segments(cmd: list[str]) -> Iterator[Segment]:
+    """Run whisper-cli and yield segments as they are printed."""
+    # stderr 는 임시 파일로 — 파이프로 받으면 로그가 많을 때 stdout 읽기와 교착될 수 있다
+    with tempfile.TemporaryFile(mode="w+", encoding="utf-8", errors="replace") as err:
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=err, text=True, encoding="utf-8", errors="replace"
+        )
+        try:
+            for line in proc.stdout:
+                seg = parse_segment_line(line)
+                if seg and seg.text:
+                    yield seg
+            if proc.wait() != 0:
+                err.seek(0)
+                raise RuntimeError(err.read().strip()[-300:] or "whisper-cli failed")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+
+def transcribe_segments(wav_path: str, model_path: str, **kwargs) -> list[Segment]:
+    return list(iter_segments(whisper_segments_cmd(wav_path, model_path, **kwargs)))
+
+
+def join_segments(segments: list[Segment]) -> str:
+    return " ".join(s.text for s in segments if s.text).strip()
+
+
+def parse_whisper_output(stdout: str) -> str:
+    """Plain transcript from whisper-cli stdout, with or without `[.. --> ..]` timestamp prefixes."""
+    lines: list[str] = []
+    for line in stdout.splitlines():
+        seg = parse_segment_line(line)
+        text = seg.text if seg else line.strip()
+        if text:
+            lines.append(text)
+    return " ".join(lines).strip()
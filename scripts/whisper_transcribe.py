@@ -3,12 +3,22 @@
 
 import argparse
 import os
-import re
 import sqlite3
 import subprocess
 import tempfile
+import time
 from pathlib import Path
 
+from asr_checkpoint import DEFAULT_CHECKPOINT_DIR, Checkpoint, checkpoint_key, transcribe_whisper_resumable
+from audio_fingerprint import DEFAULT_INDEX, open_index, reuse_transcript
+from audio_manifest import DEFAULT_MANIFEST, find_by_stem, open_refreshed, probe_stem
+from parallel_asr import wav_duration
+from run_history import DEFAULT_THREADS, RunRecorder
+from sermon_db import drop_chunk_triggers, rebuild_fts_and_triggers, update_db
+from vad_regions import DEFAULT_CACHE, open_cache, prepare_speech_wav
+from whisper_segments import parse_whisper_output
+from work_coordinator import WorkClient, run_worker
+
 
 def convert_to_wav(src: str, out_wav: str) -> None:
     subprocess.run(
@@ -17,120 +27,139 @@ def convert_to_wav(src: str, out_wav: str) -> None:
     )
 
 
-def transcribe_whisper(wav_path: str, model_path: str) -> str:
+def silero_model_for(model_path: str) -> str:
     vad_model = os.path.join(os.path.dirname(model_path), "ggml-silero-v6.2.0.bin")
+    return vad_model if os.path.exists(vad_model) else ""
+
+
+def transcribe_whisper(wav_path: str, model_path: str, threads: int = DEFAULT_THREADS) -> str:
+    vad_model = silero_model_for(model_path)
     cmd = [
         "whisper-cli",
         "-m", model_path,
         "-l", "ko",
         "--no-timestamps",
+        "-t", str(threads),
         "-f", wav_path,
     ]
-    if os.path.exists(vad_model):
+    if vad_model:
         cmd.extend(["--vad", "-vm", vad_model])
     result = subprocess.run(cmd, capture_output=True)
-    stdout = result.stdout.decode("utf-8", errors="replace")
-    lines = []
-    for line in stdout.splitlines():
-        line = line.strip()
-        # 타임스탬프 줄 제거 ([00:00:00.000 --> 00:00:00.000] 형식)
-        if re.match(r"^\[[\d:\.]+\s*-->\s*[\d:\.]+\]", line):
-            continue
-        if line:
-            lines.append(line)
-    return " ".join(lines).strip()
-
-
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 150):
-    cleaned = " ".join(text.split()).strip()
-    if len(cleaned) <= chunk_size:
-        return [(0, cleaned)]
-    chunks = []
-    start = 0
-    idx = 0
-    while start < len(cleaned):
-        end = start + chunk_size
-        if end < len(cleaned):
-            seg = cleaned[start:end]
-            last = max(
-                seg.rfind(". "), seg.rfind("다. "),
-                seg.rfind("요. "), seg.rfind("! "), seg.rfind("? "),
-            )
-            if last > chunk_size * 0.5:
-                end = start + last + 2
+    return parse_whisper_output(result.stdout.decode("utf-8", errors="replace"))
+
+
+def find_audio(manifest, audio_dir: Path, youtube_id: str) -> Path | None:
+    # webm 또는 다른 포맷 탐색
+    if manifest:
+        return find_by_stem(manifest, audio_dir, youtube_id)
+    return probe_stem(audio_dir, youtube_id)
+
+
+def transcribe_file(
+    audio_path: Path, args: argparse.Namespace, vad_cache, timing: dict | None = None
+) -> tuple[str, Checkpoint | None]:
+    """`timing` (if given) receives audio_sec (speech wav length) and asr_sec for the run history."""
+    """ffmpeg → (VAD) → whisper-cli. Raises RuntimeError when whisper-cli fails mid-way."""
+    with tempfile.TemporaryDirectory() as td:
+        wav_path = os.path.join(td, "audio.wav")
+        print(f"  → WAV 변환 중...")
+        convert_to_wav(str(audio_path), wav_path)
+        if vad_cache:
+            speech_wav, _, report = prepare_speech_wav(audio_path, Path(wav_path), vad_cache)
+            wav_path = str(speech_wav)
+            print(f"  → VAD {report}")
+        print(f"  → whisper-cli 전사 중 (Metal 가속)...")
+        if timing is not None:
+            timing["audio_sec"] = wav_duration(wav_path)
+        t_asr = time.time()
+        if args.no_checkpoint:
+            transcript, checkpoint = transcribe_whisper(wav_path, args.model, args.threads), None
         else:
-            end = len(cleaned)
-        chunks.append((idx, cleaned[start:end].strip()))
-        if end >= len(cleaned):
-            break
-        start = end - overlap
-        idx += 1
-    return chunks
-
-
-def drop_chunk_triggers(conn: sqlite3.Connection) -> None:
-    conn.executescript("""
-        DROP TRIGGER IF EXISTS chunks_ai;
-        DROP TRIGGER IF EXISTS chunks_ad;
-        DROP TRIGGER IF EXISTS chunks_au;
-    """)
-
-
-def rebuild_fts_and_triggers(conn: sqlite3.Connection) -> None:
-    conn.executescript("""
-        DROP TABLE IF EXISTS chunks_fts;
-        CREATE VIRTUAL TABLE chunks_fts USING fts5(
-          content, content_rowid='id', tokenize='unicode61'
-        );
-        INSERT INTO chunks_fts(rowid, content) SELECT id, content FROM chunks;
-
-        CREATE TRIGGER chunks_ai AFTER INSERT ON chunks BEGIN
-          INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
-        END;
-        CREATE TRIGGER chunks_ad AFTER DELETE ON chunks BEGIN
-          INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
-        END;
-        CREATE TRIGGER chunks_au AFTER UPDATE OF content ON chunks BEGIN
-          INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
-          INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
-        END;
-    """)
-
-
-def update_db(conn: sqlite3.Connection, sermon_id: int, transcript: str, max_retries: int = 5) -> None:
-    for attempt in range(max_retries):
-        try:
-            cur = conn.cursor()
-            cur.execute("UPDATE sermons SET transcript_raw=? WHERE id=?", (transcript, sermon_id))
-            cur.execute("DELETE FROM chunks WHERE sermon_id=?", (sermon_id,))
-            for idx, content in chunk_text(transcript):
-                cur.execute(
-                    "INSERT INTO chunks (sermon_id, chunk_index, content) VALUES (?, ?, ?)",
-                    (sermon_id, idx, content),
+            key = checkpoint_key(audio_path, args.model, not args.no_speech_only)
+            checkpoint = Checkpoint(args.checkpoint_dir, key)
+            try:
+                transcript = transcribe_whisper_resumable(
+                    Path(wav_path), args.model, checkpoint, silero_model_for(args.model), threads=args.threads
                 )
-            conn.commit()
-            return
-        except sqlite3.OperationalError as e:
-            if attempt < max_retries - 1:
-                import time
-                time.sleep(1 + attempt)
-                continue
-            raise
+            except RuntimeError as e:
+                raise RuntimeError(f"{e} (체크포인트 {checkpoint.offset:.0f}s 까지 보존)") from None
+        if timing is not None:
+            timing["asr_sec"] = time.time() - t_asr
+        return transcript, checkpoint
+
+
+def run_as_worker(args: argparse.Namespace) -> None:
+    """Coordinator worker: transcribe here, let the coordinator write sermons.db."""
+    audio_dir = Path(args.audio_dir)
+    manifest = None if args.no_manifest else open_refreshed(args.manifest, audio_dir)
+    vad_cache = None if args.no_speech_only else open_cache(args.vad_cache)
+    checkpoints: dict[int, Checkpoint] = {}
+    recorder = RunRecorder("whisper_transcribe", args.model, threads=args.threads)
+
+    def process(item: dict) -> str | None:
+        sermon_id = item["sermon_id"]
+        audio_path = find_audio(manifest, audio_dir, item["youtube_id"])
+        if not audio_path:
+            print(f"[skip] sermon {sermon_id}: 오디오 파일 없음 ({audio_dir}/{item['youtube_id']}.*)")
+            return None
+        print(f"[start] sermon {sermon_id} | {item['title'][:40]}")
+        t0, timing = time.time(), {}
+        transcript, checkpoint = transcribe_file(audio_path, args, vad_cache, timing)
+        recorder.item(sermon_id, timing.get("audio_sec", 0.0), timing.get("asr_sec", 0.0), time.time() - t0,
+                      ok=bool(transcript))
+        if checkpoint:
+            checkpoints[sermon_id] = checkpoint
+        return transcript
+
+    def submitted(item: dict) -> None:
+        # submit 이 실패하면 체크포인트가 남아 있어야 다음 claim 에서 처음부터 다시 전사하지 않는다
+        checkpoint = checkpoints.pop(item["sermon_id"], None)
+        if checkpoint:
+            checkpoint.finish()
+
+    try:
+        run_worker(WorkClient(args.coordinator, args.worker_name), process, on_submitted=submitted)
+    finally:
+        recorder.finish()
+        if manifest:
+            manifest.close()
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--model", default="models/ggml-large-v3.bin")
-    parser.add_argument("--ids", required=True, help="쉼표로 구분된 sermon ID (예: 1128,1129)")
+    parser.add_argument("--ids", help="쉼표로 구분된 sermon ID (예: 1128,1129)")
     parser.add_argument("--audio-dir", default="data/audio")
     parser.add_argument("--db", default="data/sermons.db")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="오디오 매니페스트 DB 경로")
+    parser.add_argument("--no-manifest", action="store_true", help="매니페스트 없이 확장자별 exists() 확인")
+    parser.add_argument("--vad-cache", default=DEFAULT_CACHE, help="음성 구간 캐시 DB 경로")
+    parser.add_argument("--no-speech-only", action="store_true", help="음성 구간만 잘라내지 않고 전체 wav 전사")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="whisper-cli 스레드 수 (-t)")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CHECKPOINT_DIR,
+                        help="세그먼트 단위 체크포인트 저장 위치 (중단된 설교는 이어서 전사)")
+    parser.add_argument("--no-checkpoint", action="store_true", help="체크포인트 비활성화")
     parser.add_argument("--no-fts", action="store_true", help="FTS 트리거 관리 스킵 (병렬 실행용)")
+    parser.add_argument("--coordinator", help="워커 모드: work_coordinator.py 주소 (예: http://nas-host:8765)")
+    parser.add_argument("--worker-name", default="", help="워커 모드: 코디네이터에 표시될 이름 (기본: 호스트명-스레드)")
+    parser.add_argument("--dedup", action="store_true", help="오디오 지문으로 이미 전사된 중복 설교면 그 전사문 재사용")
+    parser.add_argument("--dedup-index", default=DEFAULT_INDEX, help="오디오 지문 인덱스 DB 경로")
     args = parser.parse_args()
+    if args.coordinator:
+        run_as_worker(args)
+        return
+    if not args.ids:
+        parser.error("--ids 또는 --coordinator 가 필요합니다")
 
     conn = sqlite3.connect(args.db)
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA busy_timeout=30000")
     cur = conn.cursor()
+    audio_dir = Path(args.audio_dir)
+    manifest = None if args.no_manifest else open_refreshed(args.manifest, audio_dir)
+    vad_cache = None if args.no_speech_only else open_cache(args.vad_cache)
+    fp_index = open_index(args.dedup_index) if args.dedup else None
+    recorder = RunRecorder("whisper_transcribe", args.model, threads=args.threads)
     # Always drop triggers to prevent FTS sync errors
     drop_chunk_triggers(conn)
 
@@ -143,35 +172,42 @@ def main():
                 continue
             youtube_id, title = row
 
-            # webm 또는 다른 포맷 탐색
-            audio_dir = Path(args.audio_dir)
-            audio_path = next(
-                (p for ext in ("webm", "mp4", "m4a", "mp3", "wav")
-                 if (p := audio_dir / f"{youtube_id}.{ext}").exists()),
-                None
-            )
+            audio_path = find_audio(manifest, audio_dir, youtube_id)
             if not audio_path:
                 print(f"[skip] sermon {sermon_id}: 오디오 파일 없음 ({audio_dir}/{youtube_id}.*)")
                 continue
 
             print(f"[start] sermon {sermon_id} | {title[:40]}")
-
-            with tempfile.TemporaryDirectory() as td:
-                wav_path = os.path.join(td, "audio.wav")
-                print(f"  → WAV 변환 중...")
-                convert_to_wav(str(audio_path), wav_path)
-                print(f"  → whisper-cli 전사 중 (Metal 가속)...")
-                transcript = transcribe_whisper(wav_path, args.model)
+            try:
+                dup = reuse_transcript(fp_index, conn, sermon_id, audio_path) if fp_index else None
+                if dup:
+                    update_db(conn, sermon_id, dup[1])
+                    print(f"[reuse] sermon {sermon_id} <- {dup[0]} chars={len(dup[1])}")
+                    continue
+                t0, timing = time.time(), {}
+                transcript, checkpoint = transcribe_file(audio_path, args, vad_cache, timing)
+                recorder.item(sermon_id, timing.get("audio_sec", 0.0), timing.get("asr_sec", 0.0),
+                              time.time() - t0, ok=bool(transcript))
+            except RuntimeError as e:
+                print(f"[fail] sermon {sermon_id} {e}")
+                continue
 
             if transcript:
                 update_db(conn, sermon_id, transcript)
+                if checkpoint:
+                    checkpoint.finish()
                 print(f"[done] sermon {sermon_id} chars={len(transcript)}")
             else:
                 print(f"[warn] sermon {sermon_id} 전사 결과 없음")
     finally:
+        recorder.finish()
         if not args.no_fts:
             rebuild_fts_and_triggers(conn)
         conn.close()
+        if manifest:
+            manifest.close()
+        if fp_index:
+            fp_index.close()
 
 
 if __name__ == "__main__":
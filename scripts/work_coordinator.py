@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+여러 머신에서 sermons.db 전사 작업을 나눠 처리하기 위한 코디네이터 / 워커 프로토콜.
+
+코디네이터 한 개가 sermons.db 를 열고 작업 목록을 HTTP(JSON)로 나눠준다.
+워커(whisper_transcribe.py --coordinator URL)는 작업을 claim → 전사하는 동안
+heartbeat → 결과를 submit 한다. DB 쓰기는 코디네이터만 하므로
+NAS 위의 sermons.db 를 여러 머신이 동시에 여는 일이 없다.
+
+- heartbeat 가 --lease-sec 동안 끊긴 작업은 다른 워커에게 다시 배정
+- 실패(fail) 또는 lease 만료가 --max-attempts 번 쌓이면 포기
+- 그 머신에 오디오가 없으면 release 로 돌려준다 (시도 횟수에 안 들어감, 그 워커에게는 다시 안 줌).
+  아무도 lease 를 잡고 있지 않은 채로 재시도 간격 2번이 지나도 아무도 가져가지 않으면 포기
+- 재배정 후 늦게 도착한 결과도 아직 저장 전이면 받아들인다 (먼저 온 결과 우선)
+
+Endpoints (모두 JSON):
+  POST /claim      {worker}                          → {item, lease, heartbeat_sec} | {item: null, done | retry_after}
+  POST /heartbeat  {worker, sermon_id, lease}        → {ok} | 409 lease lost
+  POST /submit     {worker, sermon_id, lease, transcript}
+  POST /fail       {worker, sermon_id, lease, error}
+  POST /release    {worker, sermon_id, lease}        (이 워커는 처리 불가 — 다른 워커에게)
+  GET  /status
+
+Usage:
+  python3 scripts/work_coordinator.py --ids 1128,1129,1130 --port 8765
+  python3 scripts/work_coordinator.py --ids-file ids.txt --host 0.0.0.0
+  python3 scripts/whisper_transcribe.py --coordinator http://nas-host:8765   # 각 머신에서
+"""
+
+import argparse
+import json
+import socket
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator
+
+DEFAULT_PORT = 8765
+LEASE_SEC = 120.0
+MAX_ATTEMPTS = 3
+UNREACHABLE_RETRIES = 60  # 5초 간격 → 코디네이터가 5분간 응답 없으면 워커 종료
+
+
+# ─── 작업 큐 ───
+
+class WorkQueue:
+    """Lease-based queue; every method is called with the server lock held."""
+
+    def __init__(self, items: list[dict], lease_sec: float = LEASE_SEC, max_attempts: int = MAX_ATTEMPTS) -> None:
+        self.items = {item["sermon_id"]: item for item in items}
+        self.pending: deque[int] = deque(self.items)
+        self.leases: dict[int, dict] = {}  # sermon_id → {worker, lease, beat}
+        self.attempts = {sid: 0 for sid in self.items}
+        self.done: set[int] = set()
+        self.failed: dict[int, str] = {}
+        self.skipped: dict[int, set[str]] = {}  # sermon_id → release 한 워커들
+        self.released_at: dict[int, float] = {}
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        self._next_lease = 0
+
+    def _give_up_or_requeue(self, sid: int, reason: str) -> None:
+        self.attempts[sid] += 1
+        if self.attempts[sid] >= self.max_attempts:
+            self.failed[sid] = reason
+        else:
+            self.pending.append(sid)
+
+    @property
+    def retry_sec(self) -> float:
+        return min(10.0, self.lease_sec / 3)
+
+    def reap(self, now: float) -> list[tuple[int, str]]:
+        expired = [(sid, l["worker"]) for sid, l in self.leases.items() if now - l["beat"] > self.lease_sec]
+        for sid, worker in expired:
+            del self.leases[sid]
+            self._give_up_or_requeue(sid, f"lease expired ({worker})")
+        return expired
+
+    def abandon_skipped(self, now: float) -> list[int]:
+        """Fail released items nobody picked up: no lease is held, so every worker has been idle
+        (polling at most every retry_sec) since the release and none could take it."""
+        if self.leases:
+            return []
+        stale = [
+            sid for sid in self.pending
+            if sid in self.skipped and sid not in self.done and now - self.released_at[sid] > 2 * self.retry_sec
+        ]
+        for sid in stale:
+            self.pending.remove(sid)
+            self.failed[sid] = f"audio not found on {', '.join(sorted(self.skipped[sid]))}"
+        return stale
+
+    def claim(self, worker: str, now: float) -> tuple[dict, int] | None:
+        for _ in range(len(self.pending)):
+            sid = self.pending.popleft()
+            if sid in self.done or sid in self.failed:
+                continue
+            if worker in self.skipped.get(sid, ()):
+                self.pending.append(sid)  # 이 워커가 이미 돌려준 작업 — 다른 워커 몫
+                continue
+            self._next_lease += 1
+            self.leases[sid] = {"worker": worker, "lease": self._next_lease, "beat": now}
+            return self.items[sid], self._next_lease
+        return None
+
+    def holds(self, sid: int, lease: int) -> bool:
+        return self.leases.get(sid, {}).get("lease") == lease
+
+    def heartbeat(self, sid: int, lease: int, now: float) -> bool:
+        if not self.holds(sid, lease):
+            return False
+        self.leases[sid]["beat"] = now
+        return True
+
+    def accepts_result(self, sid: int) -> bool:
+        return sid in self.items and sid not in self.done
+
+    def complete(self, sid: int) -> None:
+        self.done.add(sid)
+        self.failed.pop(sid, None)
+        self.leases.pop(sid, None)
+
+    def fail(self, sid: int, lease: int, reason: str) -> bool:
+        if not self.holds(sid, lease):
+            return False
+        del self.leases[sid]
+        self._give_up_or_requeue(sid, reason)
+        return True
+
+    def release(self, sid: int, lease: int, worker: str, now: float) -> bool:
+        """Hand the item back without spending an attempt; `worker` won't be offered it again."""
+        if not self.holds(sid, lease):
+            return False
+        del self.leases[sid]
+        self.skipped.setdefault(sid, set()).add(worker)
+        self.released_at[sid] = now
+        self.pending.appendleft(sid)
+        return True
+
+    @property
+    def finished(self) -> bool:
+        return not self.pending and not self.leases
+
+    def status(self) -> dict:
+        return {
+            "total": len(self.items),
+            "pending": len(self.pending),
+            "leased": {str(sid): l["worker"] for sid, l in self.leases.items()},
+            "done": len(self.done),
+            "failed": {str(sid): reason for sid, reason in self.failed.items()},
+        }
+
+
+# ─── 코디네이터 ───
+
+class Coordinator:
+    def __init__(
+        self,
+        queue: WorkQueue,
+        save: Callable[[int, str], None],
+        log: Callable[[str], None] = print,
+    ) -> None:
+        self.queue = queue
+        self.save = save
+        self.log = log
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+    def _check_finished(self) -> None:
+        if self.queue.finished:
+            self.finished.set()
+
+    def _reap(self) -> None:
+        now = time.time()
+        for sid, worker in self.queue.reap(now):
+            self.log(f"[reassign] sermon {sid}: lease expired ({worker})")
+        for sid in self.queue.abandon_skipped(now):
+            self.log(f"[fail] sermon {sid}: {self.queue.failed[sid]}")
+        self._check_finished()
+
+    def handle(self, path: str, req: dict) -> tuple[int, dict]:
+        worker = str(req.get("worker", "?"))
+        sid = req.get("sermon_id")
+        lease = req.get("lease")
+        with self.lock:
+            self._reap()
+            q = self.queue
+            if path == "/status":
+                return 200, q.status()
+
+            if path == "/claim":
+                got = q.claim(worker, time.time())
+                if got:
+                    item, lease = got
+                    self.log(f"[claim] sermon {item['sermon_id']} → {worker}")
+                    return 200, {"item": item, "lease": lease, "heartbeat_sec": q.lease_sec / 3}
+                if q.finished:
+                    return 200, {"item": None, "done": True}
+                # 남은 작업은 모두 다른 워커가 처리 중 — 만료되면 재배정될 수 있으니 잠시 후 다시
+                return 200, {"item": None, "retry_after": q.retry_sec}
+
+            if path == "/heartbeat":
+                if not q.heartbeat(sid, lease, time.time()):
+                    return 409, {"error": "lease lost"}
+                return 200, {"ok": True}
+
+            if path == "/fail":
+                if q.fail(sid, lease, f"{worker}: {req.get('error', '')}"):
+                    self.log(f"[fail] sermon {sid} ({worker}) {req.get('error', '')}")
+                self._check_finished()
+                return 200, {"ok": True}
+
+            if path == "/release":
+                if q.release(sid, lease, worker, time.time()):
+                    self.log(f"[release] sermon {sid} ({worker}) {req.get('error', '')}")
+                return 200, {"ok": True}
+
+            if path == "/submit":
+                if not q.accepts_result(sid):
+                    return 409, {"error": "already saved or unknown"}
+                transcript = req.get("transcript") or ""
+                if not transcript:
+                    return 400, {"error": "empty transcript"}
+                # 저장도 lock 안에서 — sqlite 연결 하나를 모든 요청이 공유한다
+                self.save(sid, transcript)
+                q.complete(sid)
+                self.log(f"[done] sermon {sid} chars={len(transcript)} ({worker})")
+                self._check_finished()
+                return 200, {"ok": True}
+
+        return 404, {"error": f"unknown endpoint {path}"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    coordinator: Coordinator
+
+    def _reply(self, code: int, body: dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        self._reply(*self.coordinator.handle(self.path, {}))
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            req = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._reply(400, {"error": "invalid json"})
+            return
+        self._reply(*self.coordinator.handle(self.path, req))
+
+    def log_message(self, format: str, *args) -> None:
+        pass  # 요청마다 찍히는 기본 접근 로그는 끈다
+
+
+def serve(coordinator: Coordinator, host: str, port: int) -> ThreadingHTTPServer:
+    handler = type("Handler", (_Handler,), {"coordinator": coordinator})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ─── 워커 ───
+
+class LeaseLost(Exception):
+    pass
+
+
+class WorkClient:
+    def __init__(self, url: str, worker: str = "", timeout: float = 60.0) -> None:
+        self.url = url.rstrip("/")
+        self.worker = worker or f"{socket.gethostname()}-{threading.get_native_id()}"
+        self.timeout = timeout
+
+    def _call(self, path: str, body: dict | None = None) -> dict:
+        data = None if body is None else json.dumps({"worker": self.worker, **body}, ensure_ascii=False).encode()
+        req = urllib.request.Request(
+            self.url + path, data=data, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 409:
+                raise LeaseLost(json.loads(e.read() or b"{}").get("error", "lease lost")) from None
+            raise
+
+    def claim(self) -> dict:
+        return self._call("/claim", {})
+
+    def heartbeat(self, sermon_id: int, lease: int) -> None:
+        self._call("/heartbeat", {"sermon_id": sermon_id, "lease": lease})
+
+    def submit(self, sermon_id: int, lease: int, transcript: str) -> None:
+        self._call("/submit", {"sermon_id": sermon_id, "lease": lease, "transcript": transcript})
+
+    def fail(self, sermon_id: int, lease: int, error: str) -> None:
+        self._call("/fail", {"sermon_id": sermon_id, "lease": lease, "error": error[-300:]})
+
+    def release(self, sermon_id: int, lease: int, reason: str = "") -> None:
+        self._call("/release", {"sermon_id": sermon_id, "lease": lease, "error": reason[-300:]})
+
+    def status(self) -> dict:
+        return self._call("/status")
+
+    @contextmanager
+    def heartbeating(self, sermon_id: int, lease: int, interval: float) -> Iterator[threading.Event]:
+        """Send heartbeats in the background while the body runs; the event is set if the lease is lost."""
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def beat() -> None:
+            while not stop.wait(interval):
+                try:
+                    self.heartbeat(sermon_id, lease)
+                except LeaseLost:
+                    lost.set()
+                    return
+                except OSError:
+                    pass  # 일시적 네트워크 오류 — 다음 주기에 다시
+
+        t = threading.Thread(target=beat, daemon=True)
+        t.start()
+        try:
+            yield lost
+        finally:
+            stop.set()
+            t.join()
+
+
+def run_worker(
+    client: WorkClient,
+    process: Callable[[dict], str | None],
+    log: Callable[[str], None] = print,
+    on_submitted: Callable[[dict], None] | None = None,
+) -> dict:
+    """Claim → process → submit until the coordinator reports that no work is left.
+
+    `process(item)` returns the transcript, or None to skip (e.g. audio missing on this machine):
+    skipped items are released to other workers without spending an attempt.
+    `on_submitted(item)` runs only after the coordinator accepted the transcript — the place to
+    drop local state (e.g. an ASR checkpoint) that must survive a failed submit.
+    """
+    counts = {"done": 0, "failed": 0, "skipped": 0, "lost": 0}
+    unreachable = 0
+    while True:
+        try:
+            resp = client.claim()
+            unreachable = 0
+        except OSError as e:
+            unreachable += 1
+            if unreachable >= UNREACHABLE_RETRIES:
+                log(f"[worker] coordinator unreachable {unreachable} times, giving up: {e}")
+                break
+            log(f"[worker] coordinator unreachable: {e}; retrying in 5s")
+            time.sleep(5)
+            continue
+        item = resp.get("item")
+        if not item:
+            if resp.get("done"):
+                break
+            time.sleep(resp.get("retry_after", 5))
+            continue
+
+        sid, lease = item["sermon_id"], resp["lease"]
+        try:
+            with client.heartbeating(sid, lease, resp.get("heartbeat_sec", LEASE_SEC / 3)) as lost:
+                transcript = process(item)
+            if lost.is_set():
+                log(f"[worker] sermon {sid}: lease lost during transcription, submitting anyway")
+            if transcript is None:
+                client.release(sid, lease, "audio not found")
+                counts["skipped"] += 1
+                continue
+            if not transcript:
+                client.fail(sid, lease, "empty transcript")
+                counts["failed"] += 1
+                continue
+            client.submit(sid, lease, transcript)
+            counts["done"] += 1
+            if on_submitted:
+                on_submitted(item)
+        except LeaseLost as e:
+            counts["lost"] += 1
+            log(f"[worker] sermon {sid}: {e}")
+        except Exception as e:
+            counts["failed"] += 1
+            log(f"[worker] sermon {sid} failed: {e}")
+            try:
+                client.fail(sid, lease, str(e))
+            except (OSError, LeaseLost):
+                pass
+    log(f"[worker] {client.worker} finished: {counts}")
+    return counts
+
+
+# ─── CLI ───
+
+def load_items(conn: sqlite3.Connection, ids: list[int]) -> list[dict]:
+    items = []
+    for sid in ids:
+        row = conn.execute("SELECT youtube_id, title FROM sermons WHERE id=?", (sid,)).fetchone()
+        if not row:
+            print(f"[skip] sermon {sid}: DB에 없음")
+            continue
+        items.append({"sermon_id": sid, "youtube_id": row[0], "title": row[1]})
+    return items
+
+
+def parse_ids(args: argparse.Namespace) -> list[int]:
+    raw = args.ids or ""
+    if args.ids_file:
+        with open(args.ids_file, encoding="utf-8") as f:
+            raw += "," + f.read().replace("\n", ",")
+    seen: dict[int, None] = {}
+    for x in raw.split(","):
+        if x.strip():
+            seen[int(x.strip())] = None
+    return list(seen)
+
+
+def main() -> None:
+    from sermon_db import drop_chunk_triggers, rebuild_fts_and_triggers, update_db
+
+    parser = argparse.ArgumentParser(description="여러 머신 전사 작업 코디네이터")
+    parser.add_argument("--ids", help="쉼표로 구분된 sermon ID")
+    parser.add_argument("--ids-file", help="sermon ID 목록 파일 (줄 또는 쉼표 구분)")
+    parser.add_argument("--db", default="data/sermons.db")
+    parser.add_argument("--host", default="127.0.0.1", help="다른 머신에서 접속하려면 0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--lease-sec", type=float, default=LEASE_SEC, help="heartbeat 없이 이 시간이 지나면 재배정")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="실패/만료 허용 횟수")
+    parser.add_argument("--linger", type=float, default=15.0, help="작업 완료 후 워커에게 done 을 알려줄 대기 시간")
+    parser.add_argument("--no-fts", action="store_true", help="FTS 트리거 관리 스킵")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    items = load_items(conn, parse_ids(args))
+    if not items:
+        raise SystemExit("작업 없음: --ids 또는 --ids-file 을 지정하세요")
+
+    drop_chunk_triggers(conn)
+    coordinator = Coordinator(
+        WorkQueue(items, args.lease_sec, args.max_attempts),
+        lambda sid, transcript: update_db(conn, sid, transcript),
+    )
+    server = serve(coordinator, args.host, args.port)
+    print(f"[info] serving {len(items)} sermons on http://{args.host}:{server.server_address[1]}")
+    try:
+        while not coordinator.finished.wait(timeout=max(1.0, args.lease_sec / 4)):
+            with coordinator.lock:
+                coordinator._reap()
+        time.sleep(args.linger)
+    except KeyboardInterrupt:
+        print("\n[cancelled]")
+    finally:
+        server.shutdown()
+        with coordinator.lock:
+            status = coordinator.queue.status()
+            if not args.no_fts:
+                rebuild_fts_and_triggers(conn)
+            conn.close()
+    print(f"[summary] done={status['done']} failed={len(status['failed'])} pending={status['pending']}")
+    for sid, reason in status["failed"].items():
+        print(f"  [failed] sermon {sid}: {reason}")
+
+
+if __name__ == "__main__":
+    main()